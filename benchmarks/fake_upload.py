@@ -0,0 +1,105 @@
+"""Servidor local que imita o endpoint de upload resumível do YouTube
+
+Implementa o protocolo usado pelo googleapiclient: o POST inicial devolve a
+URI da sessão (Location), cada PUT envia um bloco (Content-Range) e recebe
+308 com o intervalo já recebido, e o último bloco recebe 200 com o vídeo.
+Um PUT com "bytes */total" consulta o progresso da sessão.
+
+Com fail_every=N, uma a cada N requisições de bloco falha com 503, para
+exercitar as novas tentativas e a retomada do uploader.
+"""
+import re
+import json
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_RE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+class FakeUploadServer:
+    """Servidor em uma thread; use como context manager e aponte UPLOAD_API_ENDPOINT para .url"""
+
+    def __init__(self, fail_every=0, host="127.0.0.1", port=0):
+        self.fail_every = fail_every
+        self.sessions = {}
+        self.completed = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _reply(self, status, headers=None, body=b""):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self._body()
+                session_id = uuid.uuid4().hex
+                with server._lock:
+                    server.sessions[session_id] = {
+                        "received": 0,
+                        "total": int(self.headers.get("X-Upload-Content-Length") or 0)
+                    }
+                self._reply(200, {"Location": f"{server.url}/upload/session/{session_id}"})
+
+            def do_PUT(self):
+                data = self._body()
+                session_id = self.path.rsplit("/", 1)[-1]
+                match = RANGE_RE.match(self.headers.get("Content-Range", ""))
+                with server._lock:
+                    session = server.sessions.get(session_id)
+                    server.requests += 1
+                    fail = server.fail_every and server.requests % server.fail_every == 0
+                if session is None or match is None:
+                    return self._reply(404)
+
+                start = match.group(1)
+                if start is not None and not fail and int(start) == session["received"]:
+                    # Só os tamanhos são guardados; o conteúdo é descartado
+                    session["received"] += len(data)
+                if match.group(3) != "*":
+                    session["total"] = int(match.group(3))
+                if fail:
+                    return self._reply(503)
+
+                if session["total"] and session["received"] >= session["total"]:
+                    video = {"id": session_id[:11], "kind": "youtube#video"}
+                    with server._lock:
+                        if video not in server.completed:
+                            server.completed.append(video)
+                    return self._reply(200, {"Content-Type": "application/json"}, json.dumps(video).encode())
+                headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+                self._reply(308, headers)
+
+        return Handler
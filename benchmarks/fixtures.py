@@ -0,0 +1,102 @@
+"""Arquivos sintéticos para os benchmarks, gerados localmente com ffmpeg
+
+Os vídeos usam os geradores testsrc/sine do ffmpeg; o de fala usa
+benchmarks/data/speech.wav se existir (em loop), senão o filtro flite do
+ffmpeg e, por último, um tom. Os arquivos ficam em cache em
+benchmarks/.fixtures e só são gerados na primeira execução.
+"""
+import os
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+FIXTURES_DIR = BENCH_DIR / ".fixtures"
+SPEECH_SAMPLE = BENCH_DIR / "data" / "speech.wav"
+
+SPEECH_TEXT = (
+    "Este é um vídeo de teste para medir o desempenho da automação. "
+    "Cada etapa é cronometrada com arquivos gerados localmente."
+)
+
+# Vocabulário fixo para transcrições sintéticas (mesma semente, mesmas palavras)
+WORDS = "a automação de vídeos corta legenda e publica o conteúdo no canal promoção link descrição".split()
+
+def has_ffmpeg():
+    return shutil.which("ffmpeg") is not None
+
+def _ffmpeg(args, output):
+    output.parent.mkdir(parents=True, exist_ok=True)
+    partial = output.with_name(f".{output.stem}.partial{output.suffix}")
+    subprocess.run(["ffmpeg", "-y", "-nostdin", "-loglevel", "error", *args, str(partial)], check=True)
+    os.replace(partial, output)
+    return output
+
+def synthetic_video(seconds, size="1280x720", fps=30):
+    """Vídeo testsrc + tom de 440 Hz com a duração pedida"""
+    output = FIXTURES_DIR / f"testsrc_{seconds}s_{size}_{fps}.mp4"
+    if output.exists():
+        return output
+    return _ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate={fps}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(fps * 2),
+        "-c:a", "aac", "-shortest"
+    ], output)
+
+def _speech_input(seconds):
+    """Entrada de áudio com fala para o ffmpeg"""
+    if SPEECH_SAMPLE.exists():
+        return ["-stream_loop", "-1", "-i", str(SPEECH_SAMPLE)]
+    filters = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True).stdout
+    if " flite " in filters:
+        return ["-f", "lavfi", "-i", f"flite=text='{SPEECH_TEXT}'"]
+    return ["-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}"]
+
+def speech_video(seconds, size="640x360", fps=25):
+    """Vídeo com fala (amostra fixa em loop) para medir a transcrição"""
+    output = FIXTURES_DIR / f"speech_{seconds}s_{size}_{fps}.mp4"
+    if output.exists():
+        return output
+    return _ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate={fps}:duration={seconds}",
+        *_speech_input(seconds),
+        "-af", "apad", "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast",
+        "-c:a", "aac"
+    ], output)
+
+def synthetic_transcript(seconds, words_per_second=2.5, seed=0):
+    """Resultado no formato do Whisper (segmentos com palavras) cobrindo `seconds`"""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    while t < seconds:
+        words = []
+        for _ in range(rng.randint(6, 16)):
+            duration = rng.uniform(0.2, 2.0 / words_per_second)
+            words.append({"word": " " + rng.choice(WORDS), "start": round(t, 3), "end": round(t + duration, 3),
+                          "probability": 0.9})
+            t += duration + rng.uniform(0.0, 0.1)
+        words[-1]["word"] += rng.choice([".", "!", "?", ","])
+        segments.append({
+            "id": len(segments),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": "".join(w["word"] for w in words),
+            "avg_logprob": -0.2,
+            "no_speech_prob": 0.01,
+            "words": words
+        })
+        t += rng.uniform(0.0, 1.5)
+    return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "pt"}
+
+def srt_for(video_path, seconds):
+    """SRT sintético ao lado do vídeo"""
+    from subtitles import write_subtitles
+
+    base_path = os.path.splitext(str(video_path))[0]
+    if not os.path.exists(f"{base_path}.srt"):
+        write_subtitles(synthetic_transcript(seconds), base_path)
+    return f"{base_path}.srt"
@@ -0,0 +1,301 @@
+"""Benchmarks offline das etapas da automação
+
+Cada benchmark roda em um processo novo (o pico de memória é só dele), usa
+arquivos sintéticos gerados localmente (fixtures.py) e nunca acessa a rede:
+o upload é medido contra um servidor falso local (fake_upload.py).
+
+Uso:
+    python benchmarks/run.py                      # todos os benchmarks
+    python benchmarks/run.py subtitles_1h edit_10s
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+    python benchmarks/run.py --save-baseline
+
+O resultado (JSON) vai para benchmarks/results/; com --baseline, tempos
+acima da tolerância são listados como regressão e o código de saída é 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import traceback
+import multiprocessing
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+import fixtures
+
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+class Skip(Exception):
+    """Dependência (ffmpeg, whisper, moviepy, googleapiclient...) indisponível"""
+
+def require_ffmpeg():
+    if not fixtures.has_ffmpeg():
+        raise Skip("ffmpeg não encontrado")
+
+def bench_config(workdir):
+    """Configuração padrão apontando todos os diretórios para workdir"""
+    from utils import load_config
+
+    config = load_config()
+    for key in ("input_dir", "transcript_dir", "final_dir"):
+        config["paths"][key] = str(Path(workdir) / key)
+        os.makedirs(config["paths"][key], exist_ok=True)
+    config["edit"].update(profiles=[], cuts=False, reframe=False, mode="single")
+    config["search"]["auto_index"] = False
+    config["metrics"]["enabled"] = False
+    return config
+
+# Cada benchmark recebe um diretório temporário e devolve
+# (segundos, quantidade processada, unidade da vazão)
+
+def bench_subtitles_1h(workdir):
+    from subtitles import write_subtitles
+
+    result = fixtures.synthetic_transcript(3600)
+    words = sum(len(s["words"]) for s in result["segments"])
+    started = time.perf_counter()
+    write_subtitles(result, os.path.join(workdir, "video"), formats=("srt", "vtt", "ass"))
+    return time.perf_counter() - started, words, "words/s"
+
+def bench_transcript_store_1h(workdir):
+    from transcript_store import write_transcript, TranscriptReader
+
+    result = fixtures.synthetic_transcript(3600)
+    path = os.path.join(workdir, "video.tsc")
+    started = time.perf_counter()
+    write_transcript(path, result)
+    reader = TranscriptReader(path)
+    for start in range(0, 3600, 60):
+        reader.to_dict(start, start + 60)
+    return time.perf_counter() - started, len(result["segments"]), "segments/s"
+
+def bench_search_index(workdir):
+    from transcript_store import write_transcript
+    from search import SearchIndex
+
+    for i in range(50):
+        write_transcript(os.path.join(workdir, f"video{i:03d}.tsc"), fixtures.synthetic_transcript(600, seed=i))
+    queries = ['promoção', '"link na descrição"', 'corta legenda', 'canal vídeos'] * 25
+    started = time.perf_counter()
+    index = SearchIndex(os.path.join(workdir, "search.sqlite3"))
+    index.update([workdir])
+    for query in queries:
+        index.search(query, match_all=False)
+    index.close()
+    return time.perf_counter() - started, len(queries), "queries/s"
+
+def bench_highlights_1h(workdir):
+    import numpy as np
+    from highlights import find_highlights, HOP_SECONDS
+
+    segments = fixtures.synthetic_transcript(3600)["segments"]
+    rng = np.random.default_rng(0)
+    envelope = np.abs(rng.normal(0.05, 0.02, int(3600 / HOP_SECONDS))).astype(np.float32)
+    config = {"highlights": {"keywords": ["promoção", "link na descrição"], "count": 5}}
+    started = time.perf_counter()
+    find_highlights(None, segments, config, envelope=envelope)
+    return time.perf_counter() - started, 3600, "source-s/s"
+
+def bench_translate_1h(workdir):
+    from transcript_store import write_transcript
+    from translator import translate_video
+
+    config = bench_config(workdir)
+    # Serviço local: mede deduplicação, lotes e cache, não a rede
+    config["translation"].update(languages=["en", "es"], backend="stub", rate=0,
+                                 cache=os.path.join(workdir, "translations.sqlite3"))
+    video_path = os.path.join(config["paths"]["input_dir"], "video.mp4")
+    write_transcript(os.path.join(config["paths"]["input_dir"], "video.tsc"), fixtures.synthetic_transcript(3600))
+    started = time.perf_counter()
+    translate_video(video_path, config)
+    return time.perf_counter() - started, 2, "languages/s"
+
+def _bench_edit(workdir, seconds, profiles=()):
+    require_ffmpeg()
+    try:
+        from editor import edit_video
+    except ImportError as e:
+        raise Skip(str(e))
+    video_path = fixtures.synthetic_video(seconds)
+    srt_path = fixtures.srt_for(video_path, seconds)
+    config = bench_config(workdir)
+    config["edit"]["profiles"] = list(profiles)
+    output_path = os.path.join(config["paths"]["final_dir"], "video_editado.mp4")
+    started = time.perf_counter()
+    edit_video(str(video_path), srt_path, output_path, config)
+    return time.perf_counter() - started, seconds * 30, "frames/s"
+
+def bench_edit_10s(workdir):
+    return _bench_edit(workdir, 10)
+
+def bench_edit_60s(workdir):
+    return _bench_edit(workdir, 60)
+
+def bench_edit_profiles_10s(workdir):
+    return _bench_edit(workdir, 10, profiles=("shorts", "tiktok"))
+
+def _bench_transcribe(workdir, engine, seconds=30):
+    require_ffmpeg()
+    try:
+        from transcriber import transcribe_videos, get_engine
+    except ImportError as e:
+        raise Skip(str(e))
+    config = bench_config(workdir)
+    config["transcription"].update(
+        engine=engine,
+        model=os.getenv("BENCH_WHISPER_MODEL", "tiny"),
+        preset=os.getenv("BENCH_TRANSCRIPTION_PRESET", "balanced")
+    )
+    shutil.copy(fixtures.speech_video(seconds), os.path.join(config["paths"]["input_dir"], "speech.mp4"))
+    try:
+        # Carregar os pesos não entra na medida (e exige o modelo já baixado)
+        get_engine(config)
+    except Exception as e:
+        raise Skip(f"motor {engine} indisponível: {str(e)}")
+    started = time.perf_counter()
+    transcribe_videos(config)
+    elapsed = time.perf_counter() - started
+    return elapsed, seconds, "audio-s/s", {"engine": engine, "rtf": round(elapsed / seconds, 4)}
+
+def bench_transcribe_whisper_30s(workdir):
+    return _bench_transcribe(workdir, "whisper")
+
+def bench_transcribe_int8_30s(workdir):
+    return _bench_transcribe(workdir, "faster-whisper")
+
+def bench_upload_32mb(workdir):
+    try:
+        from googleapiclient.discovery import build
+        from uploader import upload_to_youtube, UploadSessions
+    except ImportError as e:
+        raise Skip(str(e))
+    from fake_upload import FakeUploadServer
+
+    size = 32 * 1024 * 1024
+    video_path = os.path.join(workdir, "video_shorts.mp4")
+    with open(video_path, "wb") as f:
+        f.write(os.urandom(size))
+    config = bench_config(workdir)
+    config["upload"].update(chunk_size_mb=4, retries=5, backoff=1.1)
+    service = build("youtube", "v3", developerKey="benchmark", static_discovery=True, cache_discovery=False)
+    sessions = UploadSessions(os.path.join(workdir, ".uploads.json"))
+    # Uma a cada 7 requisições de bloco falha com 503: mede também a retomada
+    with FakeUploadServer(fail_every=7) as server:
+        config["upload"]["api_endpoint"] = server.url
+        started = time.perf_counter()
+        upload_to_youtube(video_path, service, config, sessions)
+        elapsed = time.perf_counter() - started
+    return elapsed, size / 1e6, "MB/s"
+
+BENCHMARKS = {
+    name[len("bench_"):]: function
+    for name, function in sorted(globals().items())
+    if name.startswith("bench_") and callable(function) and name != "bench_config"
+}
+
+def _run_in_process(name):
+    """Executa um benchmark (no processo filho) e mede o pico de memória"""
+    from metrics import peak_rss_bytes
+
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        try:
+            seconds, amount, unit, *extra = BENCHMARKS[name](workdir)
+        except Skip as e:
+            return {"status": "skipped", "reason": str(e)}
+        except Exception as e:
+            return {"status": "error", "reason": f"{type(e).__name__}: {str(e)}", "traceback": traceback.format_exc()}
+    peak, children_peak = peak_rss_bytes()
+    return {
+        "status": "ok",
+        "seconds": round(seconds, 4),
+        "throughput": round(amount / max(seconds, 1e-9), 2),
+        "unit": unit,
+        "peak_rss_bytes": peak,
+        "children_peak_rss_bytes": children_peak,
+        **(extra[0] if extra else {})
+    }
+
+def run_benchmark(name, repeat=1):
+    """Melhor de `repeat` execuções, cada uma em um processo novo"""
+    context = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(max(1, repeat)):
+        with context.Pool(1) as pool:
+            result = pool.apply(_run_in_process, (name,))
+        if result["status"] != "ok":
+            return result
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+def compare(results, baseline, tolerance):
+    """Benchmarks mais lentos que a referência além da tolerância"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if result.get("status") != "ok" or not reference or reference.get("status") != "ok":
+            continue
+        ratio = result["seconds"] / max(reference["seconds"], 1e-9)
+        result["baseline_ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append((name, reference["seconds"], result["seconds"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline das etapas da automação")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks a executar (padrão: todos): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="Execuções por benchmark (vale a mais rápida)")
+    parser.add_argument("--output", help="Arquivo JSON do resultado (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--baseline", help="Resultado de referência para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Lentidão aceita em relação à referência")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Grava o resultado como referência ({BASELINE_PATH.name})")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmarks desconhecidos: {', '.join(unknown)}")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {}
+    }
+    for name in args.names or BENCHMARKS:
+        result = run_benchmark(name, args.repeat)
+        report["results"][name] = result
+        if result["status"] == "ok":
+            print(f"{name:24s} {result['seconds']:9.3f}s  {result['throughput']:12.2f} {result['unit']:11s} "
+                  f"pico {result['peak_rss_bytes'] / 1e6 if result['peak_rss_bytes'] else 0:.0f} MB"
+                  + (f"  RTF {result['rtf']:.3f}" if "rtf" in result else ""))
+        else:
+            print(f"{name:24s} {result['status']}: {result['reason']}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSÃO {name}: {before:.3f}s -> {after:.3f}s ({(ratio - 1) * 100:+.0f}%)")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultado salvo em {output}")
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Referência atualizada: {BASELINE_PATH}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
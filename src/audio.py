@@ -0,0 +1,112 @@
+import tempfile
+import subprocess
+import numpy as np
+from utils import setup_logging
+
+logger = setup_logging()
+
+# Taxa de amostragem esperada pelo Whisper
+SAMPLE_RATE = 16000
+
+def iter_pcm_windows(path, sample_rate=SAMPLE_RATE, window_seconds=30.0):
+    """Decodifica o áudio com ffmpeg e entrega janelas float32 mono de tamanho fixo
+
+    Levanta RuntimeError (com a saída de erro do ffmpeg) se a decodificação
+    falhar, p.ex. arquivo ausente, corrompido ou sem faixa de áudio.
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-nostats', '-loglevel', 'error', '-threads', '0',
+        '-i', str(path),
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        '-'
+    ]
+    # A saída de erro vai para um arquivo temporário: um pipe cheio travaria o ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        window_bytes = int(window_seconds * sample_rate) * 2
+        finished = False
+        try:
+            while True:
+                data = process.stdout.read(window_bytes)
+                if not data:
+                    break
+                yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished and process.poll() is None:
+                # Gerador fechado antes do fim: o ffmpeg é encerrado sem erro
+                process.kill()
+            process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"Erro ao decodificar o áudio de {path}: {message or f'ffmpeg saiu com código {process.returncode}'}")
+
+def load_pcm(path, sample_rate=SAMPLE_RATE):
+    """Decodifica o áudio inteiro em um array float32 mono (RuntimeError se o ffmpeg falhar)"""
+    windows = list(iter_pcm_windows(path, sample_rate=sample_rate, window_seconds=60.0))
+    if not windows:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(windows)
+
+def frame_rms(audio, frame_size):
+    """Energia RMS por quadro (vetorizado); descarta o resto que não completa um quadro"""
+    n_frames = len(audio) // frame_size
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_size].reshape(n_frames, frame_size)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def iter_speech_chunks(path, window_seconds=30.0, min_chunk_seconds=20.0, max_chunk_seconds=60.0,
+                       silence_threshold=0.01, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """Agrupa o áudio em trechos de até max_chunk_seconds cortados no silêncio
+
+    Retorna tuplas (offset_em_segundos, audio). Trechos inteiramente em silêncio
+    são descartados. A memória usada fica limitada a max_chunk_seconds + window_seconds
+    de áudio, independente da duração do arquivo.
+    """
+    frame_size = max(1, int(frame_seconds * sample_rate))
+    min_samples = int(min_chunk_seconds * sample_rate)
+    max_samples = int(max_chunk_seconds * sample_rate)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+
+    def emit(chunk, chunk_offset):
+        rms = frame_rms(chunk, frame_size)
+        if len(rms) and rms.max() < silence_threshold:
+            return None
+        return chunk_offset / sample_rate, chunk
+
+    for window in iter_pcm_windows(path, sample_rate=sample_rate, window_seconds=window_seconds):
+        buffer = np.concatenate([buffer, window])
+        while len(buffer) >= max_samples:
+            # Corta no quadro mais silencioso entre min_chunk e max_chunk
+            rms = frame_rms(buffer[min_samples:max_samples], frame_size)
+            split = min_samples + (int(np.argmin(rms)) * frame_size + frame_size // 2 if len(rms) else 0)
+            chunk = emit(buffer[:split], offset)
+            if chunk:
+                yield chunk
+            buffer = buffer[split:]
+            offset += split
+
+    if len(buffer):
+        chunk = emit(buffer, offset)
+        if chunk:
+            yield chunk
+
+def energy_envelope(path, sample_rate=8000, hop_seconds=0.1):
+    """Energia RMS a cada hop_seconds, de uma decodificação em taxa reduzida
+
+    Só o envelope (alguns KB por hora de vídeo) fica em memória; o áudio é
+    processado em janelas de 60 s múltiplas do hop.
+    """
+    hop = max(1, int(hop_seconds * sample_rate))
+    window_seconds = hop * max(1, int(60 * sample_rate) // hop) / sample_rate
+    parts = [
+        frame_rms(window, hop)
+        for window in iter_pcm_windows(path, sample_rate=sample_rate, window_seconds=window_seconds)
+    ]
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts).astype(np.float32)
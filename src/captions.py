@@ -0,0 +1,205 @@
+import bisect
+import time
+import subprocess
+from collections import OrderedDict
+import numpy as np
+import srt
+from PIL import Image, ImageDraw, ImageFont
+from utils import setup_logging
+
+logger = setup_logging()
+
+# Fontes tentadas quando CAPTION_FONT não é informado
+DEFAULT_FONTS = ["arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"]
+
+def load_cues(srt_path):
+    """Lê o SRT e retorna as legendas ordenadas como (início, fim, texto) em segundos"""
+    with open(srt_path, "r", encoding="utf-8") as f:
+        subtitles = srt.parse(f.read())
+    cues = [
+        (sub.start.total_seconds(), sub.end.total_seconds(), sub.content.strip())
+        for sub in subtitles
+        if sub.content.strip()
+    ]
+    cues.sort(key=lambda cue: cue[0])
+    return cues
+
+def load_font(font_path, font_size):
+    """Carrega a fonte TrueType configurada ou uma das fontes padrão"""
+    for candidate in ([font_path] if font_path else []) + DEFAULT_FONTS:
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except OSError:
+            continue
+    logger.warning("Nenhuma fonte TrueType encontrada, usando a fonte padrão do Pillow")
+    return ImageFont.load_default()
+
+class CaptionRenderer:
+    """Rasteriza legendas com o Pillow e guarda os bitmaps prontos em cache
+
+    Cada legenda vira um par (rgb, alpha) em float32, já no formato usado na
+    mistura com os quadros do vídeo.
+    """
+
+    def __init__(self, max_width, font_path=None, font_size=16, color=(255, 255, 255),
+                 stroke_color=(0, 0, 0), stroke_width=1.5, bg_color=(0, 0, 0, 178), padding=4,
+                 cache_size=256):
+        self.max_width = max(1, int(max_width))
+        self.font = load_font(font_path, font_size)
+        self.color = color
+        self.stroke_color = stroke_color
+        self.stroke_width = int(round(stroke_width))
+        self.bg_color = bg_color
+        self.padding = padding
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._line_height = self._text_size("Ág")[1]
+
+    def _text_size(self, text):
+        left, top, right, bottom = self.font.getbbox(text, stroke_width=self.stroke_width)
+        return right - left, bottom - top
+
+    def _wrap(self, text):
+        """Quebra o texto para caber em max_width (como o method='caption' do TextClip)"""
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split():
+                candidate = f"{line} {word}" if line else word
+                if line and self.font.getlength(candidate) > self.max_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            if line:
+                lines.append(line)
+        return lines
+
+    def render(self, text):
+        """Retorna (rgb, alpha) da legenda, do cache quando já renderizada"""
+        bitmap = self._cache.get(text)
+        if bitmap is not None:
+            self._cache.move_to_end(text)
+            return bitmap
+
+        lines = self._wrap(text)
+        width = self.max_width + 2 * self.padding
+        height = len(lines) * self._line_height + 2 * self.padding
+        image = Image.new("RGBA", (width, height), self.bg_color)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            line_width = self.font.getlength(line)
+            draw.text(
+                ((width - line_width) / 2, self.padding + i * self._line_height),
+                line,
+                font=self.font,
+                fill=self.color,
+                stroke_width=self.stroke_width,
+                stroke_fill=self.stroke_color
+            )
+
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        alpha = pixels[:, :, 3:4]
+        bitmap = (pixels[:, :, :3] * alpha * 255.0, alpha)
+
+        self._cache[text] = bitmap
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return bitmap
+
+class CaptionCompositor:
+    """Aplica as legendas ativas em cada quadro com mistura alfa vetorizada (NumPy)"""
+
+    def __init__(self, cues, renderer, frame_size, position="bottom", margin=0):
+        self.cues = cues
+        self.starts = [cue[0] for cue in cues]
+        self.renderer = renderer
+        self.frame_width, self.frame_height = frame_size
+        self.position = position
+        self.margin = margin
+        # Tempo gasto aplicando legendas (métrica de composição)
+        self.busy_seconds = 0.0
+
+    def active_cue(self, t):
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index >= 0 and t < self.cues[index][1]:
+            return self.cues[index]
+        return None
+
+    def __call__(self, frame, t):
+        """Quadro com a legenda ativa em t; o array recebido nunca é alterado
+
+        O moviepy devolve o mesmo array (último quadro lido) para tempos
+        repetidos: misturar nele aplicaria a legenda duas vezes.
+        """
+        cue = self.active_cue(t)
+        if cue is None:
+            return frame
+        started = time.perf_counter()
+        try:
+            return self._blend(frame, cue)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+    def _blend(self, frame, cue):
+
+        rgb, alpha = self.renderer.render(cue[2])
+        h, w = alpha.shape[:2]
+        x = (self.frame_width - w) // 2
+        if self.position == "top":
+            y = self.margin
+        elif self.position == "center":
+            y = (self.frame_height - h) // 2
+        else:
+            y = self.frame_height - h - self.margin
+
+        # Recorta o bitmap para os limites do quadro
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.frame_width, x + w), min(self.frame_height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return frame
+        rgb = rgb[y0 - y:y1 - y, x0 - x:x1 - x]
+        alpha = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+
+        frame = frame.copy()
+        region = frame[y0:y1, x0:x1].astype(np.float32)
+        frame[y0:y1, x0:x1] = (region * (1.0 - alpha) + rgb).astype(np.uint8)
+        return frame
+
+def make_compositor(srt_path, frame_size, config, style=None, cues=None):
+    """Cria o compositor de legendas com o estilo configurado (ou o estilo de um perfil)"""
+    edit = config.get("edit", {})
+    style = style or {}
+    width, height = frame_size
+    renderer = CaptionRenderer(
+        max_width=width * style.get("width_ratio", 0.7),
+        font_path=style.get("font") or edit.get("caption_font"),
+        font_size=int(height * style["font_ratio"]) if "font_ratio" in style else edit.get("caption_font_size", 16)
+    )
+    return CaptionCompositor(
+        cues if cues is not None else load_cues(srt_path),
+        renderer,
+        frame_size,
+        position=style.get("position", "bottom"),
+        margin=int(height * style.get("margin_ratio", 0.0))
+    )
+
+def burn_subtitles_ffmpeg(video_path, srt_path, output_path, config):
+    """Grava as legendas direto no vídeo com o filtro subtitles do ffmpeg (uma passada)"""
+    edit = config.get("edit", {})
+    font_size = edit.get("caption_font_size", 16)
+    force_style = (
+        f"FontName=Arial,FontSize={font_size},Bold=1,PrimaryColour=&H00FFFFFF,"
+        "OutlineColour=&H00000000,BackColour=&H4C000000,BorderStyle=3,Outline=1.5,Alignment=2"
+    )
+    # O filtro subtitles usa ':' como separador; escapa o caminho do SRT
+    escaped = str(srt_path).replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+    cmd = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+        "-i", str(video_path),
+        "-vf", f"subtitles='{escaped}':force_style='{force_style}'",
+        "-c:v", "libx264", "-c:a", "copy",
+        str(output_path)
+    ]
+    subprocess.run(cmd, check=True)
+    return output_path
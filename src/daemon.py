@@ -0,0 +1,208 @@
+import os
+import time
+import signal
+import shutil
+import threading
+from pathlib import Path
+from utils import setup_logging
+
+logger = setup_logging()
+
+try:
+    # inotify é opcional; sem ele o diretório é verificado por polling
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+# Arquivos temporários de downloads/edições em andamento
+IGNORED_SUFFIXES = ('.part', '.tmp', '.ytdl')
+
+class FileWatcher:
+    """Observa um diretório e entrega os arquivos novos depois de completamente gravados
+
+    Com inotify, um arquivo fica pronto ao ser fechado após escrita ou movido
+    para o diretório. No polling (ou para arquivos já existentes), fica pronto
+    quando tamanho e data de modificação não mudam por settle_seconds.
+    """
+
+    def __init__(self, directory, extensions=('.mp4',), settle_seconds=5.0, poll_interval=2.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.extensions = extensions
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._pending = {}
+        self._closed = set()
+        self._delivered = set()
+        self._inotify = None
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                self._inotify.add_watch(
+                    str(self.directory),
+                    inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE
+                )
+                logger.info(f"Observando {self.directory} via inotify")
+            except OSError as e:
+                logger.warning(f"inotify indisponível ({str(e)}), usando polling")
+                self._inotify = None
+        if self._inotify is None:
+            logger.info(f"Observando {self.directory} via polling a cada {poll_interval}s")
+
+    def _accepts(self, name):
+        return (
+            not name.startswith('.')
+            and name.endswith(self.extensions)
+            and not name.endswith(IGNORED_SUFFIXES)
+        )
+
+    def wait(self):
+        """Espera por eventos (inotify) ou pelo próximo ciclo de polling"""
+        if self._inotify is None:
+            time.sleep(self.poll_interval)
+            return
+        for event in self._inotify.read(timeout=int(self.poll_interval * 1000)):
+            if event.mask & (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO) and self._accepts(event.name):
+                self._closed.add(event.name)
+
+    def ready_files(self):
+        """Arquivos novos e estáveis desde a última chamada"""
+        now = time.monotonic()
+        ready = []
+        names = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not self._accepts(entry.name):
+                    continue
+                names.add(entry.name)
+                if entry.name in self._delivered:
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self._pending.get(entry.name)
+                if previous is None or previous[0] != signature:
+                    self._pending[entry.name] = (signature, now)
+                    # Fechado pelo escritor (inotify): não precisa esperar estabilizar
+                    if entry.name not in self._closed:
+                        continue
+                elif now - previous[1] < self.settle_seconds and entry.name not in self._closed:
+                    continue
+                ready.append(Path(entry.path))
+
+        for path in ready:
+            self._delivered.add(path.name)
+            self._pending.pop(path.name, None)
+            self._closed.discard(path.name)
+        # Esquece arquivos que saíram do diretório (entregues e movidos, ou removidos)
+        for name in list(self._pending):
+            if name not in names:
+                del self._pending[name]
+        self._delivered &= names
+        return ready
+
+class UrlInbox:
+    """Lê as URLs adicionadas ao final de um arquivo de entrada (apenas linhas completas)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._offset = 0
+
+    def new_urls(self):
+        if not self.path.exists():
+            return []
+        if self.path.stat().st_size < self._offset:
+            # Arquivo truncado ou substituído: recomeça do início
+            self._offset = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        return [line.strip() for line in data[:end].decode('utf-8').splitlines() if line.strip()]
+
+def run_daemon(config, urls_file=None, skip_download=False, skip_transcription=False, skip_edit=False,
+               skip_upload=False, skip_translation=False):
+    """Processa continuamente os vídeos que chegam na pasta observada e as URLs do inbox
+
+    O pipeline e os modelos ficam carregados durante toda a execução; cada item
+    novo entra direto na etapa correspondente.
+    """
+    from jobs import open_job_store
+    from pipeline import Pipeline, build_tracked_stages, job_item, add_local_video
+
+    daemon_config = config.get('daemon', {})
+    input_dir = config['paths']['input_dir']
+    os.makedirs(input_dir, exist_ok=True)
+
+    store = open_job_store(config)
+    stages = build_tracked_stages(store, config, skip_download, skip_transcription, skip_edit, skip_upload,
+                                  skip_translation)
+    if not stages:
+        logger.info("Nenhuma etapa habilitada")
+        store.close()
+        return
+
+    pipeline = Pipeline(stages, queue_size=config.get('pipeline', {}).get('queue_size', 2), keep_results=False)
+    pipeline.start()
+    # Vídeos locais pulam o download e entram na primeira etapa seguinte
+    local_stage = 1 if pipeline.stage_index('download') == 0 and len(stages) > 1 else 0
+
+    watcher = FileWatcher(
+        daemon_config.get('watch_dir', './videos/inbox'),
+        settle_seconds=daemon_config.get('settle_seconds', 5.0),
+        poll_interval=daemon_config.get('poll_interval', 2.0)
+    )
+    inbox_path = urls_file or daemon_config.get('url_inbox')
+    inbox = UrlInbox(inbox_path) if inbox_path and not skip_download else None
+
+    stop = threading.Event()
+    forced = threading.Event()
+
+    def request_stop(signum, frame):
+        if stop.is_set():
+            # Segundo sinal: sai sem esperar os vídeos em andamento (retomados na próxima execução)
+            forced.set()
+            raise KeyboardInterrupt
+        logger.info("Sinal recebido; terminando os vídeos em andamento (repita para sair imediatamente)")
+        stop.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, request_stop)
+
+    # Retoma o que ficou pendente em execuções anteriores
+    submitted = set(store.unfinished())
+    for job_id in submitted:
+        pipeline.submit(job_item(store, job_id))
+
+    logger.info("Daemon iniciado; aguardando novos vídeos (Ctrl+C para encerrar)")
+    try:
+        while not stop.is_set():
+            if inbox:
+                for url in inbox.new_urls():
+                    job_id = store.add(url)
+                    if job_id not in submitted and store.get(job_id)['state'] != 'uploaded':
+                        logger.info(f"Nova URL no inbox: {url}")
+                        submitted.add(job_id)
+                        pipeline.submit(job_item(store, job_id))
+
+            for path in watcher.ready_files():
+                # Move para o diretório de originais, onde as demais etapas procuram os arquivos
+                destination = os.path.join(input_dir, path.name)
+                shutil.move(str(path), destination)
+                logger.info(f"Novo vídeo recebido: {path.name}")
+                job_id = add_local_video(store, destination)
+                submitted.add(job_id)
+                pipeline.submit(job_item(store, job_id), stage=local_stage)
+
+            watcher.wait()
+    finally:
+        try:
+            if not forced.is_set():
+                logger.info("Encerrando daemon; aguardando os vídeos em andamento")
+                pipeline.close()
+                pipeline.join()
+        finally:
+            if forced.is_set():
+                # Os workers são threads daemon: terminam junto com o processo
+                logger.warning("Encerrando daemon sem esperar os vídeos em andamento")
+            store.close()
@@ -1,65 +1,506 @@
 import os
+import copy
+import json
+import threading
+import subprocess
 import yt_dlp
 from pathlib import Path
-from utils import setup_logging, generate_safe_filename
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils import (setup_logging, generate_safe_filename, RateLimiter, retry_with_backoff,
+                   file_sha256, atomic_write_json, temp_output_path)
+import metrics
 
 logger = setup_logging()
 
+# Cada thread do pool reutiliza as suas próprias instâncias do YoutubeDL
+_thread_local = threading.local()
+
+# Modo split: formatos baixados separadamente (mesma seleção do modo normal)
+AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio'
+VIDEO_FORMAT = 'bestvideo[ext=mp4]/bestvideo'
+
+# Subdiretório dos originais com as faixas separadas (fora da listagem de .mp4)
+STREAMS_DIR = '.streams'
+
+# Downloads de vídeo em segundo plano do modo split, por caminho final
+_video_executor = None
+_pending_videos = {}
+_pending_lock = threading.Lock()
+
+class HostLimiter:
+    """Limita downloads simultâneos e a taxa de início de downloads por host"""
+
+    def __init__(self, max_concurrency, rate):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._limiters = {}
+
+    def _get(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_concurrency)
+                self._limiters[host] = RateLimiter(self.rate)
+            return self._semaphores[host], self._limiters[host]
+
+    def run(self, url, func):
+        """Executa func() respeitando os limites do host da URL"""
+        host = urlparse(url).hostname or ''
+        semaphore, limiter = self._get(host)
+        with semaphore:
+            limiter.wait()
+            return func()
+
+class DownloadManifest:
+    """Manifesto dos downloads concluídos, indexado por extractor + id do vídeo + formato
+
+    Um índice URL -> chave permite reconhecer um vídeo já baixado sem nenhuma
+    requisição de metadados.
+    """
+
+    def __init__(self, path, verify_hash=False):
+        self.path = Path(path)
+        self.verify_hash = verify_hash
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.entries = {}
+        self._urls = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Manifesto de downloads ilegível, ignorando: {str(e)}")
+        for key, entry in self.entries.items():
+            self._index_url(key, entry)
+
+    def _index_url(self, key, entry):
+        # Faixas separadas do modo split não são o vídeo final da URL
+        if entry.get('url') and not entry.get('stream'):
+            self._urls[entry['url']] = key
+
+    def key_lock(self, key):
+        """Lock por vídeo, evita baixar a mesma URL duas vezes em paralelo"""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def lookup(self, key):
+        """Retorna a entrada do cache se o arquivo ainda existir e estiver íntegro"""
+        with self._lock:
+            entry = self.entries.get(key)
+        if not entry:
+            return None
+
+        path = entry['path']
+        if not os.path.exists(path) or os.path.getsize(path) != entry['size']:
+            logger.info(f"Entrada do cache inválida (arquivo ausente ou alterado): {path}")
+            return None
+        # Arquivos mesclados não têm tamanho esperado vindo do servidor: se foram
+        # modificados depois do download, o hash é conferido mesmo sem verify_hash
+        modified = entry.get('merged') and os.stat(path).st_mtime_ns != entry.get('mtime_ns')
+        if (self.verify_hash or modified) and file_sha256(path) != entry['sha256']:
+            logger.warning(f"Hash divergente no cache, baixando novamente: {path}")
+            return None
+        return entry
+
+    def lookup_url(self, url):
+        """Entrada do vídeo final já baixado desta URL, sem acessar a rede"""
+        with self._lock:
+            key = self._urls.get(url)
+        return self.lookup(key) if key else None
+
+    def store(self, key, entry):
+        with self._lock:
+            self.entries[key] = entry
+            self._index_url(key, entry)
+            atomic_write_json(self.path, self.entries, indent=2)
+
+def get_manifest(config):
+    """Manifesto de downloads configurado (padrão: .downloads.json no diretório de originais)"""
+    download_config = config.get('download', {})
+    path = download_config.get('manifest') or os.path.join(get_originals_dir(config), '.downloads.json')
+    return DownloadManifest(path, verify_hash=download_config.get('verify_hash', False))
+
+def make_downloader(config):
+    """Cria a função de download de uma URL com limites por host, cache e novas tentativas
+
+    A função retornada é thread-safe e pode ser chamada por vários workers.
+    """
+    download_config = config.get('download', {})
+    retries = download_config.get('retries', 3)
+    backoff = download_config.get('backoff', 2.0)
+    host_limiter = HostLimiter(
+        download_config.get('per_host_concurrency', 2),
+        download_config.get('per_host_rate', 1.0)
+    )
+    manifest = get_manifest(config)
+    split = download_config.get('split', False)
+
+    def fetch(url):
+        if split:
+            return download_split(url, config, manifest=manifest, host_limiter=host_limiter)
+        return download_single_video(url, config, ydl=_get_thread_downloader(config), manifest=manifest)
+
+    def download(url):
+        logger.info(f"Iniciando download do vídeo: {url}")
+        # Cria os YoutubeDL da thread antes de ocupar a vaga do host: os limites
+        # valem para as requisições, não para a inicialização dos extractors
+        for kind in (None, 'audio', 'video') if split else (None,):
+            _get_thread_downloader(config, kind)
+        return retry_with_backoff(
+            lambda: host_limiter.run(url, lambda: fetch(url)),
+            retries=retries,
+            backoff=backoff,
+            retry_on=(yt_dlp.utils.DownloadError, OSError),
+            logger=logger
+        )
+
+    return download
+
 def download_videos(urls_file, config):
     """Download de vídeos a partir de um arquivo de URLs"""
-    with open(urls_file, 'r') as f:
-        urls = [line.strip() for line in f if line.strip()]
-    
-    for url in urls:
+    urls = read_urls(urls_file)
+    workers = max(1, config.get('download', {}).get('workers', 4))
+    download = make_downloader(config)
+
+    summary = {'succeeded': [], 'failed': []}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download') as executor:
+        futures = {executor.submit(download, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                video_info = future.result()
+                summary['succeeded'].append(video_info)
+                if video_info.get('cached'):
+                    logger.info(f"Vídeo já baixado (cache): {video_info['title']}")
+                else:
+                    logger.info(f"Download concluído: {video_info['title']}")
+            except Exception as e:
+                summary['failed'].append({'url': url, 'error': str(e)})
+                logger.error(f"Erro ao baixar vídeo {url}: {str(e)}")
+
+    # Modo split: as etapas seguintes do lote precisam dos .mp4 completos
+    for video_info in list(summary['succeeded']):
         try:
-            logger.info(f"Iniciando download do vídeo: {url}")
-            video_info = download_single_video(url, config)
-            logger.info(f"Download concluído: {video_info['title']}")
+            wait_for_video(video_info['path'])
         except Exception as e:
-            logger.error(f"Erro ao baixar vídeo {url}: {str(e)}")
-            continue
+            summary['succeeded'].remove(video_info)
+            summary['failed'].append({'url': video_info['url'], 'error': str(e)})
+            logger.error(f"Erro ao baixar vídeo {video_info['url']}: {str(e)}")
 
-def download_single_video(url, config):
-    """Download de um único vídeo"""
-    ydl_opts = {
+    logger.info(f"Downloads finalizados: {len(summary['succeeded'])} com sucesso, {len(summary['failed'])} com falha")
+    for failure in summary['failed']:
+        logger.info(f"  Falha: {failure['url']} ({failure['error']})")
+
+    return summary
+
+def read_urls(urls_file):
+    """Lê as URLs (uma por linha) do arquivo de entrada"""
+    with open(urls_file, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def get_originals_dir(config):
+    """Diretório onde os vídeos baixados são salvos"""
+    return config.get('originals_dir') or config['paths']['input_dir']
+
+def _build_ydl_opts(config):
+    """Opções do yt_dlp usadas no download"""
+    return {
         'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-        'outtmpl': os.path.join(config['originals_dir'], '%(title)s.%(ext)s'),
+        'outtmpl': os.path.join(get_originals_dir(config), '%(title)s.%(ext)s'),
         'quiet': False,
         'no_warnings': False,
         'extract_flat': False,
         'merge_output_format': 'mp4',
+        # Mantém os arquivos .part e retoma transferências interrompidas
+        'continuedl': True,
+        'nopart': False,
+        'retries': 10,
+        'fragment_retries': 10,
         'postprocessors': [{
             'key': 'FFmpegVideoConvertor',
             'preferedformat': 'mp4',
         }],
+        'progress_hooks': [_record_finished],
         # Adiciona headers para evitar bloqueio
         'http_headers': {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
     }
-    
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+
+def _build_stream_opts(config, fmt, kind):
+    """Opções do yt_dlp para baixar só uma faixa (áudio ou vídeo), sem mesclar nem converter"""
+    opts = _build_ydl_opts(config)
+    opts.pop('merge_output_format')
+    opts.update(
+        format=fmt,
+        outtmpl=os.path.join(get_originals_dir(config), STREAMS_DIR, f'%(title)s.{kind}.%(ext)s'),
+        postprocessors=[]
+    )
+    return opts
+
+def _get_thread_downloader(config, kind=None):
+    """Retorna o YoutubeDL da thread atual (completo, só áudio ou só vídeo)
+
+    A instância é reaproveitada enquanto as opções forem as mesmas; uma configuração
+    diferente (outro diretório, outro formato) cria um novo YoutubeDL.
+    """
+    if kind == 'audio':
+        opts = _build_stream_opts(config, AUDIO_FORMAT, kind)
+    elif kind == 'video':
+        opts = _build_stream_opts(config, VIDEO_FORMAT, kind)
+    else:
+        opts = _build_ydl_opts(config)
+    key = json.dumps(opts, sort_keys=True, default=repr)
+    downloaders = getattr(_thread_local, 'downloaders', None)
+    if downloaders is None:
+        downloaders = _thread_local.downloaders = {}
+    cached = downloaders.get(kind)
+    if cached is None or cached[0] != key:
+        cached = downloaders[kind] = (key, yt_dlp.YoutubeDL(opts))
+    return cached[1]
+
+def download_single_video(url, config, ydl=None, manifest=None):
+    """Download de um único vídeo"""
+    if manifest is None:
+        manifest = get_manifest(config)
+    with metrics.stage('download', url):
+        if ydl is None:
+            with yt_dlp.YoutubeDL(_build_ydl_opts(config)) as ydl:
+                result = _download_with(ydl, url, manifest)
+        else:
+            result = _download_with(ydl, url, manifest)
+        if result and not result.get('cached') and os.path.exists(result['path']):
+            metrics.observe(bytes=os.path.getsize(result['path']))
+        return result
+
+def _manifest_entry(path, info, url, **extra):
+    """Entrada do manifesto com tamanho, mtime e SHA-256 do arquivo baixado"""
+    stat = os.stat(path)
+    return {
+        'path': path,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path),
+        'title': info.get('title', 'video_sem_titulo'),
+        'duration': info.get('duration', 0),
+        'url': url,
+        **extra
+    }
+
+def _cached_result(entry, url):
+    return {
+        'title': entry['title'],
+        'path': entry['path'],
+        'duration': entry['duration'],
+        'url': url,
+        'cached': True
+    }
+
+def _cache_key(info):
+    """Chave do manifesto: extractor + id do vídeo + formato escolhido"""
+    extractor = info.get('extractor_key') or info.get('extractor') or 'generic'
+    return f"{extractor}:{info['id']}:{info.get('format_id', 'default')}"
+
+def _record_finished(status):
+    """Hook do yt_dlp: guarda cada arquivo baixado, antes de mesclar ou converter"""
+    if status.get('status') == 'finished':
+        finished = getattr(_thread_local, 'finished', None)
+        if finished is not None:
+            finished.append(status)
+
+def _check_downloaded(finished):
+    """Confere os bytes recebidos de cada formato com o tamanho informado pelo site
+
+    A comparação é feita com o arquivo baixado, não com o final: mesclar ou
+    converter para mp4 muda o tamanho.
+    """
+    for status in finished:
+        expected = (status.get('info_dict') or {}).get('filesize')
+        received = status.get('downloaded_bytes', status.get('total_bytes'))
+        if expected and received is not None and received < expected:
+            raise yt_dlp.utils.DownloadError(
+                f"Arquivo incompleto: {received} de {expected} bytes ({status.get('filename')})")
+
+def _download_with(ydl, url, manifest):
+    try:
+        # URL já baixada: nenhuma requisição
+        entry = manifest.lookup_url(url)
+        if entry:
+            return _cached_result(entry, url)
+
+        # Resolve id e formato sem baixar, para consultar o cache
+        info = ydl.extract_info(url, download=False)
+        key = _cache_key(info)
+
+        with manifest.key_lock(key):
+            entry = manifest.lookup(key)
+            if entry:
+                return _cached_result(entry, url)
+
+            # Baixa a partir das informações já extraídas (sem nova requisição de metadados)
+            _thread_local.finished = finished = []
+            try:
+                info = ydl.process_ie_result(info, download=True)
+            finally:
+                _thread_local.finished = None
+            video_path = _finalize_path(ydl.prepare_filename(info))
+
+            try:
+                _check_downloaded(finished)
+            except yt_dlp.utils.DownloadError:
+                if os.path.exists(video_path):
+                    os.remove(video_path)
+                raise
+
+            manifest.store(key, _manifest_entry(video_path, info, url, merged=bool(info.get('requested_formats'))))
+
+        return {
+            'title': info.get('title', 'video_sem_titulo'),
+            'path': video_path,
+            'duration': info.get('duration', 0),
+            'url': url,
+            'cached': False
+        }
+    except Exception as e:
+        logger.error(f"Erro durante o download: {str(e)}")
+        raise
+
+def _has_video(info):
+    return info.get('vcodec') not in (None, 'none')
+
+def download_split(url, config, manifest=None, host_limiter=None):
+    """Download em duas faixas: o áudio primeiro, o vídeo em segundo plano
+
+    Retorna assim que o áudio (bem menor) termina, com 'audio_path' para a
+    transcrição começar; o .mp4 final em 'path' só existe depois que o vídeo
+    for baixado e mesclado ao áudio (veja wait_for_video). Fontes sem faixa de
+    áudio separada usam o download normal. O download do vídeo passa pelo
+    mesmo host_limiter dos demais (concorrência e taxa por host).
+    """
+    if manifest is None:
+        manifest = get_manifest(config)
+    with metrics.stage('download', url):
+        entry = manifest.lookup_url(url)
+        if entry:
+            return _cached_result(entry, url)
+
+        audio_ydl = _get_thread_downloader(config, 'audio')
         try:
-            info = ydl.extract_info(url, download=True)
-            video_path = ydl.prepare_filename(info)
-            
-            # Garante que o arquivo final seja .mp4
-            if not video_path.endswith('.mp4'):
-                base_path = os.path.splitext(video_path)[0]
-                new_path = base_path + '.mp4'
-                if os.path.exists(video_path) and not os.path.exists(new_path):
-                    os.rename(video_path, new_path)
-                video_path = new_path
-            
-            return {
-                'title': info.get('title', 'video_sem_titulo'),
-                'path': video_path,
-                'duration': info.get('duration', 0),
-                'url': url
-            }
-        except Exception as e:
-            logger.error(f"Erro durante o download: {str(e)}")
-            raise
+            info = audio_ydl.extract_info(url, download=False)
+        except yt_dlp.utils.DownloadError as e:
+            logger.info(f"Sem faixa de áudio separada, usando o download normal: {str(e)}")
+            info = None
+        if info is None or _has_video(info):
+            result = _download_with(_get_thread_downloader(config), url, manifest)
+            if not result.get('cached') and os.path.exists(result['path']):
+                metrics.observe(bytes=os.path.getsize(result['path']))
+            return result
+
+        video_info = _get_thread_downloader(config, 'video').process_ie_result(copy.deepcopy(info), download=False)
+        audio_key = _cache_key(info)
+        # Mesma chave do modo normal (vídeo+áudio), o cache vale para os dois modos
+        key = f"{audio_key.rsplit(':', 1)[0]}:{video_info.get('format_id', 'default')}+{info.get('format_id', 'default')}"
+        entry = manifest.lookup(key)
+        if entry:
+            return _cached_result(entry, url)
+
+        with manifest.key_lock(audio_key):
+            entry = manifest.lookup(audio_key)
+            if entry:
+                audio_path = entry['path']
+            else:
+                info = audio_ydl.process_ie_result(info, download=True)
+                audio_path = audio_ydl.prepare_filename(info)
+                metrics.observe(bytes=os.path.getsize(audio_path))
+                manifest.store(audio_key, _manifest_entry(audio_path, info, url, stream='audio'))
+
+    name = os.path.basename(audio_path).rsplit('.audio.', 1)[0]
+    video_path = os.path.join(get_originals_dir(config), f"{name}.mp4")
+    logger.info(f"Áudio baixado, vídeo continua em segundo plano: {name}")
+    with _pending_lock:
+        future = _pending_videos.get(video_path)
+        if future is None or future.done():
+            _pending_videos[video_path] = _get_video_executor(config).submit(
+                _download_video_stream, url, config, video_info, audio_path, video_path, key, manifest,
+                host_limiter)
+
+    return {
+        'title': info.get('title', 'video_sem_titulo'),
+        'path': video_path,
+        'audio_path': audio_path,
+        'duration': info.get('duration', 0),
+        'url': url,
+        'cached': False
+    }
+
+def _get_video_executor(config):
+    global _video_executor
+    if _video_executor is None:
+        workers = max(1, config.get('download', {}).get('workers', 4))
+        _video_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download-video')
+    return _video_executor
+
+def _download_video_stream(url, config, info, audio_path, video_path, key, manifest, host_limiter=None):
+    """Baixa a faixa de vídeo e mescla com o áudio já baixado (sem recodificar)"""
+    with metrics.stage('download_video', url):
+        ydl = _get_thread_downloader(config, 'video')
+        with manifest.key_lock(key):
+            entry = manifest.lookup(key)
+            if entry:
+                return entry['path']
+
+            def fetch():
+                return ydl.process_ie_result(copy.deepcopy(info), download=True)
+
+            downloaded = retry_with_backoff(
+                lambda: host_limiter.run(url, fetch) if host_limiter is not None else fetch(),
+                retries=config.get('download', {}).get('retries', 3),
+                backoff=config.get('download', {}).get('backoff', 2.0),
+                retry_on=(yt_dlp.utils.DownloadError, OSError),
+                logger=logger
+            )
+            stream_path = ydl.prepare_filename(downloaded)
+            metrics.observe(bytes=os.path.getsize(stream_path))
+
+            partial = temp_output_path(video_path)
+            subprocess.run([
+                'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+                '-i', stream_path, '-i', audio_path,
+                '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-movflags', '+faststart',
+                partial
+            ], check=True)
+            os.replace(partial, video_path)
+            os.remove(stream_path)
+
+            manifest.store(key, _manifest_entry(video_path, downloaded, url, merged=True))
+        logger.info(f"Vídeo completo: {video_path}")
+        return video_path
+
+def wait_for_video(video_path):
+    """Espera o download do vídeo em segundo plano (modo split), se houver; retorna o caminho do .mp4"""
+    with _pending_lock:
+        future = _pending_videos.get(video_path)
+    if future is None:
+        return video_path
+    try:
+        return future.result()
+    finally:
+        with _pending_lock:
+            if _pending_videos.get(video_path) is future:
+                del _pending_videos[video_path]
+
+def _finalize_path(video_path):
+    """Garante que o arquivo final seja .mp4"""
+    if not video_path.endswith('.mp4'):
+        base_path = os.path.splitext(video_path)[0]
+        new_path = base_path + '.mp4'
+        if os.path.exists(video_path) and not os.path.exists(new_path):
+            os.rename(video_path, new_path)
+        video_path = new_path
+    return video_path
 
 def get_video_info(url):
     """Obtém informações do vídeo sem fazer download"""
@@ -71,7 +512,7 @@ def get_video_info(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
     }
-    
+
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
             info = ydl.extract_info(url, download=False)
@@ -82,4 +523,4 @@ def get_video_info(url):
             }
         except Exception as e:
             logger.error(f"Erro ao obter informações do vídeo: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
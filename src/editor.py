@@ -1,11 +1,16 @@
 import os
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-from moviepy.video.tools.subtitles import SubtitlesClip
-from moviepy.config import change_settings
-from utils import setup_logging, load_config
+import tempfile
+import subprocess
+import cv2
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from moviepy.video.io.VideoFileClip import VideoFileClip
+from utils import setup_logging, load_config, temp_output_path
+from captions import make_compositor, burn_subtitles_ffmpeg, load_cues
+from render import probe_duration, probe_keyframes, plan_segments, concat_segments
+import metrics
 import logging
 
-# Configura o caminho do ImageMagick
+# Caminhos do ImageMagick verificados apenas quando o motor textclip é usado
 imagemagick_paths = [
     r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe",
     r"C:\Program Files\ImageMagick-7.1.1-Q16\magick.exe",
@@ -15,15 +20,71 @@ imagemagick_paths = [
     r"C:\Program Files\ImageMagick-7.0.11-Q16\magick.exe"
 ]
 
-for path in imagemagick_paths:
-    if os.path.exists(path):
-        change_settings({"IMAGEMAGICK_BINARY": path})
-        break
+_imagemagick_configured = False
+
+def configure_imagemagick():
+    """Configura o caminho do ImageMagick (uma única vez, no primeiro uso do TextClip)"""
+    global _imagemagick_configured
+    if _imagemagick_configured:
+        return
+    from moviepy.config import change_settings
+    for path in imagemagick_paths:
+        if os.path.exists(path):
+            change_settings({"IMAGEMAGICK_BINARY": path})
+            break
+    _imagemagick_configured = True
 
 logger = setup_logging()
 
+# Perfis de renderização por plataforma. width/height None mantém a resolução
+# original; aspect define o recorte antes do redimensionamento.
+RENDER_PROFILES = {
+    "editado": {
+        "width": None,
+        "height": None,
+        "aspect": None,
+        "bitrate": None,
+        "max_duration": None,
+        "caption": {}
+    },
+    "shorts": {
+        "width": 1080,
+        "height": 1920,
+        "aspect": (9, 16),
+        "bitrate": "8M",
+        "max_duration": 60,
+        "caption": {"font_ratio": 0.035, "width_ratio": 0.85, "position": "bottom", "margin_ratio": 0.15}
+    },
+    "tiktok": {
+        "width": 1080,
+        "height": 1920,
+        "aspect": (9, 16),
+        "bitrate": "6M",
+        "max_duration": 180,
+        "caption": {"font_ratio": 0.035, "width_ratio": 0.8, "position": "bottom", "margin_ratio": 0.22}
+    }
+}
+
 def add_subtitles(video_clip, srt_path, config):
     """Adiciona legendas ao vídeo"""
+    engine = config.get("edit", {}).get("caption_engine", "raster")
+    if engine == "textclip":
+        return add_subtitles_textclip(video_clip, srt_path, config)
+    
+    try:
+        # Rasteriza as legendas com o Pillow (em cache) e mistura em cada quadro
+        compositor = make_compositor(srt_path, video_clip.size, config)
+        return video_clip.fl(lambda get_frame, t: compositor(get_frame(t), t))
+    except Exception as e:
+        logger.error(f"Erro ao adicionar legendas: {str(e)}")
+        return video_clip
+
+def add_subtitles_textclip(video_clip, srt_path, config):
+    """Adiciona legendas com TextClip (ImageMagick) e CompositeVideoClip"""
+    from moviepy.editor import TextClip, CompositeVideoClip
+    from moviepy.video.tools.subtitles import SubtitlesClip
+    
+    configure_imagemagick()
     try:
         # Carrega as legendas
         subs = SubtitlesClip(srt_path, 
@@ -60,7 +121,7 @@ def edit_videos(config):
     final_dir = config["paths"]["final_dir"]
     os.makedirs(final_dir, exist_ok=True)
     
-    # Processa cada vídeo
+    jobs = []
     for filename in os.listdir(input_dir):
         if filename.endswith(".mp4"):
             video_path = os.path.join(input_dir, filename)
@@ -70,26 +131,326 @@ def edit_videos(config):
             if not os.path.exists(srt_path):
                 logger.warning(f"Arquivo de legendas não encontrado para {filename}")
                 continue
-                
+            
+            output_path = os.path.join(final_dir, f"{base_name}_editado.mp4")
+            jobs.append((video_path, srt_path, output_path))
+    
+    # Processa os vídeos (vários ao mesmo tempo se EDIT_PARALLEL_VIDEOS > 1)
+    parallel_videos = max(1, config.get("edit", {}).get("parallel_videos", 1))
+    with ThreadPoolExecutor(max_workers=parallel_videos, thread_name_prefix='edit') as executor:
+        futures = {executor.submit(edit_video, *job, config): job[0] for job in jobs}
+        for future in as_completed(futures):
+            filename = os.path.basename(futures[future])
             try:
-                # Carrega o vídeo
-                video = VideoFileClip(video_path)
-                
-                # Adiciona as legendas
-                video = add_subtitles(video, srt_path, config)
-                
-                # Salva o vídeo editado
-                output_path = os.path.join(final_dir, f"{base_name}_editado.mp4")
-                video.write_videofile(
-                    output_path,
-                    codec='libx264',
-                    audio_codec='aac',
-                    temp_audiofile='temp-audio.m4a',
-                    remove_temp=True
-                )
-                
-                logger.info(f"Vídeo editado salvo em: {output_path}")
-                
+                for output_path in future.result():
+                    logger.info(f"Vídeo editado salvo em: {output_path}")
             except Exception as e:
                 logger.error(f"Erro ao editar {filename}: {str(e)}")
-                continue 
\ No newline at end of file
+
+def edit_video(video_path, srt_path, output_path, config):
+    """Edita um vídeo usando um diretório temporário exclusivo para o job
+
+    Retorna a lista de arquivos gerados (vídeo editado ou perfis, mais os cortes).
+    """
+    with metrics.stage("edit", video_path):
+        outputs = _edit_video(video_path, srt_path, output_path, config)
+        metrics.observe(bytes=sum(os.path.getsize(path) for path in outputs))
+        return outputs
+
+def _edit_video(video_path, srt_path, output_path, config):
+    edit = config.get("edit", {})
+    
+    # Cortes automáticos (highlights), além do vídeo completo
+    cut_outputs = []
+    if edit.get("cuts"):
+        from highlights import load_cuts, detect_cuts
+        cuts = load_cuts(video_path)
+        if cuts is None:
+            cuts = detect_cuts(video_path, config)
+        cut_outputs = render_cuts(video_path, srt_path, cuts, os.path.dirname(output_path), config)
+    
+    # Com perfis configurados, todas as variantes saem de uma única decodificação
+    if edit.get("profiles"):
+        final_dir = os.path.dirname(output_path)
+        return render_profiles(video_path, srt_path, final_dir, edit["profiles"], config) + cut_outputs
+    
+    # O vídeo é gravado em um arquivo temporário e renomeado só quando completo
+    partial_path = temp_output_path(output_path)
+    try:
+        _render_single(video_path, srt_path, partial_path, config)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.replace(partial_path, output_path)
+    return [output_path] + cut_outputs
+
+def _render_single(video_path, srt_path, output_path, config):
+    edit = config.get("edit", {})
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    
+    # Legendas gravadas pelo ffmpeg em uma única passada, sem decodificar no Python
+    if edit.get("caption_engine") == "ffmpeg":
+        return burn_subtitles_ffmpeg(video_path, srt_path, output_path, config)
+    
+    with tempfile.TemporaryDirectory(prefix=f"edit-{base_name}-", dir=edit.get("temp_dir")) as workspace:
+        if edit.get("mode") == "segments":
+            return render_segmented(video_path, srt_path, output_path, workspace, config)
+        
+        # Carrega o vídeo
+        video = VideoFileClip(video_path)
+        try:
+            # Adiciona as legendas
+            video = add_subtitles(video, srt_path, config)
+            
+            # Salva o vídeo editado
+            video.write_videofile(
+                output_path,
+                codec='libx264',
+                audio_codec='aac',
+                temp_audiofile=os.path.join(workspace, 'temp-audio.m4a'),
+                remove_temp=True
+            )
+            metrics.observe(frames=int(video.duration * video.fps))
+        finally:
+            video.close()
+    
+    return output_path
+
+def _render_segment(video_path, srt_path, start, end, output_path, threads, config):
+    """Renderiza (sem áudio) o intervalo [start, end) do vídeo com as legendas"""
+    video = VideoFileClip(video_path, audio=False)
+    try:
+        # As legendas são aplicadas antes do corte para manter os tempos globais
+        clip = add_subtitles(video, srt_path, config).subclip(start, end)
+        clip.write_videofile(
+            output_path,
+            codec='libx264',
+            audio=False,
+            threads=threads,
+            logger=None
+        )
+    finally:
+        video.close()
+    return output_path
+
+def render_segmented(video_path, srt_path, output_path, workspace, config):
+    """Divide o vídeo em quadros-chave, codifica os trechos em paralelo e concatena sem perdas"""
+    edit = config.get("edit", {})
+    workers = edit.get("workers") or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    duration = probe_duration(video_path)
+    segments = plan_segments(probe_keyframes(video_path), duration, workers, edit.get("min_segment_seconds", 10.0))
+    logger.info(f"Renderizando {os.path.basename(video_path)} em {len(segments)} trechos")
+    
+    segment_paths = [os.path.join(workspace, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+    with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+        futures = [
+            executor.submit(_render_segment, video_path, srt_path, start, end, path, threads, config)
+            for (start, end), path in zip(segments, segment_paths)
+        ]
+        for future in futures:
+            future.result()
+    
+    # O áudio original é copiado sem recodificação
+    return concat_segments(segment_paths, video_path, output_path, workspace)
+
+def render_cuts(video_path, srt_path, cuts, final_dir, config):
+    """Renderiza cada corte (lista de {start, end} do highlights) como um vídeo legendado"""
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    edit = config.get("edit", {})
+    outputs = []
+    video = VideoFileClip(video_path)
+    try:
+        # As legendas são aplicadas antes do corte para manter os tempos globais
+        subtitled = add_subtitles(video, srt_path, config)
+        with tempfile.TemporaryDirectory(prefix=f"cuts-{base_name}-", dir=edit.get("temp_dir")) as workspace:
+            for number, cut in enumerate(cuts, 1):
+                output_path = os.path.join(final_dir, f"{base_name}_corte{number:02d}.mp4")
+                partial_path = temp_output_path(output_path)
+                try:
+                    subtitled.subclip(cut["start"], min(cut["end"], video.duration)).write_videofile(
+                        partial_path,
+                        codec='libx264',
+                        audio_codec='aac',
+                        temp_audiofile=os.path.join(workspace, f'corte{number:02d}-audio.m4a'),
+                        remove_temp=True,
+                        logger=None
+                    )
+                except BaseException:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                    raise
+                os.replace(partial_path, output_path)
+                logger.info(f"Corte {number} ({cut['start']:.1f}-{cut['end']:.1f}s) salvo em: {output_path}")
+                outputs.append(output_path)
+    finally:
+        video.close()
+    return outputs
+
+def crop_box(frame_size, aspect):
+    """Maior recorte centralizado com a proporção desejada (x, y, largura, altura)"""
+    width, height = frame_size
+    if not aspect:
+        return 0, 0, width, height
+    aspect_w, aspect_h = aspect
+    crop_w = min(width, int(height * aspect_w / aspect_h))
+    crop_h = min(height, int(width * aspect_h / aspect_w))
+    # Codificadores H.264 exigem dimensões pares
+    crop_w -= crop_w % 2
+    crop_h -= crop_h % 2
+    return (width - crop_w) // 2, (height - crop_h) // 2, crop_w, crop_h
+
+class ProfileEncoder:
+    """Recebe quadros RGB já decodificados e os codifica em uma variante via ffmpeg"""
+    
+    def __init__(self, name, profile, video_path, output_path, source_size, fps, cues, config, track=None):
+        self.name = name
+        self.profile = profile
+        self.output_path = output_path
+        self.max_duration = profile.get("max_duration")
+        self.source_size = source_size
+        self.box = crop_box(source_size, profile.get("aspect"))
+        # Com reenquadramento, a posição do recorte acompanha o CropTrack do vídeo
+        self.track = track if self.box[2] < source_size[0] else None
+        crop_w, crop_h = self.box[2], self.box[3]
+        self.size = (profile.get("width") or crop_w, profile.get("height") or crop_h)
+        self.compositor = make_compositor(None, self.size, config, style=profile.get("caption"), cues=cues)
+        
+        cmd = [
+            "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{self.size[0]}x{self.size[1]}", "-r", str(fps),
+            "-i", "-",
+            "-i", str(video_path),
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", "-movflags", "+faststart"
+        ]
+        if profile.get("bitrate"):
+            cmd += ["-b:v", profile["bitrate"]]
+        if self.max_duration:
+            cmd += ["-t", str(self.max_duration)]
+        self.partial_path = temp_output_path(output_path)
+        cmd.append(self.partial_path)
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self.open = True
+        # ffmpeg encerrou antes de receber todos os quadros (pipe quebrado)
+        self.failed = False
+    
+    def write(self, frame, t):
+        """Recorta, redimensiona, legenda e envia o quadro; fecha ao atingir a duração máxima"""
+        if not self.open:
+            return
+        if self.max_duration and t >= self.max_duration:
+            self.close()
+            return
+        
+        if self.track is not None:
+            x, y, w, h = self.track.box_at(t, self.source_size, self.box[2:])
+        else:
+            x, y, w, h = self.box
+        frame = frame[y:y + h, x:x + w]
+        if (w, h) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        # O compositor copia o quadro ao aplicar a legenda; o recorte do quadro
+        # decodificado (compartilhado entre os perfis) não é alterado
+        frame = self.compositor(frame, t)
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            # Só este perfil para; os demais continuam recebendo os quadros
+            logger.error(f"ffmpeg do perfil {self.name} encerrou antes do fim do vídeo")
+            self.failed = True
+            self.close()
+    
+    def close(self):
+        if self.open:
+            self.open = False
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                self.failed = True
+    
+    def _remove_partial(self):
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+    
+    def abort(self):
+        """Encerra o ffmpeg e apaga a saída parcial"""
+        self.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._remove_partial()
+    
+    def wait(self):
+        self.close()
+        if self.process.wait() != 0 or self.failed:
+            self._remove_partial()
+            raise RuntimeError(f"ffmpeg falhou ao gerar o perfil {self.name}")
+        os.replace(self.partial_path, self.output_path)
+        return self.output_path
+
+def render_profiles(video_path, srt_path, final_dir, profile_names, config):
+    """Gera todas as variantes (perfis) a partir de uma única decodificação do vídeo"""
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    cues = load_cues(srt_path)
+    
+    video = VideoFileClip(video_path, audio=False)
+    encoders = []
+    tracks = {}
+    finished = False
+    try:
+        for name in profile_names:
+            if name not in RENDER_PROFILES:
+                raise ValueError(f"Perfil de renderização desconhecido: {name}")
+            profile = RENDER_PROFILES[name]
+            track = None
+            if config.get("edit", {}).get("reframe") and profile.get("aspect"):
+                # Análise em baixa resolução, uma vez por largura de recorte; perfis
+                # que usam a largura inteira (sem recorte horizontal) não precisam dela
+                crop_fraction = crop_box(video.size, profile["aspect"])[2] / video.size[0]
+                if crop_fraction < 1.0 and crop_fraction not in tracks:
+                    from reframe import analyze
+                    tracks[crop_fraction] = analyze(video_path, video.size, crop_fraction, config)
+                track = tracks.get(crop_fraction)
+            output_path = os.path.join(final_dir, f"{base_name}_{name}.mp4")
+            encoders.append(ProfileEncoder(
+                name, profile, video_path, output_path, video.size, video.fps, cues, config, track=track
+            ))
+        
+        # Cada quadro é decodificado uma vez e distribuído para todos os codificadores
+        frames = 0
+        for t, frame in video.iter_frames(with_times=True, dtype="uint8"):
+            if not any(encoder.open for encoder in encoders):
+                break
+            frames += 1
+            for encoder in encoders:
+                encoder.write(frame, t)
+        metrics.observe(
+            frames=frames,
+            composite_seconds=round(sum(encoder.compositor.busy_seconds for encoder in encoders), 3)
+        )
+        finished = True
+    finally:
+        video.close()
+        for encoder in encoders:
+            if finished:
+                encoder.close()
+            else:
+                # Erro no meio da decodificação: nenhum ffmpeg fica rodando nem deixa arquivo parcial
+                encoder.abort()
+    
+    # Todos os codificadores terminam antes de qualquer erro ser levantado
+    outputs = []
+    failed = []
+    for encoder in encoders:
+        try:
+            outputs.append(encoder.wait())
+        except RuntimeError as e:
+            logger.error(str(e))
+            failed.append(encoder.name)
+    if failed:
+        raise RuntimeError(f"ffmpeg falhou ao gerar os perfis: {', '.join(failed)}")
+    return outputs
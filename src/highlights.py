@@ -0,0 +1,260 @@
+"""Detecção de cortes (highlights) a partir da transcrição e da energia do áudio
+
+Cada janela candidata começa no início de uma frase e termina no fim de uma
+frase. A pontuação combina sinais da transcrição (palavras-chave, densidade
+de fala) com sinais do áudio (volume e picos, p.ex. risadas e aplausos),
+todos somados por prefixos acumulados: pontuar milhares de janelas custa
+O(1) cada uma, e o áudio é lido só uma vez, em taxa reduzida.
+"""
+import os
+import numpy as np
+from pathlib import Path
+from audio import energy_envelope
+from search import KeywordMatcher
+from subtitles import SENTENCE_ENDERS
+from utils import setup_logging, atomic_write_json
+
+logger = setup_logging()
+
+# Resolução (em segundos) dos sinais por quadro
+HOP_SECONDS = 0.1
+
+# Peso de cada sinal na pontuação final
+WEIGHTS = {
+    "energy": 1.0,
+    "spikes": 2.0,
+    "density": 1.0,
+    "keywords": 1.5,
+    "silence": -2.0
+}
+
+# Um pico é um quadro este tanto (dB) acima da média dos 5 s ao redor
+SPIKE_DB = 6.0
+BASELINE_SECONDS = 5.0
+
+# Folga aplicada aos limites do corte para não cortar a primeira/última palavra
+PAD_BEFORE = 0.15
+PAD_AFTER = 0.3
+
+def audio_signals(envelope, hop_seconds=HOP_SECONDS):
+    """Volume padronizado, picos e silêncio por quadro a partir do envelope RMS"""
+    if not len(envelope):
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    db = 20.0 * np.log10(envelope + 1e-6)
+    energy = (db - np.median(db)) / (db.std() + 1e-6)
+
+    # Em trechos mais curtos que a janela, a média cobre o trecho inteiro
+    # (com mode="same", uma janela maior que o sinal mudaria o tamanho da saída)
+    width = max(1, min(int(BASELINE_SECONDS / hop_seconds), len(db)))
+    baseline = np.convolve(db, np.ones(width, dtype=np.float32) / width, mode="same")
+    spikes = (db - baseline > SPIKE_DB).astype(np.float32)
+    silence = (energy < -1.0).astype(np.float32)
+    return energy.astype(np.float32), spikes, silence
+
+def transcript_signals(segments, n_frames, keywords=(), hop_seconds=HOP_SECONDS):
+    """Palavras por segundo e ocorrências de palavras-chave, por quadro"""
+    density = np.zeros(n_frames + 1, dtype=np.float32)
+    hits = np.zeros(n_frames, dtype=np.float32)
+    matcher = KeywordMatcher(keywords) if keywords else None
+
+    starts = np.array([s["start"] for s in segments], dtype=np.float64)
+    ends = np.array([s["end"] for s in segments], dtype=np.float64)
+    n_words = np.array([len(s["text"].split()) for s in segments], dtype=np.float32)
+    first = np.clip((starts / hop_seconds).astype(np.int64), 0, n_frames)
+    last = np.clip((ends / hop_seconds).astype(np.int64), 0, n_frames)
+    rate = n_words / np.maximum(ends - starts, hop_seconds)
+    # Array de diferenças: cada segmento soma sua taxa de palavras no intervalo [início, fim)
+    np.add.at(density, first, rate)
+    np.add.at(density, last, -rate)
+    density = np.cumsum(density)[:n_frames]
+
+    if matcher and n_frames:
+        for segment, frame in zip(segments, first):
+            found = matcher.matches(segment["text"])
+            if found:
+                hits[min(frame, n_frames - 1)] += len(found)
+    return density, hits
+
+def sentence_boundaries(segments):
+    """Índices dos segmentos que começam e dos que terminam uma frase"""
+    ends_sentence = [s["text"].strip().endswith(SENTENCE_ENDERS) for s in segments]
+    starts = [i for i in range(len(segments)) if i == 0 or ends_sentence[i - 1]]
+    ends = [i for i in range(len(segments)) if ends_sentence[i] or i == len(segments) - 1]
+    # Transcrições sem pontuação: qualquer segmento serve de limite
+    if len(starts) < 2 or len(ends) < 2:
+        starts = ends = list(range(len(segments)))
+    return starts, ends
+
+def candidate_windows(segments, min_seconds, max_seconds):
+    """Pares (segmento inicial, segmento final) com duração entre min e max"""
+    starts, ends = sentence_boundaries(segments)
+    end_times = np.array([segments[i]["end"] for i in ends], dtype=np.float64)
+    pairs = []
+    for i in starts:
+        t = segments[i]["start"]
+        lo = np.searchsorted(end_times, t + min_seconds, side="left")
+        hi = np.searchsorted(end_times, t + max_seconds, side="right")
+        pairs.extend((i, ends[j]) for j in range(lo, hi) if ends[j] >= i)
+    return pairs
+
+def _fit(values, n_frames):
+    """Ajusta o sinal para n_frames quadros (quadros sem áudio valem zero)"""
+    fitted = np.zeros(n_frames, dtype=np.float32)
+    fitted[:min(n_frames, len(values))] = values[:n_frames]
+    return fitted
+
+def score_windows(segments, envelope, keywords=(), min_seconds=15.0, max_seconds=60.0, hop_seconds=HOP_SECONDS):
+    """Pontua todas as janelas candidatas; retorna (inícios, fins, pontuações, sinais)"""
+    pairs = candidate_windows(segments, min_seconds, max_seconds)
+    if not pairs:
+        return np.zeros(0), np.zeros(0), np.zeros(0), {}
+
+    duration = max(segments[-1]["end"], len(envelope) * hop_seconds)
+    n_frames = max(1, int(np.ceil(duration / hop_seconds)))
+    energy, spikes, silence = audio_signals(envelope, hop_seconds)
+    signals = {"energy": _fit(energy, n_frames), "spikes": _fit(spikes, n_frames), "silence": _fit(silence, n_frames)}
+    density, hits = transcript_signals(segments, n_frames, keywords, hop_seconds)
+    signals["density"] = density / (density[density > 0].mean() if (density > 0).any() else 1.0)
+    signals["keywords"] = hits
+
+    starts = np.array([segments[i]["start"] for i, _ in pairs])
+    ends = np.array([segments[j]["end"] for _, j in pairs])
+    first = np.clip((starts / hop_seconds).astype(np.int64), 0, n_frames - 1)
+    last = np.clip((ends / hop_seconds).astype(np.int64), first + 1, n_frames)
+    length = (last - first).astype(np.float64)
+
+    scores = np.zeros(len(pairs))
+    means = {}
+    for name, values in signals.items():
+        prefix = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+        total = prefix[last] - prefix[first]
+        # Palavras-chave contam por ocorrência; os demais sinais pela média na janela
+        means[name] = total if name == "keywords" else total / length
+        scores += WEIGHTS[name] * means[name]
+    return starts, ends, scores, means
+
+def select_cuts(starts, ends, scores, count=3):
+    """Melhores janelas sem sobreposição entre si"""
+    chosen = []
+    for index in np.argsort(-scores):
+        if all(ends[index] <= starts[other] or starts[index] >= ends[other] for other in chosen):
+            chosen.append(index)
+            if len(chosen) == count:
+                break
+    return chosen
+
+def find_highlights(video_path, segments, config, envelope=None):
+    """Lista de cortes (início, fim, pontuação, texto), da melhor para a pior"""
+    options = config.get("highlights", {})
+    keywords = options.get("keywords") or []
+    if not segments:
+        return []
+    if envelope is None:
+        envelope = energy_envelope(video_path, sample_rate=options.get("sample_rate", 8000), hop_seconds=HOP_SECONDS)
+
+    starts, ends, scores, means = score_windows(
+        segments, envelope, keywords,
+        min_seconds=options.get("min_seconds", 15.0),
+        max_seconds=options.get("max_seconds", 60.0)
+    )
+    duration = max(segments[-1]["end"], len(envelope) * HOP_SECONDS)
+    matcher = KeywordMatcher(keywords) if keywords else None
+    cuts = []
+    for index in select_cuts(starts, ends, scores, options.get("count", 3)):
+        start, end = float(starts[index]), float(ends[index])
+        text = " ".join(s["text"].strip() for s in segments if s["start"] >= start and s["end"] <= end)
+        cuts.append({
+            "start": round(max(0.0, start - PAD_BEFORE), 3),
+            "end": round(min(duration, end + PAD_AFTER), 3),
+            "score": round(float(scores[index]), 4),
+            "signals": {name: round(float(values[index]), 4) for name, values in means.items()},
+            "keywords": [keywords[i] for i in matcher.matches(text)] if matcher else [],
+            "text": text
+        })
+    return cuts
+
+def cuts_path(video_path):
+    return f"{os.path.splitext(video_path)[0]}.cuts.json"
+
+def _transcript_path(video_path):
+    """Transcrição (.tsc ou .json) ao lado do vídeo, ou None"""
+    base_path = os.path.splitext(video_path)[0]
+    for extension in (".tsc", ".json"):
+        if os.path.exists(base_path + extension):
+            return base_path + extension
+    return None
+
+def transcript_fingerprint(video_path):
+    """Arquivo, tamanho e data de modificação da transcrição usada nos cortes (None sem transcrição)"""
+    path = _transcript_path(video_path)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return {"file": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def detect_cuts(video_path, config, transcript=None):
+    """Detecta os cortes do vídeo e grava a lista em <vídeo>.cuts.json"""
+    from transcript_store import read_transcript
+
+    if transcript is None:
+        path = _transcript_path(video_path)
+        if path is None:
+            raise FileNotFoundError(f"Transcrição não encontrada para {video_path}")
+        transcript = read_transcript(path, words=False)
+
+    cuts = find_highlights(video_path, transcript["segments"], config)
+    atomic_write_json(cuts_path(video_path), {
+        "video": Path(video_path).name,
+        "transcript": transcript_fingerprint(video_path),
+        "cuts": cuts
+    }, indent=2)
+    logger.info(f"{len(cuts)} cortes encontrados em {os.path.basename(video_path)}")
+    return cuts
+
+def load_cuts(video_path):
+    """Cortes gravados para o vídeo
+
+    None se ainda não foram detectados ou se a transcrição mudou desde então
+    (p.ex. retranscrita com outro modelo).
+    """
+    import json
+
+    path = cuts_path(video_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    current = transcript_fingerprint(video_path)
+    if current is None or document.get("transcript") != current:
+        logger.info(f"Transcrição de {os.path.basename(video_path)} mudou, detectando os cortes de novo")
+        return None
+    return document["cuts"]
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from utils import load_config
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Detecta os melhores cortes dos vídeos transcritos')
+    parser.add_argument('videos', nargs='*', help='Vídeos (padrão: todos do diretório de originais)')
+    parser.add_argument('--render', action='store_true', help='Renderiza os cortes encontrados')
+    args = parser.parse_args()
+
+    config = load_config()
+    input_dir = config["paths"]["input_dir"]
+    videos = args.videos or [
+        os.path.join(input_dir, filename) for filename in sorted(os.listdir(input_dir)) if filename.endswith(".mp4")
+    ]
+    for video_path in videos:
+        try:
+            cuts = detect_cuts(video_path, config)
+            for cut in cuts:
+                print(f"{os.path.basename(video_path)}  {cut['start']:.1f}-{cut['end']:.1f}s  "
+                      f"score={cut['score']:.2f}  {cut['text'][:80]}")
+            if args.render and cuts:
+                from editor import render_cuts
+                render_cuts(video_path, f"{os.path.splitext(video_path)[0]}.srt", cuts, config["paths"]["final_dir"], config)
+        except Exception as e:
+            logger.error(f"Erro ao detectar cortes de {video_path}: {str(e)}")
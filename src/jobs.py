@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from utils import setup_logging, file_sha256
+
+logger = setup_logging()
+
+# Estados de um vídeo, na ordem; cada etapa leva ao estado seguinte
+STATES = ['queued', 'downloaded', 'transcribed', 'rendered', 'uploaded']
+STAGE_STATES = {
+    'download': 'downloaded',
+    'transcribe': 'transcribed',
+    'edit': 'rendered',
+    'upload': 'uploaded'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL UNIQUE,
+    video_path TEXT,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    stage TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage, path)
+);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    stage TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    success INTEGER,
+    error TEXT
+);
+"""
+
+class InvalidTransition(Exception):
+    """Transição de estado fora da ordem queued → downloaded → transcribed → rendered → uploaded"""
+
+class JobStore:
+    """Estado persistente (SQLite) de cada vídeo do pipeline"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                results = [self._conn.execute(sql, params) for sql, params in statements]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return results
+
+    def add(self, source, video_path=None, state='queued'):
+        """Registra um vídeo (URL ou arquivo local) e retorna o id do job"""
+        now = time.time()
+        self._transaction([(
+            "INSERT OR IGNORE INTO jobs (source, video_path, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (source, video_path, state, now, now)
+        )])
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM jobs WHERE source = ?", (source,)).fetchone()
+        return row['id']
+
+    def get(self, job_id):
+        """Job com os artefatos de cada etapa"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            artifacts = self._conn.execute(
+                "SELECT stage, path, size, sha256 FROM artifacts WHERE job_id = ? ORDER BY created_at", (job_id,)
+            ).fetchall()
+        if row is None:
+            return None
+        job = dict(row)
+        job['artifacts'] = {}
+        for artifact in artifacts:
+            job['artifacts'].setdefault(artifact['stage'], []).append(dict(artifact))
+        return job
+
+    def unfinished(self):
+        """Ids dos jobs que ainda não chegaram ao último estado"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE state != ? ORDER BY id", (STATES[-1],)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def start(self, job_id, stage):
+        """Marca o início de uma tentativa da etapa e retorna o id da execução"""
+        now = time.time()
+        _, run = self._transaction([
+            ("UPDATE jobs SET attempts = attempts + 1, updated_at = ? WHERE id = ?", (now, job_id)),
+            ("INSERT INTO stage_runs (job_id, stage, started_at) VALUES (?, ?, ?)", (job_id, stage, now))
+        ])
+        return run.lastrowid
+
+    def complete(self, job_id, run_id, stage, artifacts=(), video_path=None, strict=True):
+        """Conclui a etapa: grava artefatos (tamanho + hash), tempo e avança o estado
+
+        Com strict=False um estado pode ser pulado (etapas desativadas com --skip-*).
+        """
+        job = self.get(job_id)
+        new_state = STAGE_STATES[stage]
+        if strict and STATES.index(new_state) > STATES.index(job['state']) + 1:
+            raise InvalidTransition(f"{job['state']} -> {new_state} (job {job_id})")
+
+        now = time.time()
+        statements = [("DELETE FROM artifacts WHERE job_id = ? AND stage = ?", (job_id, stage))]
+        for path in artifacts:
+            statements.append((
+                "INSERT OR REPLACE INTO artifacts (job_id, stage, path, size, sha256, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, stage, str(path), os.path.getsize(path), file_sha256(path), now)
+            ))
+        # Um estado nunca regride (ex.: refazer a transcrição de um vídeo já enviado)
+        if STATES.index(new_state) > STATES.index(job['state']):
+            statements.append(("UPDATE jobs SET state = ? WHERE id = ?", (new_state, job_id)))
+        statements += [
+            ("UPDATE jobs SET video_path = COALESCE(?, video_path), last_error = NULL, updated_at = ? WHERE id = ?",
+             (video_path, now, job_id)),
+            ("UPDATE stage_runs SET finished_at = ?, success = 1 WHERE id = ?", (now, run_id))
+        ]
+        self._transaction(statements)
+
+    def fail(self, job_id, run_id, error):
+        now = time.time()
+        self._transaction([
+            ("UPDATE jobs SET last_error = ?, updated_at = ? WHERE id = ?", (error, now, job_id)),
+            ("UPDATE stage_runs SET finished_at = ?, success = 0, error = ? WHERE id = ?", (now, error, run_id))
+        ])
+
+    def is_done(self, job, stage):
+        """A etapa já foi concluída e os artefatos continuam no disco, com o mesmo tamanho"""
+        if STATES.index(job['state']) < STATES.index(STAGE_STATES[stage]):
+            return False
+        return all(
+            os.path.exists(artifact['path']) and os.path.getsize(artifact['path']) == artifact['size']
+            for artifact in job['artifacts'].get(stage, [])
+        )
+
+    def summary(self):
+        """Quantidade de jobs em cada estado"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS total FROM jobs GROUP BY state").fetchall()
+        return {row['state']: row['total'] for row in rows}
+
+def open_job_store(config):
+    """Abre o banco de jobs configurado (JOBS_DB)"""
+    return JobStore(config.get('jobs', {}).get('db', './videos/jobs.sqlite3'))
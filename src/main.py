@@ -1,10 +1,8 @@
 import argparse
 import os
 from dotenv import load_dotenv
-from downloader import download_videos
-from transcriber import transcribe_videos
-from editor import edit_videos
-from uploader import upload_videos
+from stages import STAGES, run_stage
+import metrics
 from utils import setup_logging, load_config
 
 def main():
@@ -13,12 +11,20 @@ def main():
     
     # Configura o parser de argumentos
     parser = argparse.ArgumentParser(description='Automatizador de Vídeos para Redes Sociais')
-    parser.add_argument('--input', required=True, help='Arquivo com URLs dos vídeos')
+    parser.add_argument('--input', help='Arquivo com URLs dos vídeos')
     parser.add_argument('--skip-download', action='store_true', help='Pular etapa de download')
     parser.add_argument('--skip-transcription', action='store_true', help='Pular etapa de transcrição')
+    parser.add_argument('--skip-translation', action='store_true', help='Pular a tradução das legendas')
     parser.add_argument('--skip-edit', action='store_true', help='Pular etapa de edição')
     parser.add_argument('--skip-upload', action='store_true', help='Pular etapa de upload')
+    parser.add_argument('--force', action='store_true', help='Transcrever novamente vídeos já transcritos')
+    parser.add_argument('--pipeline', action='store_true', help='Executar as etapas sobrepostas, vídeo a vídeo')
+    parser.add_argument('--resume', action='store_true', help='Retomar os vídeos não concluídos registrados no banco de jobs')
+    parser.add_argument('--daemon', action='store_true', help='Executar continuamente, observando a pasta de entrada e o inbox de URLs')
+    parser.add_argument('--profile', choices=list(STAGES), help='Gravar perfis do cProfile de cada execução da etapa')
     args = parser.parse_args()
+    if not args.input and not (args.resume or args.daemon):
+        parser.error('--input é obrigatório (exceto com --resume ou --daemon)')
 
     # Configura logging
     logger = setup_logging()
@@ -26,33 +32,60 @@ def main():
 
     # Carrega configurações
     config = load_config()
+    config["transcription"]["force"] = args.force
+    metrics.configure(config, profile_stage=args.profile)
 
     try:
-        # Download dos vídeos
-        if not args.skip_download:
-            logger.info("Iniciando download dos vídeos")
-            download_videos(args.input, config)
-        else:
-            logger.info("Pulando etapa de download")
+        if args.daemon:
+            from daemon import run_daemon
+            
+            logger.info("Executando em modo daemon")
+            run_daemon(
+                config,
+                urls_file=args.input,
+                skip_download=args.skip_download,
+                skip_transcription=args.skip_transcription,
+                skip_edit=args.skip_edit,
+                skip_upload=args.skip_upload,
+                skip_translation=args.skip_translation
+            )
+            return
         
-        # Transcrição dos vídeos
-        if not args.skip_transcription:
-            logger.info("Iniciando transcrição dos vídeos")
-            transcribe_videos(config)
-        else:
-            logger.info("Pulando etapa de transcrição")
+        if args.pipeline or args.resume:
+            from pipeline import run_pipeline
+            
+            logger.info("Executando em modo pipeline")
+            run_pipeline(
+                args.input,
+                config,
+                skip_download=args.skip_download,
+                skip_transcription=args.skip_transcription,
+                skip_edit=args.skip_edit,
+                skip_upload=args.skip_upload,
+                resume=args.resume,
+                skip_translation=args.skip_translation
+            )
+            logger.info("Processo concluído com sucesso!")
+            return
         
-        # Edição dos vídeos
-        if not args.skip_edit:
-            logger.info("Iniciando edição dos vídeos")
-            edit_videos(config)
-        
-        # Upload dos vídeos
-        if not args.skip_upload:
-            logger.info("Iniciando upload dos vídeos")
-            upload_videos(config)
-        else:
-            logger.info("Pulando etapa de upload")
+        # Só os módulos das etapas executadas (e suas dependências) são importados
+        skipped = {
+            'download': args.skip_download,
+            'transcribe': args.skip_transcription,
+            # A tradução parte das transcrições: pulada junto com a transcrição
+            'translate': args.skip_transcription or args.skip_translation,
+            'edit': args.skip_edit,
+            'upload': args.skip_upload
+        }
+        for name, stage in STAGES.items():
+            if skipped.get(name):
+                logger.info(f"Pulando etapa de {stage.description}")
+                continue
+            logger.info(f"Iniciando etapa de {stage.description}")
+            if name == 'download':
+                run_stage(name, args.input, config)
+            else:
+                run_stage(name, config)
         
         logger.info("Processo concluído com sucesso!")
     
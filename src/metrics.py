@@ -0,0 +1,161 @@
+"""Métricas por vídeo e por etapa: tempo, bytes, RTF da transcrição, fps da renderização e pico de memória
+
+Cada execução de etapa vira uma linha no arquivo JSON Lines (METRICS_JSONL) e
+atualiza os totais do arquivo texto do Prometheus (METRICS_PROM, para o
+textfile collector do node_exporter). Com --profile ETAPA, cada execução da
+etapa é gravada também como perfil do cProfile (.prof, lido por pstats,
+snakeviz etc.).
+"""
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from utils import setup_logging, atomic_write
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de memória não é registrado
+    resource = None
+
+logger = setup_logging()
+
+PREFIX = "tiktok_automation"
+
+_lock = threading.Lock()
+_local = threading.local()
+_settings = {"enabled": False, "jsonl": None, "prom": None, "profile": None, "profile_dir": None}
+_totals = {}
+_gauges = {}
+
+def configure(config, profile_stage=None):
+    """Ativa a coleta com os arquivos configurados; profile_stage liga o cProfile da etapa"""
+    options = config.get("metrics", {})
+    with _lock:
+        _settings.update(
+            enabled=options.get("enabled", True),
+            jsonl=options.get("jsonl"),
+            prom=options.get("prom"),
+            profile=profile_stage,
+            profile_dir=options.get("profile_dir", "./videos/profiles")
+        )
+    if profile_stage:
+        logger.info(f"Perfis da etapa {profile_stage} em {_settings['profile_dir']} (PID {os.getpid()}, também compatível com py-spy)")
+
+def peak_rss_bytes():
+    """Pico de memória residente do processo e dos processos filhos (ex.: ffmpeg) já encerrados"""
+    if resource is None:
+        return None, None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    )
+
+def observe(**fields):
+    """Acrescenta campos (bytes, frames, audio_seconds...) à etapa em andamento nesta thread"""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.update(fields)
+
+@contextmanager
+def stage(name, video=None):
+    """Mede uma execução de etapa para um vídeo; o registro é gravado ao sair"""
+    record = {"stage": name, "video": os.path.basename(str(video)) if video else None}
+    outer = getattr(_local, "record", None)
+    _local.record = record
+    profiler = None
+    if _settings["profile"] == name:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.time()
+    cpu_started = time.thread_time()
+    status = "error"
+    try:
+        yield record
+        status = "ok"
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _local.record = outer
+        record.update(
+            status=status,
+            started_at=started,
+            seconds=round(time.time() - started, 4),
+            cpu_seconds=round(time.thread_time() - cpu_started, 4)
+        )
+        if profiler is not None:
+            _dump_profile(profiler, record)
+        _finish(record)
+
+def _dump_profile(profiler, record):
+    directory = Path(_settings["profile_dir"])
+    directory.mkdir(parents=True, exist_ok=True)
+    video = Path(record["video"] or "lote").stem
+    path = directory / f"{record['stage']}-{video}-{int(record['started_at'])}.prof"
+    profiler.dump_stats(str(path))
+    record["profile"] = str(path)
+
+def _finish(record):
+    """Calcula os derivados (RTF, fps, vazão), grava a linha JSON e o arquivo do Prometheus"""
+    if record.get("audio_seconds"):
+        record["rtf"] = round(record["seconds"] / record["audio_seconds"], 4)
+    if record.get("frames"):
+        record["fps"] = round(record["frames"] / max(record["seconds"], 1e-6), 2)
+    if record.get("bytes"):
+        record["bytes_per_second"] = round(record["bytes"] / max(record["seconds"], 1e-6))
+    record["peak_rss_bytes"], record["children_peak_rss_bytes"] = peak_rss_bytes()
+
+    if not _settings["enabled"]:
+        return
+    with _lock:
+        totals = _totals.setdefault(record["stage"], {"runs_ok": 0, "runs_error": 0, "seconds": 0.0, "bytes": 0})
+        totals[f"runs_{record['status']}"] += 1
+        totals["seconds"] += record["seconds"]
+        totals["bytes"] += record.get("bytes") or 0
+        for key in ("rtf", "fps", "peak_rss_bytes"):
+            if record.get(key) is not None:
+                _gauges[(key, record["stage"])] = record[key]
+
+        if _settings["jsonl"]:
+            path = Path(_settings["jsonl"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if _settings["prom"]:
+            atomic_write(_settings["prom"], _prometheus_text())
+
+def _prometheus_text():
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{label}="{text}"' for label, text in labels.items())
+            lines.append(f"{PREFIX}_{name}{{{label_text}}} {value}")
+
+    metric("stage_runs_total", "counter", "Execuções de etapa por resultado", [
+        ({"stage": stage, "status": status}, totals[f"runs_{status}"])
+        for stage, totals in sorted(_totals.items()) for status in ("ok", "error")
+    ])
+    metric("stage_seconds_total", "counter", "Tempo total gasto em cada etapa", [
+        ({"stage": stage}, round(totals["seconds"], 4)) for stage, totals in sorted(_totals.items())
+    ])
+    metric("stage_bytes_total", "counter", "Bytes processados (baixados, gravados ou enviados) por etapa", [
+        ({"stage": stage}, totals["bytes"]) for stage, totals in sorted(_totals.items())
+    ])
+    for key, help_text in (
+        ("rtf", "Fator de tempo real da última transcrição (tempo de processamento / duração do áudio)"),
+        ("fps", "Quadros por segundo da última renderização"),
+        ("peak_rss_bytes", "Pico de memória residente do processo ao fim da última execução")
+    ):
+        samples = [({"stage": stage}, value) for (name, stage), value in sorted(_gauges.items()) if name == key]
+        if samples:
+            metric(key, "gauge", help_text, samples)
+    return "\n".join(lines) + "\n"
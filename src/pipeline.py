@@ -0,0 +1,320 @@
+import os
+import queue
+import threading
+from pathlib import Path
+from utils import setup_logging
+
+logger = setup_logging()
+
+# Marca o fim da fila para os workers de uma etapa
+_DONE = object()
+
+class Stage:
+    """Etapa do pipeline: func(item) processa um vídeo e devolve o item atualizado"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+class Pipeline:
+    """Executa as etapas em paralelo, com filas limitadas entre elas
+
+    Cada vídeo avança pelas etapas de forma independente; quando a fila da
+    etapa seguinte está cheia, a etapa anterior espera (backpressure).
+    """
+
+    def __init__(self, stages, queue_size=2, keep_results=True):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+        self.keep_results = keep_results
+        self.results = []
+        self.failures = []
+        self._lock = threading.Lock()
+        self._remaining = [stage.workers for stage in stages]
+        self._threads = []
+
+    def stage_index(self, name):
+        """Posição da etapa no pipeline (None se estiver desativada)"""
+        for index, stage in enumerate(self.stages):
+            if stage.name == name:
+                return index
+        return None
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        in_queue = self.queues[index]
+        is_last = index == len(self.stages) - 1
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    break
+                try:
+                    item = stage.func(item)
+                except Exception as e:
+                    logger.error(f"[{stage.name}] Erro ao processar {describe(item)}: {str(e)}")
+                    if self.keep_results:
+                        with self._lock:
+                            self.failures.append({'stage': stage.name, 'item': item, 'error': str(e)})
+                    continue
+                if item is None:
+                    continue
+                if is_last:
+                    if self.keep_results:
+                        with self._lock:
+                            self.results.append(item)
+                else:
+                    self.queues[index + 1].put(item)
+        finally:
+            # O último worker a terminar encerra a etapa seguinte, mesmo se este
+            # worker morrer com um BaseException (senão join() não retorna)
+            with self._lock:
+                self._remaining[index] -= 1
+                finished = self._remaining[index] == 0
+            if finished and not is_last:
+                for _ in range(self.stages[index + 1].workers):
+                    self.queues[index + 1].put(_DONE)
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._worker, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item, stage=0):
+        """Enfileira um item na etapa indicada (bloqueia se a fila estiver cheia)"""
+        self.queues[stage].put(item)
+
+    def close(self):
+        """Não aceita mais itens; as etapas terminam depois de esvaziar as filas"""
+        for _ in range(self.stages[0].workers):
+            self.queues[0].put(_DONE)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        return self.results, self.failures
+
+    def run(self, items):
+        """Processa os itens e retorna (resultados, falhas)"""
+        self.start()
+        for item in items:
+            self.submit(item)
+        self.close()
+        return self.join()
+
+def with_artifacts(item, stage, paths, **updates):
+    """Item atualizado com os arquivos produzidos pela etapa"""
+    artifacts = {**item.get('artifacts', {}), stage: [str(path) for path in paths]}
+    return {**item, **updates, 'artifacts': artifacts}
+
+def track(stage, store, strict=True):
+    """Registra a etapa no banco de jobs e pula o que já foi concluído
+
+    A transcrição nunca é pulada pelo estado do job: o fingerprint do
+    transcriber decide (opções alteradas, --force). Quando ela refaz a
+    transcrição ou as legendas, as etapas seguintes também são refeitas.
+    """
+    func = stage.func
+    
+    def run(item):
+        job = store.get(item['job_id'])
+        rerun = stage.name == 'transcribe' or item.get('retranscribed')
+        if not rerun and store.is_done(job, stage.name):
+            logger.info(f"[{stage.name}] Já concluído, pulando: {describe(item)}")
+            paths = [artifact['path'] for artifact in job['artifacts'].get(stage.name, [])]
+            updates = {'video_path': job['video_path']} if job['video_path'] else {}
+            if stage.name == 'edit':
+                updates['outputs'] = paths
+            return with_artifacts(item, stage.name, paths, **updates)
+        
+        run_id = store.start(job['id'], stage.name)
+        try:
+            item = func(item)
+        except Exception as e:
+            store.fail(job['id'], run_id, str(e))
+            raise
+        store.complete(
+            job['id'], run_id, stage.name,
+            artifacts=item.get('artifacts', {}).get(stage.name, []),
+            video_path=item.get('video_path'),
+            strict=strict
+        )
+        return item
+    
+    stage.func = run
+    return stage
+
+def describe(item):
+    """Nome curto do vídeo para os logs"""
+    if item.get('video_path'):
+        return os.path.basename(item['video_path'])
+    return item.get('url', '?')
+
+def audio_source(item):
+    """Faixa de áudio do download split, enquanto o .mp4 final ainda não existe"""
+    if item.get('audio_path'):
+        return item['audio_path']
+    if os.path.exists(item['video_path']):
+        return None
+    # Retomada: o download registrou só o áudio
+    paths = [path for path in item.get('artifacts', {}).get('download', []) if path != item['video_path']]
+    return paths[0] if paths else None
+
+def ensure_video(item, config):
+    """Garante o .mp4 completo antes da edição (download split em segundo plano ou interrompido)"""
+    if not config.get('download', {}).get('split'):
+        return
+    from downloader import wait_for_video, download_single_video
+
+    wait_for_video(item['video_path'])
+    if not os.path.exists(item['video_path']) and item.get('url', '').startswith(('http://', 'https://')):
+        logger.info(f"[edit] Vídeo incompleto de uma execução anterior, baixando: {item['url']}")
+        download_single_video(item['url'], config)
+
+def build_stages(config, skip_download=False, skip_transcription=False, skip_edit=False, skip_upload=False,
+                 skip_translation=False):
+    """Monta as etapas habilitadas; etapas puladas não bloqueiam as seguintes"""
+    workers = config.get('pipeline', {})
+    stages = []
+
+    if not skip_download:
+        from downloader import make_downloader
+        download = make_downloader(config)
+
+        def download_stage(item):
+            info = download(item['url'])
+            if info.get('audio_path'):
+                # Download split: o vídeo ainda está sendo baixado; a transcrição usa só o áudio
+                return with_artifacts(item, 'download', [info['audio_path']], video_path=info['path'],
+                                      audio_path=info['audio_path'], title=info['title'])
+            return with_artifacts(item, 'download', [info['path']], video_path=info['path'], title=info['title'])
+
+        stages.append(Stage('download', download_stage, workers.get('download_workers', 4)))
+
+    if not skip_transcription:
+        from transcriber import transcribe_video, transcript_path
+
+        translator = None
+        if config.get('translation', {}).get('languages') and not skip_translation:
+            from translator import get_translator, translate_video
+            # Um único tradutor: o cache e o limite de requisições valem para todos os vídeos
+            translator = get_translator(config)
+
+        def transcribe_stage(item):
+            # None: transcrição e legendas já correspondem ao vídeo e às opções atuais
+            result = transcribe_video(item['video_path'], config, audio_path=audio_source(item))
+            base_path = os.path.splitext(item['video_path'])[0]
+            paths = [transcript_path(base_path, config)]
+            paths += [f"{base_path}.{fmt}" for fmt in config['subtitles']['formats']]
+            if translator is not None:
+                paths += translate_video(item['video_path'], config, translator)
+            return with_artifacts(item, 'transcribe', paths, retranscribed=result is not None)
+
+        stages.append(Stage('transcribe', transcribe_stage, workers.get('transcribe_workers', 1)))
+
+    if not skip_edit:
+        from editor import edit_video
+
+        def edit_stage(item):
+            ensure_video(item, config)
+            base_path = os.path.splitext(item['video_path'])[0]
+            srt_path = f"{base_path}.srt"
+            if not os.path.exists(srt_path):
+                raise FileNotFoundError(f"Arquivo de legendas não encontrado: {srt_path}")
+            final_dir = config['paths']['final_dir']
+            os.makedirs(final_dir, exist_ok=True)
+            output_path = os.path.join(final_dir, f"{os.path.basename(base_path)}_editado.mp4")
+            outputs = edit_video(item['video_path'], srt_path, output_path, config)
+            return with_artifacts(item, 'edit', outputs, outputs=outputs)
+
+        stages.append(Stage('edit', edit_stage, workers.get('edit_workers', 1)))
+
+    if not skip_upload:
+        from uploader import upload_video, get_upload_sessions
+
+        if not skip_edit and not config.get('edit', {}).get('profiles'):
+            logger.warning("EDIT_PROFILES vazio: a edição gera só o _editado e nada será enviado "
+                           "(use EDIT_PROFILES=shorts,tiktok)")
+
+        sessions = get_upload_sessions(config)
+
+        def upload_stage(item):
+            outputs = item.get('outputs')
+            if outputs is None:
+                # Edição pulada: envia os arquivos já existentes deste vídeo
+                base_name = Path(item['video_path']).stem
+                outputs = [str(path) for path in Path(config['paths']['final_dir']).glob(f"{base_name}_*.mp4")]
+            for output in outputs:
+                # O serviço do YouTube fica em cache no uploader: autentica uma vez, no primeiro upload
+                upload_video(output, config, sessions=sessions)
+            return item
+
+        stages.append(Stage('upload', upload_stage, workers.get('upload_workers', 1)))
+
+    return stages
+
+def job_item(store, job_id):
+    """Item do pipeline a partir do job registrado no banco"""
+    job = store.get(job_id)
+    item = {'job_id': job_id, 'url': job['source']}
+    if job['video_path']:
+        item['video_path'] = job['video_path']
+    return item
+
+def add_local_video(store, video_path):
+    """Registra um vídeo local (já baixado) como job"""
+    video_path = os.path.abspath(video_path)
+    return store.add(Path(video_path).as_uri(), video_path=video_path, state='downloaded')
+
+def build_tracked_stages(store, config, skip_download=False, skip_transcription=False, skip_edit=False,
+                         skip_upload=False, skip_translation=False):
+    """Etapas habilitadas, já registrando o progresso no banco de jobs"""
+    skipped = skip_download or skip_transcription or skip_edit or skip_upload
+    stages = build_stages(config, skip_download, skip_transcription, skip_edit, skip_upload, skip_translation)
+    return [track(stage, store, strict=not skipped) for stage in stages]
+
+def run_pipeline(urls_file, config, skip_download=False, skip_transcription=False, skip_edit=False,
+                 skip_upload=False, resume=False, skip_translation=False):
+    """Executa download, transcrição, edição e upload sobrepostos, vídeo a vídeo
+
+    O progresso de cada vídeo fica no banco de jobs; etapas já concluídas
+    (com os artefatos intactos) não são refeitas, salvo quando a transcrição
+    muda (opções alteradas ou --force).
+    """
+    from jobs import open_job_store
+    
+    store = open_job_store(config)
+    try:
+        stages = build_tracked_stages(store, config, skip_download, skip_transcription, skip_edit, skip_upload,
+                                      skip_translation)
+        if not stages:
+            logger.info("Nenhuma etapa habilitada")
+            return [], []
+        
+        if resume:
+            # Retoma os vídeos que não chegaram ao fim na execução anterior
+            job_ids = store.unfinished()
+        elif skip_download:
+            # Sem download, os vídeos já presentes no diretório de originais entram no pipeline
+            input_dir = config['paths']['input_dir']
+            job_ids = [
+                add_local_video(store, os.path.join(input_dir, filename))
+                for filename in sorted(os.listdir(input_dir))
+                if filename.endswith('.mp4')
+            ]
+        else:
+            from downloader import read_urls
+            job_ids = [store.add(url) for url in read_urls(urls_file)]
+        
+        pipeline = Pipeline(stages, queue_size=config.get('pipeline', {}).get('queue_size', 2))
+        results, failures = pipeline.run(job_item(store, job_id) for job_id in job_ids)
+        logger.info(f"Pipeline finalizado: {len(results)} vídeos concluídos, {len(failures)} com falha")
+        logger.info(f"Estado dos jobs: {store.summary()}")
+        return results, failures
+    finally:
+        store.close()
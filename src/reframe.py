@@ -0,0 +1,171 @@
+"""Reenquadramento automático (ex.: 16:9 -> 9:16) a partir de quadros em baixa resolução
+
+O vídeo é amostrado poucas vezes por segundo, já reduzido e em tons de cinza,
+por um pipe do ffmpeg. Em cada amostra, a região de interesse combina
+movimento, contraste e rostos (OpenCV); as trocas de cena dividem o vídeo em
+tomadas, e dentro de cada tomada a posição do recorte é suavizada.
+"""
+import tempfile
+import subprocess
+import numpy as np
+import cv2
+from utils import setup_logging
+
+logger = setup_logging()
+
+# Diferença de histograma (0-1) a partir da qual duas amostras são tomadas diferentes
+SHOT_THRESHOLD = 0.35
+
+# Peso de cada sinal no mapa de interesse
+MOTION_WEIGHT = 1.0
+EDGE_WEIGHT = 0.5
+FACE_WEIGHT = 4.0
+
+_face_detector = None
+
+def _faces(gray):
+    """Retângulos dos rostos detectados (vazio se o classificador não estiver disponível)"""
+    global _face_detector
+    if _face_detector is None:
+        _face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    if _face_detector.empty():
+        return []
+    return _face_detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4, minSize=(12, 12))
+
+def analysis_size(source_size, width):
+    """Tamanho (par) das amostras, com a proporção do vídeo original"""
+    source_w, source_h = source_size
+    height = max(2, int(round(width * source_h / source_w / 2)) * 2)
+    return width, height
+
+def iter_samples(video_path, source_size, width=256, fps=4.0):
+    """Amostras (tempo, quadro em cinza) em baixa resolução e taxa reduzida
+
+    Levanta RuntimeError (com a saída de erro do ffmpeg) se a decodificação falhar.
+    """
+    width, height = analysis_size(source_size, width)
+    cmd = [
+        "ffmpeg", "-nostdin", "-nostats", "-loglevel", "error", "-threads", "0",
+        "-an", "-sn", "-i", str(video_path),
+        "-vf", f"fps={fps},scale={width}:{height}:flags=fast_bilinear",
+        "-f", "rawvideo", "-pix_fmt", "gray", "-"
+    ]
+    # A saída de erro vai para um arquivo temporário: um pipe cheio travaria o ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        frame_bytes = width * height
+        index = 0
+        finished = False
+        try:
+            while True:
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                yield index / fps, np.frombuffer(data, np.uint8).reshape(height, width)
+                index += 1
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished and process.poll() is None:
+                # Gerador fechado antes do fim: o ffmpeg é encerrado sem erro
+                process.kill()
+            process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"Erro ao decodificar {video_path}: {message or f'ffmpeg saiu com código {process.returncode}'}")
+
+def interest_profile(gray, previous):
+    """Interesse de cada coluna do quadro (movimento + contraste + rostos)"""
+    frame = gray.astype(np.float32)
+    edges = np.abs(np.diff(frame, axis=1, prepend=frame[:, :1])) + np.abs(np.diff(frame, axis=0, prepend=frame[:1]))
+    interest = EDGE_WEIGHT * edges / (edges.mean() + 1e-6)
+    if previous is not None:
+        motion = np.abs(frame - previous)
+        interest += MOTION_WEIGHT * motion / (motion.mean() + 1e-6)
+    columns = interest.sum(axis=0)
+    for x, _, w, _ in _faces(gray):
+        columns[x:x + w] += FACE_WEIGHT * columns.mean()
+    return columns
+
+def best_center(columns, crop_fraction):
+    """Centro (0-1) da janela de largura crop_fraction com mais interesse"""
+    width = len(columns)
+    window = max(1, int(round(width * crop_fraction)))
+    if window >= width:
+        return 0.5
+    sums = np.convolve(columns, np.ones(window, dtype=np.float32), mode="valid")
+    return (int(np.argmax(sums)) + window / 2) / width
+
+def histogram_distance(a, b):
+    """Distância entre histogramas normalizados (0 = iguais, 1 = disjuntos)"""
+    return 0.5 * np.abs(a - b).sum()
+
+def smooth(values, strength):
+    """Suavização exponencial em ida e volta (sem atraso)"""
+    if len(values) < 2:
+        return values
+    forward = np.empty_like(values)
+    forward[0] = values[0]
+    for i in range(1, len(values)):
+        forward[i] = strength * forward[i - 1] + (1 - strength) * values[i]
+    backward = np.empty_like(values)
+    backward[-1] = forward[-1]
+    for i in range(len(values) - 2, -1, -1):
+        backward[i] = strength * backward[i + 1] + (1 - strength) * forward[i]
+    return backward
+
+class CropTrack:
+    """Centro horizontal do recorte ao longo do tempo, constante entre tomadas"""
+
+    def __init__(self, times, centers, shots):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.shots = np.asarray(shots, dtype=np.int64)
+
+    def center_at(self, t):
+        if not len(self.times):
+            return 0.5
+        i = int(np.searchsorted(self.times, t, side="right")) - 1
+        if i < 0:
+            return float(self.centers[0])
+        if i + 1 >= len(self.times) or self.shots[i + 1] != self.shots[i]:
+            # Última amostra ou troca de cena: mantém a posição até a próxima tomada
+            return float(self.centers[i])
+        fraction = (t - self.times[i]) / (self.times[i + 1] - self.times[i])
+        return float(self.centers[i] + fraction * (self.centers[i + 1] - self.centers[i]))
+
+    def box_at(self, t, frame_size, crop_size):
+        """Recorte (x, y, largura, altura) centralizado na posição do instante t"""
+        width, height = frame_size
+        crop_w, crop_h = crop_size
+        x = int(round(self.center_at(t) * width - crop_w / 2))
+        x = min(max(0, x), width - crop_w)
+        x -= x % 2
+        return x, (height - crop_h) // 2, crop_w, crop_h
+
+def analyze(video_path, source_size, crop_fraction, config):
+    """Amostra o vídeo e calcula o CropTrack do recorte com a largura crop_fraction"""
+    options = config.get("reframe", {})
+    strength = options.get("smoothing", 0.8)
+    times, centers, shots = [], [], []
+    previous = previous_hist = None
+    shot = 0
+    for t, gray in iter_samples(video_path, source_size, options.get("width", 256), options.get("fps", 4.0)):
+        hist = np.bincount(gray.ravel() >> 3, minlength=32).astype(np.float32) / gray.size
+        if previous_hist is not None and histogram_distance(hist, previous_hist) > SHOT_THRESHOLD:
+            shot += 1
+            previous = None
+        times.append(t)
+        centers.append(best_center(interest_profile(gray, previous), crop_fraction))
+        shots.append(shot)
+        previous, previous_hist = gray.astype(np.float32), hist
+
+    centers = np.asarray(centers, dtype=np.float64)
+    shots = np.asarray(shots, dtype=np.int64)
+    # Suaviza dentro de cada tomada; entre tomadas o recorte pode saltar
+    for value in np.unique(shots):
+        mask = shots == value
+        centers[mask] = smooth(centers[mask], strength)
+    logger.info(f"Reenquadramento: {len(times)} amostras, {shot + 1} tomadas")
+    return CropTrack(times, centers, shots)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+from utils import setup_logging
+
+logger = setup_logging()
+
+def probe_duration(video_path):
+    """Duração do vídeo em segundos (ffprobe)"""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video_path)],
+        check=True, capture_output=True, text=True
+    ).stdout.strip()
+    return float(output)
+
+def probe_keyframes(video_path):
+    """Tempos dos quadros-chave do vídeo, lidos dos pacotes (sem decodificar)"""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(video_path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    keyframes = []
+    for line in output.splitlines():
+        parts = line.split(",")
+        if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+            keyframes.append(float(parts[0]))
+    return sorted(keyframes)
+
+def plan_segments(keyframes, duration, parts, min_seconds=10.0):
+    """Divide [0, duration] em até `parts` intervalos cortados em quadros-chave"""
+    if parts <= 1 or duration <= 2 * min_seconds:
+        return [(0.0, duration)]
+
+    target = max(min_seconds, duration / parts)
+    cuts = [0.0]
+    for keyframe in keyframes:
+        if keyframe - cuts[-1] >= target and duration - keyframe >= min_seconds:
+            cuts.append(keyframe)
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def concat_segments(segment_paths, audio_source, output_path, workspace):
+    """Concatena os trechos sem recodificar e copia o áudio do vídeo original"""
+    list_path = os.path.join(workspace, "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", str(audio_source),
+        "-map", "0:v:0", "-map", "1:a:0?",
+        "-c", "copy", "-shortest", "-movflags", "+faststart",
+        str(output_path)
+    ]
+    subprocess.run(cmd, check=True)
+    return output_path
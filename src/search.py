@@ -0,0 +1,383 @@
+"""Índice invertido das transcrições para busca por palavras-chave e frases
+
+Os textos são normalizados (minúsculas, sem acentos) e quebrados em palavras.
+O índice (SQLite) guarda, para cada palavra, os segmentos de cada vídeo em
+que ela aparece; uma busca recupera os segmentos candidatos pelo índice e
+confirma frases e limites de palavra com um autômato Aho-Corasick.
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import deque
+from pathlib import Path
+from utils import setup_logging, SIDECAR_SUFFIXES
+
+logger = setup_logging()
+
+WORD_RE = re.compile(r"\w+")
+
+# Frases entre aspas ou palavras soltas
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+TRANSCRIPT_SUFFIXES = ('.tsc', '.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    video TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    doc_id INTEGER NOT NULL REFERENCES documents(id),
+    seg INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (doc_id, seg)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL REFERENCES terms(id),
+    doc_id INTEGER NOT NULL REFERENCES documents(id),
+    seg INTEGER NOT NULL,
+    PRIMARY KEY (term_id, doc_id, seg)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+def normalize(text):
+    """Minúsculas e sem acentos ("Ação" -> "acao")"""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    # Remove todas as marcas combinantes separadas pela decomposição NFKD
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+def tokenize(text):
+    """Palavras normalizadas do texto"""
+    return WORD_RE.findall(normalize(text))
+
+class KeywordMatcher:
+    """Autômato Aho-Corasick sobre sequências de palavras
+
+    Encontra todas as palavras-chave e frases em uma única passada pelas
+    palavras do texto; como as transições são por palavra, os limites de
+    palavra são respeitados ("mar" não casa com "marca").
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            tokens = tokenize(pattern)
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((index, len(tokens)))
+
+        # Links de falha em largura: cada estado herda as saídas do seu sufixo mais longo
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for token, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, tokens):
+        """Gera (posição da primeira palavra, índice do padrão) para cada ocorrência"""
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for index, length in self._output[state]:
+                yield position - length + 1, index
+
+    def matches(self, text):
+        """Índices dos padrões presentes no texto, na ordem da primeira ocorrência"""
+        found = []
+        for _, index in self.find(tokenize(text)):
+            if index not in found:
+                found.append(index)
+        return found
+
+def parse_query(query):
+    """Separa a consulta em frases ("entre aspas") e palavras soltas"""
+    return [phrase or word for phrase, word in QUERY_RE.findall(query) if tokenize(phrase or word)]
+
+class SearchIndex:
+    """Índice invertido (SQLite) com os segmentos de todas as transcrições"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _term_ids(self, terms):
+        """Ids dos termos, criando os que ainda não existem (dentro da transação)"""
+        self._conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(term,) for term in terms])
+        ids = {}
+        terms = list(terms)
+        for i in range(0, len(terms), 500):
+            batch = terms[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT id, term FROM terms WHERE term IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            ids.update((row['term'], row['id']) for row in rows)
+        return ids
+
+    def _remove(self, doc_id):
+        self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM segments WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def add(self, transcript_path, force=False):
+        """Indexa (ou reindexa) uma transcrição; retorna False se já estava atualizada"""
+        from transcript_store import read_transcript
+
+        path = os.path.abspath(transcript_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT id, size, mtime FROM documents WHERE path = ?", (path,)).fetchone()
+        if row and not force and row['size'] == stat.st_size and row['mtime'] == stat.st_mtime:
+            return False
+
+        segments = read_transcript(path, words=False)["segments"]
+        postings = {}
+        for seg, segment in enumerate(segments):
+            for term in set(tokenize(segment["text"])):
+                postings.setdefault(term, []).append(seg)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+                if existing:
+                    self._remove(existing['id'])
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (path, video, size, mtime, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                    (path, Path(path).stem, stat.st_size, stat.st_mtime, time.time())
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO segments (doc_id, seg, start, end, text) VALUES (?, ?, ?, ?, ?)",
+                    [(doc_id, seg, float(s["start"]), float(s["end"]), s["text"].strip()) for seg, s in enumerate(segments)]
+                )
+                term_ids = self._term_ids(postings)
+                self._conn.executemany(
+                    "INSERT INTO postings (term_id, doc_id, seg) VALUES (?, ?, ?)",
+                    [(term_ids[term], doc_id, seg) for term, segs in postings.items() for seg in segs]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def remove(self, transcript_path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM documents WHERE path = ?", (os.path.abspath(transcript_path),)
+            ).fetchone()
+            if row:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._remove(row['id'])
+                self._conn.execute("COMMIT")
+
+    def update(self, directories, force=False):
+        """Indexa as transcrições novas ou alteradas e remove as que sumiram dos diretórios"""
+        found = set()
+        added = 0
+        for directory in directories:
+            for path in transcript_files(directory):
+                found.add(os.path.abspath(path))
+                try:
+                    added += self.add(path, force=force)
+                except Exception as e:
+                    logger.error(f"Erro ao indexar {path}: {str(e)}")
+
+        roots = [os.path.abspath(directory) + os.sep for directory in directories]
+        with self._lock:
+            indexed = [row['path'] for row in self._conn.execute("SELECT path FROM documents").fetchall()]
+        removed = [path for path in indexed if path not in found and path.startswith(tuple(roots))]
+        for path in removed:
+            self.remove(path)
+        logger.info(f"Índice atualizado: {added} transcrições indexadas, {len(removed)} removidas")
+        return added, len(removed)
+
+    def _candidates(self, tokens, video=None):
+        """Segmentos (doc_id, seg) que contêm todas as palavras"""
+        terms = sorted(set(tokens))
+        params = list(terms)
+        sql = (
+            "SELECT p.doc_id, p.seg FROM postings p JOIN terms t ON t.id = p.term_id"
+            + (" JOIN documents d ON d.id = p.doc_id" if video else "")
+            + f" WHERE t.term IN ({','.join('?' * len(terms))})"
+        )
+        if video:
+            sql += " AND d.video = ?"
+            params.append(video)
+        sql += " GROUP BY p.doc_id, p.seg HAVING COUNT(*) = ?"
+        params.append(len(terms))
+        with self._lock:
+            return {(row[0], row[1]) for row in self._conn.execute(sql, params).fetchall()}
+
+    def search(self, query, match_all=True, video=None, limit=50):
+        """Busca palavras e "frases exatas" em todas as transcrições
+
+        Com match_all, o segmento precisa conter todos os termos da consulta;
+        caso contrário, basta um. Retorna os segmentos com vídeo, tempos e os
+        termos encontrados, os que casam mais termos primeiro.
+        """
+        patterns = parse_query(query) if isinstance(query, str) else [p for p in query if tokenize(p)]
+        if not patterns:
+            return []
+
+        candidate_sets = [self._candidates(tokenize(pattern), video) for pattern in patterns]
+        if match_all:
+            candidates = set.intersection(*candidate_sets)
+        else:
+            candidates = set.union(*candidate_sets)
+        if not candidates:
+            return []
+
+        matcher = KeywordMatcher(patterns)
+        by_document = {}
+        for doc_id, seg in candidates:
+            by_document.setdefault(doc_id, []).append(seg)
+        results = []
+        for doc_id, segs in sorted(by_document.items()):
+            for i in range(0, len(segs), 500):
+                batch = segs[i:i + 500]
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT d.video, d.path, s.seg, s.start, s.end, s.text"
+                        " FROM segments s JOIN documents d ON d.id = s.doc_id"
+                        f" WHERE s.doc_id = ? AND s.seg IN ({','.join('?' * len(batch))})",
+                        [doc_id, *batch]
+                    ).fetchall()
+                for row in rows:
+                    # Confirma a ordem das palavras das frases no texto do segmento
+                    found = matcher.matches(row['text'])
+                    if not found or (match_all and len(found) < len(patterns)):
+                        continue
+                    results.append({
+                        'video': row['video'],
+                        'transcript': row['path'],
+                        'segment': row['seg'],
+                        'start': row['start'],
+                        'end': row['end'],
+                        'text': row['text'],
+                        'matches': [patterns[index] for index in found]
+                    })
+
+        results.sort(key=lambda r: (-len(r['matches']), r['video'], r['start']))
+        return results[:limit] if limit else results
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: self._conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                for name in ('documents', 'segments', 'terms', 'postings')
+            }
+
+def transcript_files(directory):
+    """Transcrições (.tsc e .json) do diretório, preferindo o .tsc quando há os dois"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    files = {}
+    for path in sorted(directory.iterdir()):
+        if path.name.startswith('.') or path.name.endswith(SIDECAR_SUFFIXES):
+            continue
+        if path.suffix in TRANSCRIPT_SUFFIXES and (path.stem not in files or path.suffix == '.tsc'):
+            files[path.stem] = path
+    return list(files.values())
+
+def transcript_dirs(config):
+    """Diretórios onde as transcrições são gravadas"""
+    paths = config['paths']
+    return list(dict.fromkeys([paths['input_dir'], paths['transcript_dir']]))
+
+def open_search_index(config):
+    """Abre o índice configurado (SEARCH_INDEX)"""
+    return SearchIndex(config.get('search', {}).get('index', './videos/search.sqlite3'))
+
+def index_transcript(transcript_path, config):
+    """Adiciona uma transcrição recém-gravada ao índice"""
+    index = open_search_index(config)
+    try:
+        return index.add(transcript_path)
+    finally:
+        index.close()
+
+def format_position(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from utils import load_config
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Busca nas transcrições dos vídeos')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    index_parser = subparsers.add_parser('index', help='Atualiza o índice com as transcrições novas ou alteradas')
+    index_parser.add_argument('dirs', nargs='*', help='Diretórios com transcrições (padrão: diretórios configurados)')
+    index_parser.add_argument('--force', action='store_true', help='Reindexa todas as transcrições')
+    query_parser = subparsers.add_parser('query', help='Busca palavras e "frases exatas"')
+    query_parser.add_argument('terms', nargs='+', help='Palavras ou frases (entre aspas)')
+    query_parser.add_argument('--any', action='store_true', help='Segmentos com qualquer um dos termos')
+    query_parser.add_argument('--video', help='Restringe a busca a um vídeo')
+    query_parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    config = load_config()
+    search_index = open_search_index(config)
+    try:
+        if args.command == 'index':
+            search_index.update(args.dirs or transcript_dirs(config), force=args.force)
+            logger.info(f"Índice: {search_index.stats()}")
+        else:
+            results = search_index.search(args.terms, match_all=not args.any, video=args.video, limit=args.limit)
+            for result in results:
+                print(f"{result['video']}  {format_position(result['start'])}-{format_position(result['end'])}  "
+                      f"{result['text']}  [{', '.join(result['matches'])}]")
+            if not results:
+                print("Nenhum resultado")
+    finally:
+        search_index.close()
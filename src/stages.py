@@ -0,0 +1,32 @@
+import importlib
+
+class StageSpec:
+    """Etapa registrada; o módulo só é importado quando a etapa é executada"""
+
+    def __init__(self, name, target, description):
+        self.name = name
+        self.target = target
+        self.description = description
+
+    def load(self):
+        """Importa o módulo da etapa e retorna a função de entrada"""
+        module_name, function_name = self.target.split(':')
+        return getattr(importlib.import_module(module_name), function_name)
+
+# Etapas do modo em lote, na ordem de execução ("módulo:função")
+STAGES = {}
+
+def register_stage(name, target, description):
+    """Registra uma etapa (também usado por plugins)"""
+    STAGES[name] = StageSpec(name, target, description)
+    return STAGES[name]
+
+register_stage('download', 'downloader:download_videos', 'download')
+register_stage('transcribe', 'transcriber:transcribe_videos', 'transcrição')
+register_stage('translate', 'translator:translate_videos', 'tradução das legendas')
+register_stage('edit', 'editor:edit_videos', 'edição')
+register_stage('upload', 'uploader:upload_videos', 'upload')
+
+def run_stage(name, *args, **kwargs):
+    """Importa e executa a etapa"""
+    return STAGES[name].load()(*args, **kwargs)
@@ -0,0 +1,154 @@
+import os
+from utils import setup_logging, temp_output_path
+
+logger = setup_logging()
+
+# Pontuações que indicam fim de frase
+SENTENCE_ENDERS = ('.', '!', '?', '...', ';', ':')
+
+# Formatos de legenda suportados
+FORMATS = ('srt', 'vtt', 'ass')
+
+# Pausa (em segundos) entre palavras que força uma nova legenda
+PAUSE_BREAK = 1.0
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+WrapStyle: 2
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,16,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,-1,0,0,0,100,100,0,0,1,1.5,0,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def _milliseconds(seconds):
+    return max(0, int(round(seconds * 1000)))
+
+def format_srt_time(seconds):
+    """HH:MM:SS,mmm (as horas não voltam a zero após 24h)"""
+    ms = _milliseconds(seconds)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def format_vtt_time(seconds):
+    """HH:MM:SS.mmm"""
+    ms = _milliseconds(seconds)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+def format_ass_time(seconds):
+    """H:MM:SS.cc"""
+    cs = _milliseconds(seconds) // 10
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+def _segment_words(segment):
+    """Palavras com tempos de um segmento; sem word_timestamps, distribui o tempo pelo tamanho"""
+    words = [
+        (w["word"].strip(), w["start"], w["end"])
+        for w in segment.get("words") or []
+        if w["word"].strip()
+    ]
+    if words:
+        return words
+
+    tokens = segment["text"].split()
+    if not tokens:
+        return []
+    total_chars = sum(len(token) for token in tokens)
+    duration = segment["end"] - segment["start"]
+    start = segment["start"]
+    words = []
+    for token in tokens:
+        end = start + duration * len(token) / total_chars
+        words.append((token, start, end))
+        start = end
+    return words
+
+def build_cues(segments, max_chars=42, max_lines=2, max_duration=5.0):
+    """Agrupa as palavras em legendas usando os tempos de cada palavra
+
+    Retorna uma lista de (início, fim, linhas). Uma legenda termina no fim de
+    frase, em pausas longas, no fim do segmento ou quando excederia
+    max_lines linhas de max_chars caracteres ou max_duration segundos.
+    """
+    cues = []
+    lines = []
+    line = []
+    line_length = 0
+    cue_start = cue_end = None
+
+    def flush():
+        nonlocal lines, line, line_length, cue_start
+        if line:
+            lines.append(" ".join(line))
+        if lines:
+            cues.append((cue_start, cue_end, lines))
+        lines, line, line_length, cue_start = [], [], 0, None
+
+    for segment in segments:
+        for text, start, end in _segment_words(segment):
+            if cue_start is not None:
+                too_long = end - cue_start > max_duration
+                paused = start - cue_end > PAUSE_BREAK
+                if too_long or paused:
+                    flush()
+
+            # Quebra de linha gulosa; sem espaço para nova linha, fecha a legenda
+            if line and line_length + 1 + len(text) > max_chars:
+                if len(lines) + 1 < max_lines:
+                    lines.append(" ".join(line))
+                    line, line_length = [], 0
+                else:
+                    flush()
+
+            if cue_start is None:
+                cue_start = start
+            line.append(text)
+            line_length += len(text) + (1 if line_length else 0)
+            cue_end = end
+
+            if text.endswith(SENTENCE_ENDERS):
+                flush()
+        flush()
+
+    return cues
+
+def write_subtitles(result, base_path, formats=("srt",), max_chars=42, max_lines=2, max_duration=5.0):
+    """Gera os arquivos de legenda (srt, vtt, ass) em uma única passada pelas legendas"""
+    cues = build_cues(result["segments"], max_chars=max_chars, max_lines=max_lines, max_duration=max_duration)
+    return write_cues(cues, base_path, formats)
+
+def write_cues(cues, base_path, formats=("srt",)):
+    """Grava legendas já montadas, (início, fim, linhas), nos formatos pedidos"""
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Formato de legenda desconhecido: {', '.join(unknown)} (use {', '.join(FORMATS)})")
+    # Grava em arquivos temporários e só substitui os definitivos ao final
+    paths = {fmt: f"{base_path}.{fmt}" for fmt in formats}
+    files = {fmt: open(temp_output_path(path), "w", encoding="utf-8") for fmt, path in paths.items()}
+    try:
+        if "vtt" in files:
+            files["vtt"].write("WEBVTT\n\n")
+        if "ass" in files:
+            files["ass"].write(ASS_HEADER)
+
+        for index, (start, end, lines) in enumerate(cues, 1):
+            if "srt" in files:
+                files["srt"].write(f"{index}\n{format_srt_time(start)} --> {format_srt_time(end)}\n" + "\n".join(lines) + "\n\n")
+            if "vtt" in files:
+                files["vtt"].write(f"{format_vtt_time(start)} --> {format_vtt_time(end)}\n" + "\n".join(lines) + "\n\n")
+            if "ass" in files:
+                files["ass"].write(f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,," + "\\N".join(lines) + "\n")
+    except BaseException:
+        for f in files.values():
+            f.close()
+            os.remove(f.name)
+        raise
+
+    for fmt, f in files.items():
+        f.close()
+        os.replace(f.name, paths[fmt])
+    return cues
@@ -1,23 +1,154 @@
 import os
-import whisper
-from googletrans import Translator
-from utils import setup_logging, load_config, generate_safe_filename
+from utils import setup_logging, load_config, generate_safe_filename, file_sha256, atomic_write_json
 import logging
 import json
 import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from audio import iter_speech_chunks, load_pcm, SAMPLE_RATE
+from transcript_store import write_transcript, read_transcript
+from subtitles import write_subtitles
+import metrics
+from search import KeywordMatcher, index_transcript
 import srt
-from datetime import timedelta
 import re
 
 logger = logging.getLogger(__name__)
 
+# Presets de decodificação (velocidade x precisão); "balanced" é o comportamento original
+DECODING_PRESETS = {
+    "fast": {"best_of": 1, "beam_size": 1},
+    "balanced": {"best_of": 3, "beam_size": 3},
+    "accurate": {"best_of": 5, "beam_size": 5}
+}
+
+def set_torch_threads(threads=0, interop_threads=0):
+    """Threads do PyTorch dentro de cada operação (intra-op) e entre operações (inter-op); 0 = padrão"""
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Só pode ser definido uma vez, antes do primeiro trabalho em paralelo
+            logger.warning("Threads inter-op do PyTorch já definidas, mantendo o valor atual")
+
+class WhisperEngine:
+    """openai-whisper (PyTorch, fp32 na CPU)"""
+
+    name = "whisper"
+
+    def __init__(self, model_name, threads=0, interop_threads=0, **options):
+        import whisper
+
+        set_torch_threads(threads, interop_threads)
+        self._whisper = whisper
+        logger.info(f"Carregando modelo Whisper: {model_name}")
+        self.model = whisper.load_model(model_name)
+
+    def detect_language(self, audio):
+        """Detecta a língua a partir dos primeiros 30s do áudio já decodificado"""
+        mel = self._whisper.log_mel_spectrogram(self._whisper.pad_or_trim(audio)).to(self.model.device)
+        _, probs = self.model.detect_language(mel)
+        return max(probs, key=probs.get)
+
+    def transcribe(self, audio, language, options, verbose=False):
+        return self.model.transcribe(audio, language=language, verbose=verbose, **options)
+
+class FasterWhisperEngine:
+    """faster-whisper (CTranslate2) com pesos quantizados (int8 por padrão) na CPU
+
+    threads são as threads de cada transcrição (intra-op) e interop_threads o
+    número de transcrições que o modelo executa em paralelo (inter-op).
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name, threads=0, interop_threads=0, compute_type="int8", **options):
+        from faster_whisper import WhisperModel
+
+        logger.info(f"Carregando modelo faster-whisper: {model_name} ({compute_type})")
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type,
+                                  cpu_threads=threads, num_workers=max(1, interop_threads))
+
+    def detect_language(self, audio):
+        # A língua é detectada ao iniciar a transcrição; os segmentos (gerador) nem são decodificados
+        _, info = self.model.transcribe(audio[:30 * SAMPLE_RATE], beam_size=1, without_timestamps=True)
+        return info.language
+
+    def transcribe(self, audio, language, options, verbose=False):
+        """Transcrição no mesmo formato do openai-whisper (segmentos com palavras)"""
+        segments, info = self.model.transcribe(audio, language=language, **options)
+        result = []
+        for segment in segments:
+            result.append({
+                "id": len(result),
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+                "words": [
+                    {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                    for word in segment.words or []
+                ]
+            })
+            if verbose:
+                logger.info(f"[{format_time(segment.start)} --> {format_time(segment.end)}]{segment.text}")
+        return {
+            "text": "".join(segment["text"] for segment in result),
+            "segments": result,
+            "language": info.language
+        }
+
+# Motores de transcrição disponíveis (TRANSCRIPTION_ENGINE)
+ENGINES = {
+    "whisper": WhisperEngine,
+    "faster-whisper": FasterWhisperEngine
+}
+
+def engine_options(config):
+    """Motor, modelo e threads configurados"""
+    transcription = config["transcription"]
+    return {
+        "engine": transcription.get("engine", "whisper"),
+        "model_name": transcription["model"],
+        "compute_type": transcription.get("compute_type", "int8"),
+        "threads": transcription.get("threads", 0),
+        "interop_threads": transcription.get("interop_threads", 0)
+    }
+
+# Motores carregados, compartilhados entre chamadas (lote ou daemon)
+_engines = {}
+_engines_lock = threading.Lock()
+
+def load_engine(engine="whisper", **options):
+    """Retorna o motor carregado, carregando os pesos apenas na primeira chamada"""
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de transcrição desconhecido: {engine} (disponíveis: {', '.join(ENGINES)})")
+    key = (engine, *sorted(options.items()))
+    with _engines_lock:
+        loaded = _engines.get(key)
+        if loaded is None:
+            loaded = ENGINES[engine](**options)
+            _engines[key] = loaded
+        return loaded
+
+def get_engine(config):
+    """Motor de transcrição configurado"""
+    return load_engine(**engine_options(config))
+
 def transcribe_videos(config):
     """Transcreve os vídeos baixados"""
     logger.info("Iniciando transcrição dos vídeos")
     
-    # Carrega o modelo Whisper
-    model = whisper.load_model(config["transcription"]["model"])
-    
     # Diretório dos vídeos originais
     input_dir = config["paths"]["input_dir"]
     
@@ -25,83 +156,279 @@ def transcribe_videos(config):
     for filename in os.listdir(input_dir):
         if filename.endswith(".mp4"):
             video_path = os.path.join(input_dir, filename)
-            base_name = os.path.splitext(filename)[0]
-            
-            logger.info(f"Transcrevendo vídeo: {filename}")
             
             try:
-                # Primeiro, detecta a língua original
-                logger.info("Detectando língua...")
-                audio = whisper.load_audio(video_path)
-                audio = whisper.pad_or_trim(audio)
-                mel = whisper.log_mel_spectrogram(audio).to(model.device)
-                _, probs = model.detect_language(mel)
-                detected_lang = max(probs, key=probs.get)
-                logger.info(f"Língua detectada: {detected_lang}")
-                
-                # Transcreve com word_timestamps para melhor precisão
-                result = model.transcribe(
-                    video_path,
-                    task="transcribe",
-                    language=detected_lang,
-                    verbose=True,
-                    initial_prompt="Este é um vídeo do YouTube. A transcrição deve começar quando o áudio começar. Não ignore o início do vídeo.",
-                    word_timestamps=True,
-                    condition_on_previous_text=False,
-                    temperature=0.0,  # Menos criatividade, mais precisão
-                    best_of=3,  # Tenta 3 vezes e pega o melhor resultado
-                    beam_size=3,  # Usa beam search para melhor qualidade
-                    no_speech_threshold=0.3  # Ajusta sensibilidade para detecção de fala
-                )
-                
-                # Gera arquivo JSON com os segmentos
-                json_path = os.path.join(input_dir, f"{base_name}.json")
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-                
-                # Gera arquivo SRT com legendas quebradas de forma inteligente
-                srt_path = os.path.join(input_dir, f"{base_name}.srt")
-                with open(srt_path, "w", encoding="utf-8") as f:
-                    subtitle_index = 1
-                    
-                    for segment in result["segments"]:
-                        text = segment["text"].strip()
-                        words = text.split()
-                        
-                        # Lista de pontuações que indicam fim de frase
-                        sentence_enders = ['.', '!', '?', '...', ';', ':']
-                        
-                        current_sentence = ""
-                        current_start = segment["start"]
-                        current_end = segment["end"]
-                        
-                        for i, word in enumerate(words):
-                            current_sentence += word + " "
-                            
-                            # Verifica se a palavra atual termina com um marcador de fim de frase
-                            # ou se é a última palavra do segmento
-                            if (any(word.endswith(ender) for ender in sentence_enders) or 
-                                i == len(words) - 1):
-                                
-                                # Formata o tempo no formato SRT
-                                start = timedelta(seconds=current_start)
-                                end = timedelta(seconds=current_end)
-                                start_time = f"{start.seconds//3600:02d}:{(start.seconds//60)%60:02d}:{start.seconds%60:02d},{int(start.microseconds/1000):03d}"
-                                end_time = f"{end.seconds//3600:02d}:{(end.seconds//60)%60:02d}:{end.seconds%60:02d},{int(end.microseconds/1000):03d}"
-                                
-                                f.write(f"{subtitle_index}\n{start_time} --> {end_time}\n{current_sentence.strip()}\n\n")
-                                
-                                # Reseta para próxima legenda
-                                subtitle_index += 1
-                                current_sentence = ""
-                                current_start = current_end
-                
-                logger.info(f"Transcrição concluída para {filename}")
-                
+                transcribe_video(video_path, config)
             except Exception as e:
                 logger.error(f"Erro ao transcrever {filename}: {str(e)}")
                 continue
 
+def transcribe_video(video_path, config, engine=None, audio=None, audio_path=None):
+    """Transcreve um vídeo e grava a transcrição e o SRT ao lado dele
+
+    Com audio_path (faixa só de áudio do download split), o áudio é decodificado
+    desse arquivo e o vídeo ainda não precisa existir.
+    """
+    with metrics.stage("transcribe", video_path):
+        return _transcribe_video(video_path, config, engine, audio, audio_path)
+
+def _transcribe_video(video_path, config, engine=None, audio=None, audio_path=None):
+    filename = os.path.basename(video_path)
+    base_path = os.path.splitext(video_path)[0]
+    force = config["transcription"].get("force", False)
+    source_path = audio_path or video_path
+    
+    # Pula vídeos cujas saídas já correspondem ao arquivo e aos parâmetros atuais
+    fingerprint_path = f"{base_path}.fingerprint.json"
+    stored = {} if force else load_fingerprint(fingerprint_path)
+    fingerprint = {
+        "source": current_source(video_path, config, stored.get("source"), audio_path),
+        "model": config["transcription"]["model"],
+        "transcript": transcript_fingerprint(config),
+        "subtitles": subtitles_fingerprint(config)
+    }
+    
+    transcript_current = (
+        same_source(stored.get("source"), fingerprint["source"])
+        and stored.get("model") == fingerprint["model"]
+        and stored.get("transcript") == fingerprint["transcript"]
+        and os.path.exists(transcript_path(base_path, config))
+    )
+    if transcript_current:
+        subtitles_exist = all(os.path.exists(f"{base_path}.{fmt}") for fmt in config["subtitles"]["formats"])
+        if stored.get("subtitles") == fingerprint["subtitles"] and subtitles_exist:
+            logger.info(f"Transcrição atualizada, pulando: {filename}")
+            metrics.observe(skipped=True)
+            return None
+        # Só as opções de legenda mudaram: regera as legendas a partir da transcrição salva
+        logger.info(f"Regerando legendas de {filename}")
+        result = read_transcript(transcript_path(base_path, config))
+        write_subtitles_for(result, base_path, config)
+        atomic_write_json(fingerprint_path, fingerprint, indent=2)
+        return result
+    
+    logger.info(f"Transcrevendo vídeo: {filename}")
+    
+    # Vídeos longos são transcritos em trechos, em paralelo, sem carregar o áudio inteiro
+    if audio is None and config["transcription"].get("streaming"):
+        result = transcribe_streaming(source_path, config)
+        write_outputs(result, base_path, config)
+        atomic_write_json(fingerprint_path, fingerprint, indent=2)
+        logger.info(f"Transcrição concluída para {filename}")
+        return result
+    
+    if engine is None:
+        engine = get_engine(config)
+    
+    # Decodifica o áudio uma única vez (PCM 16 kHz mono) para detecção e transcrição
+    if audio is None:
+        audio = load_pcm(source_path)
+    if not len(audio):
+        # Nada decodificado: não grava transcrição nem fingerprint vazios
+        raise RuntimeError(f"Nenhum áudio decodificado de {source_path}")
+    metrics.observe(audio_seconds=round(len(audio) / SAMPLE_RATE, 3))
+    
+    # Primeiro, detecta a língua original
+    logger.info("Detectando língua...")
+    detected_lang = engine.detect_language(audio)
+    logger.info(f"Língua detectada: {detected_lang}")
+    
+    # Transcreve com word_timestamps para melhor precisão
+    options = transcribe_options(config["transcription"].get("preset", "balanced"))
+    result = engine.transcribe(audio, detected_lang, options, verbose=True)
+    
+    write_outputs(result, base_path, config)
+    atomic_write_json(fingerprint_path, fingerprint, indent=2)
+    
+    logger.info(f"Transcrição concluída para {filename}")
+    return result
+
+def load_fingerprint(fingerprint_path):
+    """Lê o fingerprint gravado ao lado das saídas (vazio se não existir)"""
+    try:
+        with open(fingerprint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def source_fingerprint(video_path, config, stored=None):
+    """Identifica o conteúdo do vídeo por tamanho + mtime, ou por hash SHA-256"""
+    stat = os.stat(video_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if config["transcription"].get("fingerprint") != "hash":
+        return fingerprint
+    
+    # Reaproveita o hash salvo se o arquivo não mudou, senão recalcula
+    if stored and stored.get("size") == stat.st_size and stored.get("mtime_ns") == stat.st_mtime_ns and stored.get("sha256"):
+        return {"size": stat.st_size, "sha256": stored["sha256"], "mtime_ns": stat.st_mtime_ns}
+    return {"size": stat.st_size, "sha256": file_sha256(video_path), "mtime_ns": stat.st_mtime_ns}
+
+def current_source(video_path, config, stored=None, audio_path=None):
+    """Fingerprint da origem: o vídeo ou, no download split, a faixa de áudio transcrita
+
+    Uma transcrição feita a partir da faixa de áudio continua valendo quando o
+    .mp4 final já existe (cache, retomada, lote, daemon), enquanto a faixa não mudar.
+    """
+    if audio_path is None and stored and stored.get("audio_path") and os.path.exists(stored["audio_path"]):
+        audio_path = stored["audio_path"]
+    if audio_path is None:
+        return source_fingerprint(video_path, config, stored)
+    audio_path = os.path.abspath(audio_path)
+    return {**source_fingerprint(audio_path, config, stored), "audio_path": audio_path}
+
+def same_source(stored, current):
+    """Compara fingerprints de origem; com hash, um arquivo apenas "tocado" continua igual"""
+    if not stored:
+        return False
+    if "sha256" in stored and "sha256" in current:
+        return stored["size"] == current["size"] and stored["sha256"] == current["sha256"]
+    return stored.get("size") == current["size"] and stored.get("mtime_ns") == current["mtime_ns"]
+
+def transcript_fingerprint(config):
+    """Parâmetros que alteram o conteúdo da transcrição"""
+    transcription = config["transcription"]
+    fingerprint = {
+        "options": transcribe_options(transcription.get("preset", "balanced")),
+        "streaming": bool(transcription.get("streaming"))
+    }
+    if transcription.get("engine", "whisper") != "whisper":
+        # Outro motor (e quantização) gera outro resultado com o mesmo modelo
+        fingerprint["engine"] = {"name": transcription["engine"], "compute_type": transcription.get("compute_type", "int8")}
+    if fingerprint["streaming"]:
+        # A divisão em trechos altera o resultado; número de workers não
+        fingerprint["chunking"] = {
+            key: transcription.get(key)
+            for key in ("min_chunk_seconds", "max_chunk_seconds", "silence_threshold")
+        }
+    return fingerprint
+
+def subtitles_fingerprint(config):
+    """Parâmetros que alteram apenas as legendas geradas"""
+    return {"version": 2, **config["subtitles"]}
+
+def transcribe_options(preset="balanced"):
+    """Parâmetros de decodificação usados em todas as transcrições, com o preset escolhido"""
+    if preset not in DECODING_PRESETS:
+        raise ValueError(f"Preset de decodificação desconhecido: {preset} (disponíveis: {', '.join(DECODING_PRESETS)})")
+    return {
+        "task": "transcribe",
+        "initial_prompt": "Este é um vídeo do YouTube. A transcrição deve começar quando o áudio começar. Não ignore o início do vídeo.",
+        "word_timestamps": True,
+        "condition_on_previous_text": False,
+        "temperature": 0.0,  # Menos criatividade, mais precisão
+        "no_speech_threshold": 0.3,  # Ajusta sensibilidade para detecção de fala
+        **DECODING_PRESETS[preset]
+    }
+
+def transcript_path(base_path, config):
+    """Caminho da transcrição de acordo com o formato configurado"""
+    extension = ".json" if config["transcription"].get("format") == "json" else ".tsc"
+    return f"{base_path}{extension}"
+
+def write_outputs(result, base_path, config):
+    """Grava a transcrição e o SRT"""
+    # Gera a transcrição com os segmentos (formato compacto por padrão)
+    path = transcript_path(base_path, config)
+    if path.endswith(".json"):
+        atomic_write_json(path, result, indent=2)
+    else:
+        write_transcript(path, result)
+    
+    # Gera as legendas a partir dos tempos de cada palavra
+    write_subtitles_for(result, base_path, config)
+    
+    # Mantém o índice de busca atualizado; uma falha aqui não invalida a transcrição
+    if config.get("search", {}).get("auto_index", True):
+        try:
+            index_transcript(path, config)
+        except Exception as e:
+            logger.warning(f"Erro ao indexar a transcrição {path}: {str(e)}")
+
+def write_subtitles_for(result, base_path, config):
+    """Gera os arquivos de legenda com as opções configuradas"""
+    options = config["subtitles"]
+    write_subtitles(
+        result,
+        base_path,
+        formats=options["formats"],
+        max_chars=options["max_chars"],
+        max_lines=options["max_lines"],
+        max_duration=options["max_duration"]
+    )
+
+# Motor carregado em cada processo do pool de transcrição em trechos
+_worker_engine = None
+
+def _init_chunk_worker(options):
+    global _worker_engine
+    _worker_engine = load_engine(**options)
+
+def _detect_chunk_language(audio):
+    return _worker_engine.detect_language(audio)
+
+def _transcribe_chunk(audio, offset, language, options):
+    """Transcreve um trecho e desloca os tempos para a posição global no vídeo"""
+    result = _worker_engine.transcribe(audio, language, options)
+    segments = result["segments"]
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+def transcribe_streaming(video_path, config):
+    """Transcreve o vídeo em trechos cortados no silêncio usando um pool de processos
+
+    O áudio é lido em janelas limitadas, então o pico de memória não depende
+    da duração do vídeo; no máximo 2 trechos por processo ficam em espera.
+    """
+    transcription = config["transcription"]
+    workers = transcription.get("workers") or os.cpu_count() or 1
+    # Cada processo usa sua parte dos núcleos e executa uma transcrição por vez
+    engine = {
+        **engine_options(config),
+        "threads": transcription.get("threads") or max(1, (os.cpu_count() or 1) // workers),
+        "interop_threads": 1
+    }
+    options = transcribe_options(transcription.get("preset", "balanced"))
+    
+    chunks = iter_speech_chunks(
+        video_path,
+        window_seconds=transcription.get("window_seconds", 30.0),
+        min_chunk_seconds=transcription.get("min_chunk_seconds", 20.0),
+        max_chunk_seconds=transcription.get("max_chunk_seconds", 60.0),
+        silence_threshold=transcription.get("silence_threshold", 0.01)
+    )
+    
+    segments = []
+    language = None
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                             initargs=(engine,)) as executor:
+        for offset, audio in chunks:
+            metrics.observe(audio_seconds=round(offset + len(audio) / SAMPLE_RATE, 3))
+            if language is None:
+                # A língua é detectada uma vez, no primeiro trecho com fala
+                language = executor.submit(_detect_chunk_language, audio).result()
+                logger.info(f"Língua detectada: {language}")
+            pending.append(executor.submit(_transcribe_chunk, audio, offset, language, options))
+            # Backpressure: resultados são coletados em ordem para limitar a memória
+            while len(pending) >= workers * 2:
+                segments.extend(pending.popleft().result())
+        while pending:
+            segments.extend(pending.popleft().result())
+    
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language or transcription.get("language")
+    }
+
 def format_time(seconds):
     """Formata o tempo em segundos para o formato SRT (HH:MM:SS,mmm)"""
     hours = int(seconds // 3600)
@@ -142,19 +469,36 @@ def format_timestamp(seconds):
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 def find_keywords(transcript, keywords):
-    """Encontra momentos importantes baseado em palavras-chave"""
+    """Encontra momentos importantes baseado em palavras-chave
+
+    Palavras e frases são procuradas inteiras, sem diferenciar maiúsculas e
+    acentos, em uma única passada por segmento.
+    """
+    matcher = KeywordMatcher(keywords)
     important_segments = []
     
     for segment in transcript['segments']:
-        text = segment['text'].lower()
-        for keyword in keywords:
-            if keyword.lower() in text:
-                important_segments.append({
-                    'start': segment['start'],
-                    'end': segment['end'],
-                    'text': segment['text'],
-                    'keyword': keyword
-                })
-                break
-    
-    return important_segments 
\ No newline at end of file
+        found = matcher.matches(segment['text'])
+        if found:
+            important_segments.append({
+                'start': segment['start'],
+                'end': segment['end'],
+                'text': segment['text'],
+                'keyword': keywords[found[0]]
+            })
+    
+    return important_segments 
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Transcrição dos vídeos baixados')
+    parser.add_argument('--force', action='store_true', help='Transcrever novamente mesmo vídeos já atualizados')
+    args = parser.parse_args()
+    
+    setup_logging()
+    config = load_config()
+    config["transcription"]["force"] = args.force
+    transcribe_videos(config)
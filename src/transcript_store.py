@@ -0,0 +1,210 @@
+"""Formato compacto e colunar para transcrições (.tsc)
+
+Layout do arquivo:
+    b"TSC1" | tamanho do cabeçalho (uint32 LE) | cabeçalho JSON | arrays alinhados
+
+O cabeçalho descreve dtype, shape e offset de cada array. Os textos ficam em um
+único blob UTF-8 com um array de offsets, então o arquivo pode ser mapeado em
+memória e um intervalo de tempo lido sem decodificar a transcrição inteira.
+"""
+import os
+import sys
+import json
+import struct
+import numpy as np
+from pathlib import Path
+from utils import setup_logging, atomic_write, SIDECAR_SUFFIXES
+
+logger = setup_logging()
+
+MAGIC = b"TSC1"
+ALIGNMENT = 64
+
+def _pack_texts(texts):
+    """Concatena textos em um blob UTF-8 + offsets (n + 1)"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def write_transcript(path, result):
+    """Grava o resultado do Whisper (dict com "segments") no formato compacto"""
+    segments = result.get("segments", [])
+    arrays = {
+        "seg_start": np.array([s["start"] for s in segments], dtype=np.float64),
+        "seg_end": np.array([s["end"] for s in segments], dtype=np.float64),
+        "seg_avg_logprob": np.array([s.get("avg_logprob", 0.0) for s in segments], dtype=np.float32),
+        "seg_no_speech_prob": np.array([s.get("no_speech_prob", 0.0) for s in segments], dtype=np.float32),
+    }
+    arrays["seg_text"], arrays["seg_text_offsets"] = _pack_texts([s["text"] for s in segments])
+
+    # Palavras são opcionais (só existem com word_timestamps=True)
+    if any(s.get("words") for s in segments):
+        words = [w for s in segments for w in s.get("words", [])]
+        word_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+        word_offsets[1:] = np.cumsum([len(s.get("words", [])) for s in segments])
+        arrays["seg_word_offsets"] = word_offsets
+        arrays["word_start"] = np.array([w["start"] for w in words], dtype=np.float64)
+        arrays["word_end"] = np.array([w["end"] for w in words], dtype=np.float64)
+        arrays["word_probability"] = np.array([w.get("probability", 0.0) for w in words], dtype=np.float32)
+        arrays["word_text"], arrays["word_text_offsets"] = _pack_texts([w["word"] for w in words])
+
+    header = {"version": 1, "language": result.get("language"), "arrays": {}}
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        layout.append((offset, array))
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    # Os offsets dos arrays são relativos ao início da área de dados, já alinhada
+    data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    buffer = bytearray(data_start + offset)
+    buffer[:4] = MAGIC
+    buffer[4:8] = struct.pack("<I", len(header_bytes))
+    buffer[8:8 + len(header_bytes)] = header_bytes
+    for array_offset, array in layout:
+        start = data_start + array_offset
+        buffer[start:start + array.nbytes] = array.tobytes()
+
+    return atomic_write(path, bytes(buffer), mode="wb")
+
+class TranscriptReader:
+    """Leitura preguiçosa de um arquivo .tsc via memory-map"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(self._data[:4]) != MAGIC:
+            raise ValueError(f"Arquivo de transcrição inválido: {self.path}")
+        header_length = struct.unpack("<I", bytes(self._data[4:8]))[0]
+        self.header = json.loads(bytes(self._data[8:8 + header_length]).decode("utf-8"))
+        self.language = self.header.get("language")
+        data_start = -(-(8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+        self._arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            self._arrays[name] = np.frombuffer(
+                self._data, dtype=dtype, count=count, offset=data_start + spec["offset"]
+            ).reshape(spec["shape"])
+
+    def __len__(self):
+        return len(self._arrays["seg_start"])
+
+    @property
+    def has_words(self):
+        return "word_start" in self._arrays
+
+    def array(self, name):
+        """Acesso direto às colunas (seg_start, seg_end, word_start, ...)"""
+        return self._arrays[name]
+
+    def _text(self, prefix, index):
+        offsets = self._arrays[f"{prefix}_text_offsets"]
+        return bytes(self._arrays[f"{prefix}_text"][offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    @property
+    def text(self):
+        return bytes(self._arrays["seg_text"]).decode("utf-8")
+
+    def segment_range(self, start=None, end=None):
+        """Índices [i0, i1) dos segmentos que se sobrepõem ao intervalo de tempo"""
+        i0 = 0 if start is None else int(np.searchsorted(self._arrays["seg_end"], start, side="right"))
+        i1 = len(self) if end is None else int(np.searchsorted(self._arrays["seg_start"], end, side="left"))
+        return i0, max(i0, i1)
+
+    def words(self, index):
+        """Palavras de um segmento no formato do Whisper"""
+        if not self.has_words:
+            return []
+        offsets = self._arrays["seg_word_offsets"]
+        return [
+            {
+                "word": self._text("word", i),
+                "start": float(self._arrays["word_start"][i]),
+                "end": float(self._arrays["word_end"][i]),
+                "probability": float(self._arrays["word_probability"][i])
+            }
+            for i in range(offsets[index], offsets[index + 1])
+        ]
+
+    def segment(self, index, words=True):
+        segment = {
+            "id": index,
+            "start": float(self._arrays["seg_start"][index]),
+            "end": float(self._arrays["seg_end"][index]),
+            "text": self._text("seg", index),
+            "avg_logprob": float(self._arrays["seg_avg_logprob"][index]),
+            "no_speech_prob": float(self._arrays["seg_no_speech_prob"][index])
+        }
+        if words and self.has_words:
+            segment["words"] = self.words(index)
+        return segment
+
+    def segments(self, start=None, end=None, words=True):
+        """Segmentos (dicts no formato do Whisper) que se sobrepõem ao intervalo"""
+        i0, i1 = self.segment_range(start, end)
+        return [self.segment(i, words=words) for i in range(i0, i1)]
+
+    def to_dict(self, start=None, end=None, words=True):
+        """Transcrição no mesmo formato do resultado do Whisper"""
+        segments = self.segments(start, end, words=words)
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": self.language
+        }
+
+def read_transcript(path, start=None, end=None, words=True):
+    """Lê uma transcrição .tsc ou .json e retorna o dict no formato do Whisper"""
+    path = Path(path)
+    if path.suffix == ".tsc":
+        return TranscriptReader(path).to_dict(start, end, words=words)
+
+    with open(path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    if start is not None or end is not None:
+        result["segments"] = [
+            s for s in result["segments"]
+            if (start is None or s["end"] > start) and (end is None or s["start"] < end)
+        ]
+    return result
+
+def convert_json(json_path, output_path=None):
+    """Converte uma transcrição JSON existente para o formato compacto"""
+    json_path = Path(json_path)
+    output_path = Path(output_path) if output_path else json_path.with_suffix(".tsc")
+    with open(json_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    write_transcript(output_path, result)
+    logger.info(f"{json_path.name}: {os.path.getsize(json_path)} -> {os.path.getsize(output_path)} bytes")
+    return output_path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Converte transcrições JSON para o formato compacto (.tsc)')
+    parser.add_argument('paths', nargs='+', help='Arquivos .json ou diretórios com transcrições')
+    parser.add_argument('--remove-json', action='store_true', help='Remove o JSON após a conversão')
+    args = parser.parse_args()
+
+    failures = 0
+    for arg in args.paths:
+        path = Path(arg)
+        json_files = sorted(path.glob('*.json')) if path.is_dir() else [path]
+        for json_path in json_files:
+            if json_path.name.startswith('.') or json_path.name.endswith(SIDECAR_SUFFIXES):
+                continue
+            try:
+                convert_json(json_path)
+                if args.remove_json:
+                    json_path.unlink()
+            except Exception as e:
+                failures += 1
+                logger.error(f"Erro ao converter {json_path}: {str(e)}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,365 @@
+"""Tradução das legendas em lotes, com cache persistente
+
+Os textos das legendas são deduplicados, os que já estão no cache (SQLite)
+são reaproveitados e o restante é agrupado em lotes limitados por tamanho,
+enviados em paralelo com limite de requisições por segundo. Cada língua de
+destino gera um `<vídeo>.<língua>.srt` com os mesmos tempos da legenda
+original.
+
+O serviço de tradução é plugável (register_backend): "google" usa o
+googletrans e "stub" traduz localmente, sem rede, para testes e benchmarks.
+"""
+import os
+import time
+import asyncio
+import inspect
+import sqlite3
+import textwrap
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from utils import setup_logging, RateLimiter, retry_with_backoff
+from subtitles import build_cues, write_cues
+import metrics
+
+logger = setup_logging()
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (text, source, target, backend)
+) WITHOUT ROWID;
+"""
+
+# Separador dos textos de um lote em uma única requisição (preservado pelo tradutor)
+BATCH_SEPARATOR = "\n"
+
+# Um serviço de tradução implementa translate_batch(texts, source, target) e
+# devolve as traduções alinhadas aos textos, ou None quando não consegue
+# separar o resultado do lote (nesse caso os textos são reenviados um a um)
+
+class GoogleTranslateBackend:
+    """Tradução pelo googletrans; um lote vira uma única requisição com um texto por linha"""
+
+    name = "google"
+    max_chars = 4500
+
+    def __init__(self, options=None):
+        from googletrans import Translator
+
+        self._factory = Translator
+        # googletrans >= 4.0.1 é assíncrono; as versões anteriores, síncronas
+        self._async = inspect.iscoroutinefunction(Translator.translate)
+        self._local = threading.local()
+
+    def _request(self, text, source, target):
+        if self._async:
+            async def request():
+                async with self._factory() as translator:
+                    return await translator.translate(text, src=source, dest=target)
+            return asyncio.run(request())
+
+        # O Translator síncrono não é compartilhado entre threads
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
+            translator = self._local.translator = self._factory()
+        return translator.translate(text, src=source, dest=target)
+
+    def translate_batch(self, texts, source, target):
+        result = self._request(BATCH_SEPARATOR.join(texts), source, target)
+        translated = result.text.split(BATCH_SEPARATOR)
+        if len(translated) != len(texts):
+            # O serviço juntou ou quebrou linhas: o BatchTranslator reenvia os textos um a um
+            return None
+        return [text.strip() for text in translated]
+
+class StubBackend:
+    """Tradução local e determinística ("[en] texto"), sem rede, para testes"""
+
+    name = "stub"
+    max_chars = 4500
+
+    def __init__(self, options=None):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, source, target):
+        with self._lock:
+            self.requests += 1
+        return [f"[{target}] {text}" for text in texts]
+
+# Serviços de tradução disponíveis (nome -> fábrica que recebe as opções)
+BACKENDS = {}
+
+def register_backend(name, factory):
+    """Registra um serviço de tradução (também usado por plugins)"""
+    BACKENDS[name] = factory
+
+register_backend("google", GoogleTranslateBackend)
+register_backend("stub", StubBackend)
+
+def get_backend(name, options=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Serviço de tradução desconhecido: {name} (disponíveis: {', '.join(BACKENDS)})")
+    return BACKENDS[name](options or {})
+
+class TranslationCache:
+    """Traduções já feitas (SQLite), por texto, língua de origem, língua de destino e serviço"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(CACHE_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, texts, source, target, backend):
+        """Traduções em cache dos textos (dict texto -> tradução)"""
+        found = {}
+        texts = list(texts)
+        with self._lock:
+            for i in range(0, len(texts), 500):
+                batch = texts[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text, translation FROM translations WHERE source = ? AND target = ? AND backend = ? "
+                    f"AND text IN ({','.join('?' * len(batch))})",
+                    [source, target, backend, *batch]
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, translations, source, target, backend):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO translations (text, source, target, backend, translation, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(text, source, target, backend, translation, now) for text, translation in translations.items()]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+def make_batches(texts, max_chars, max_items):
+    """Agrupa os textos, em ordem, em lotes de até max_chars caracteres e max_items textos
+
+    Um texto maior que max_chars forma um lote sozinho.
+    """
+    batches = []
+    batch = []
+    size = 0
+    for text in texts:
+        extra = len(text) + (len(BATCH_SEPARATOR) if batch else 0)
+        if batch and (size + extra > max_chars or len(batch) >= max_items):
+            batches.append(batch)
+            batch, size = [], 0
+            extra = len(text)
+        batch.append(text)
+        size += extra
+    if batch:
+        batches.append(batch)
+    return batches
+
+class BatchTranslator:
+    """Traduz listas de textos: deduplica, consulta o cache e envia os lotes em paralelo
+
+    O limite de requisições por segundo vale para todas as línguas e vídeos
+    traduzidos pela mesma instância.
+    """
+
+    def __init__(self, backend, cache=None, workers=4, rate=2.0, batch_chars=None, batch_size=100,
+                 retries=3, backoff=2.0):
+        self.backend = backend
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.batch_chars = min(batch_chars or backend.max_chars, backend.max_chars)
+        self.batch_size = max(1, batch_size)
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"texts": 0, "unique": 0, "cached": 0, "requests": 0}
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def _send(self, batch, source, target):
+        def request():
+            self.limiter.wait()
+            with self._stats_lock:
+                self.stats["requests"] += 1
+            return self.backend.translate_batch(batch, source, target)
+
+        translated = retry_with_backoff(request, retries=self.retries, backoff=self.backoff, logger=logger)
+        if translated is None and len(batch) > 1:
+            # Resultado desalinhado: reenvia cada texto como um lote de um item
+            # (mesmo limite de requisições, novas tentativas e cache)
+            logger.warning(f"Lote de {len(batch)} textos devolvido desalinhado, reenviando um a um")
+            translations = {}
+            for text in batch:
+                translations.update(self._send([text], source, target))
+            return translations
+        if translated is None or len(translated) != len(batch):
+            count = 0 if translated is None else len(translated)
+            raise ValueError(f"Serviço de tradução devolveu {count} textos para um lote de {len(batch)}")
+        translations = dict(zip(batch, translated))
+        if self.cache is not None:
+            # Cada lote é gravado ao terminar: uma falha adiante não perde o que já foi traduzido
+            self.cache.put_many(translations, source, target, self.backend.name)
+        return translations
+
+    def translate(self, texts, source, target):
+        """Traduções alinhadas aos textos de entrada"""
+        unique = [text for text in dict.fromkeys(texts) if text.strip()]
+        done = self.cache.get_many(unique, source, target, self.backend.name) if self.cache is not None else {}
+        missing = [text for text in unique if text not in done]
+        batches = make_batches(missing, self.batch_chars, self.batch_size)
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches)), thread_name_prefix="translate") as executor:
+                for translations in executor.map(lambda batch: self._send(batch, source, target), batches):
+                    done.update(translations)
+
+        with self._stats_lock:
+            self.stats["texts"] += len(texts)
+            self.stats["unique"] += len(unique)
+            self.stats["cached"] += len(unique) - len(missing)
+        logger.info(f"Tradução {source} -> {target}: {len(texts)} legendas, {len(unique)} textos distintos, "
+                    f"{len(unique) - len(missing)} em cache, {len(batches)} lotes")
+        return [done.get(text, text) for text in texts]
+
+def get_translator(config):
+    """BatchTranslator com o serviço e o cache configurados"""
+    options = config.get("translation", {})
+    backend = get_backend(options.get("backend", "google"), options)
+    cache_path = options.get("cache")
+    return BatchTranslator(
+        backend,
+        cache=TranslationCache(cache_path) if cache_path else None,
+        workers=options.get("workers", 4),
+        rate=options.get("rate", 2.0),
+        batch_chars=options.get("batch_chars"),
+        batch_size=options.get("batch_size", 100),
+        retries=options.get("retries", 3),
+        backoff=options.get("backoff", 2.0)
+    )
+
+def _wrap(text, max_chars):
+    """Quebra a tradução em linhas de até max_chars (o número de linhas pode crescer)"""
+    return textwrap.wrap(text, max_chars) or [text]
+
+def translate_video(video_path, config, translator=None):
+    """Gera as legendas traduzidas de um vídeo já transcrito; retorna os arquivos gravados"""
+    with metrics.stage("translate", video_path):
+        return _translate_video(video_path, config, translator)
+
+def find_transcript(video_path):
+    """Transcrição (.tsc ou .json) ao lado do vídeo, ou None"""
+    base_path = os.path.splitext(video_path)[0]
+    for extension in (".tsc", ".json"):
+        if os.path.exists(base_path + extension):
+            return base_path + extension
+    return None
+
+def _translate_video(video_path, config, translator=None):
+    from transcript_store import read_transcript
+
+    languages = config.get("translation", {}).get("languages") or []
+    if not languages:
+        return []
+    base_path = os.path.splitext(video_path)[0]
+    path = find_transcript(video_path)
+    if path is None:
+        raise FileNotFoundError(f"Transcrição não encontrada para {video_path}")
+
+    result = read_transcript(path)
+    source = result.get("language") or config["transcription"].get("language") or "auto"
+    options = config["subtitles"]
+    # Mesmas legendas (e tempos) do SRT original
+    cues = build_cues(result["segments"], max_chars=options["max_chars"], max_lines=options["max_lines"],
+                      max_duration=options["max_duration"])
+    texts = [" ".join(lines) for _, _, lines in cues]
+
+    own_translator = translator is None
+    if own_translator:
+        translator = get_translator(config)
+    stats_before = dict(translator.stats)
+    try:
+        paths = []
+        for target in languages:
+            if target == source:
+                continue
+            translated = translator.translate(texts, source, target)
+            translated_cues = [
+                (start, end, _wrap(text, options["max_chars"]))
+                for (start, end, _), text in zip(cues, translated)
+            ]
+            write_cues(translated_cues, f"{base_path}.{target}", formats=("srt",))
+            paths.append(f"{base_path}.{target}.srt")
+        metrics.observe(cues=len(cues), languages=len(paths),
+                        **{key: value - stats_before[key] for key, value in translator.stats.items()})
+    finally:
+        if own_translator:
+            translator.close()
+    logger.info(f"Legendas traduzidas: {', '.join(os.path.basename(p) for p in paths) or 'nenhuma'}")
+    return paths
+
+def translate_videos(config):
+    """Traduz as legendas de todos os vídeos transcritos"""
+    languages = config.get("translation", {}).get("languages") or []
+    if not languages:
+        logger.info("Nenhuma língua de tradução configurada (TRANSLATION_LANGUAGES)")
+        return
+    input_dir = config["paths"]["input_dir"]
+    translator = get_translator(config)
+    try:
+        for filename in sorted(os.listdir(input_dir)):
+            if not filename.endswith(".mp4"):
+                continue
+            video_path = os.path.join(input_dir, filename)
+            if find_transcript(video_path) is None:
+                continue
+            try:
+                translate_video(video_path, config, translator)
+            except Exception as e:
+                logger.error(f"Erro ao traduzir as legendas de {filename}: {str(e)}")
+    finally:
+        translator.close()
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from utils import load_config
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Traduz as legendas dos vídeos transcritos')
+    parser.add_argument('videos', nargs='*', help='Vídeos a traduzir (padrão: todos os transcritos)')
+    parser.add_argument('--languages', help='Línguas de destino separadas por vírgula (padrão: TRANSLATION_LANGUAGES)')
+    parser.add_argument('--backend', choices=list(BACKENDS), help='Serviço de tradução')
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.languages:
+        config["translation"]["languages"] = [lang for lang in args.languages.split(",") if lang]
+    if args.backend:
+        config["translation"]["backend"] = args.backend
+    if args.videos:
+        for video in args.videos:
+            translate_video(video, config)
+    else:
+        translate_videos(config)
@@ -1,29 +1,130 @@
 import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httplib2
+import google_auth_httplib2
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from utils import setup_logging
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError, UnknownApiNameOrVersion
+from googleapiclient.http import MediaFileUpload, build_http
+from utils import setup_logging, retry_with_backoff, atomic_write, atomic_write_json
+import metrics
 
 logger = setup_logging()
 
+YOUTUBE_SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+
+# Token OAuth e documento de descoberta ficam fora do diretório do projeto
+DEFAULT_CONFIG_DIR = Path('~/.config/tiktok-automation')
+
+# Documento de descoberta da API, baixado quando o googleapiclient não o traz embutido
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
+
+# Antecedência com que o token é renovado antes de expirar
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Serviços já autenticados, por arquivo de token
+_service_cache = {}
+_service_lock = threading.Lock()
+
+# Respostas do servidor que justificam repetir o envio do bloco
+RETRIABLE_STATUS = (500, 502, 503, 504)
+
+# O tamanho dos blocos do upload resumível precisa ser múltiplo de 256 KiB
+CHUNK_GRANULARITY = 256 * 1024
+
+class RetriableUploadError(Exception):
+    """Falha temporária (5xx ou conexão) durante o envio de um bloco"""
+
+class UploadSessions:
+    """Sessões de upload resumível gravadas em disco, para retomar após reinícios
+
+    Cada vídeo guarda a URI da sessão e o progresso; um vídeo já enviado
+    guarda o id retornado pelo YouTube e não é enviado de novo enquanto o
+    arquivo não mudar.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Sessões de upload ilegíveis ({str(e)}), ignorando: {self.path}")
+
+    @staticmethod
+    def _key(video_path):
+        return os.path.abspath(video_path)
+
+    @staticmethod
+    def _signature(video_path):
+        stat = os.stat(video_path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def get(self, video_path):
+        """Sessão do vídeo, se o arquivo não mudou desde que ela foi criada"""
+        with self._lock:
+            entry = self._entries.get(self._key(video_path))
+        if entry and all(entry.get(k) == v for k, v in self._signature(video_path).items()):
+            return entry
+        return None
+
+    def update(self, video_path, **fields):
+        with self._lock:
+            key = self._key(video_path)
+            entry = self._entries.get(key)
+            signature = self._signature(video_path)
+            if not entry or any(entry.get(k) != v for k, v in signature.items()):
+                entry = dict(signature)
+            entry.update(fields, updated_at=time.time())
+            self._entries[key] = entry
+            atomic_write_json(self.path, self._entries, indent=2)
+
+    def discard(self, video_path):
+        with self._lock:
+            if self._entries.pop(self._key(video_path), None) is not None:
+                atomic_write_json(self.path, self._entries, indent=2)
+
+def get_upload_sessions(config):
+    """Sessões de upload do diretório final (ou o arquivo em UPLOAD_SESSIONS)"""
+    upload_config = config.get('upload', {})
+    path = upload_config.get('sessions') or os.path.join(get_final_dir(config), '.uploads.json')
+    return UploadSessions(path)
+
 def upload_videos(config):
     """Upload de vídeos para as plataformas"""
-    final_dir = Path(config['final_dir'])
+    final_dir = Path(get_final_dir(config))
+    upload_config = config.get('upload', {})
     
-    # Upload para YouTube
-    youtube_service = get_youtube_service(config)
+    # Upload para YouTube, vários vídeos ao mesmo tempo
+    videos = sorted(final_dir.glob('*_shorts.mp4'))
+    if not videos and not any(final_dir.glob('*_tiktok.mp4')):
+        logger.warning(f"Nenhum vídeo _shorts ou _tiktok em {final_dir} (confira EDIT_PROFILES)")
+    youtube_service = get_youtube_service(config) if videos else None
     if youtube_service:
-        for video_path in final_dir.glob('*_shorts.mp4'):
-            try:
-                logger.info(f"Iniciando upload para YouTube: {video_path.name}")
-                upload_to_youtube(video_path, youtube_service, config)
-                logger.info(f"Upload para YouTube concluído: {video_path.name}")
-            except Exception as e:
-                logger.error(f"Erro ao fazer upload para YouTube {video_path.name}: {str(e)}")
-                continue
+        sessions = get_upload_sessions(config)
+        with ThreadPoolExecutor(max_workers=max(1, upload_config.get('workers', 2))) as executor:
+            futures = {
+                executor.submit(upload_to_youtube, video_path, youtube_service, config, sessions): video_path
+                for video_path in videos
+            }
+            for future in as_completed(futures):
+                video_path = futures[future]
+                try:
+                    future.result()
+                    logger.info(f"Upload para YouTube concluído: {video_path.name}")
+                except Exception as e:
+                    logger.error(f"Erro ao fazer upload para YouTube {video_path.name}: {str(e)}")
     
     # Upload para TikTok (requer automação via navegador)
     for video_path in final_dir.glob('*_tiktok.mp4'):
@@ -35,38 +136,191 @@ def upload_videos(config):
             logger.error(f"Erro ao fazer upload para TikTok {video_path.name}: {str(e)}")
             continue
 
-def get_youtube_service(config):
-    """Autentica e retorna o serviço do YouTube"""
+def get_final_dir(config):
+    """Diretório dos vídeos editados"""
+    return config.get('final_dir') or config['paths']['final_dir']
+
+def upload_video(video_path, config, youtube_service=None, sessions=None):
+    """Envia um vídeo editado para a plataforma indicada pelo sufixo do arquivo"""
+    video_path = Path(video_path)
+    if video_path.stem.endswith('_shorts'):
+        if youtube_service is None:
+            youtube_service = get_youtube_service(config)
+        response = upload_to_youtube(video_path, youtube_service, config, sessions)
+        logger.info(f"Upload para YouTube concluído: {video_path.name}")
+        return response
+    if video_path.stem.endswith('_tiktok'):
+        logger.info(f"Iniciando upload para TikTok: {video_path.name}")
+        return upload_to_tiktok(video_path, config)
+    logger.info(f"Sem plataforma de destino para {video_path.name}, ignorando")
+    return None
+
+def _token_path(config):
+    """Arquivo das credenciais OAuth (fixo, independente do diretório atual)"""
+    youtube_config = config.get('youtube', {})
+    return Path(youtube_config.get('token_path') or DEFAULT_CONFIG_DIR / 'youtube_token.json').expanduser()
+
+def _save_credentials(creds, token_path):
+    atomic_write(token_path, creds.to_json())
+    os.chmod(token_path, 0o600)
+
+def _load_credentials(config, token_path):
+    """Lê as credenciais salvas ou executa o fluxo OAuth no navegador"""
     creds = None
-    token_path = Path('token.json')
+    legacy_path = Path('token.json')
+    if not token_path.exists() and legacy_path.exists():
+        # Token gravado por versões anteriores no diretório atual
+        logger.info(f"Migrando token.json para {token_path}")
+        token_path.parent.mkdir(parents=True, exist_ok=True)
+        creds = Credentials.from_authorized_user_file(str(legacy_path), YOUTUBE_SCOPES)
+        _save_credentials(creds, token_path)
+    elif token_path.exists():
+        creds = Credentials.from_authorized_user_file(str(token_path), YOUTUBE_SCOPES)
     
-    if token_path.exists():
-        creds = Credentials.from_authorized_user_file(str(token_path), ['https://www.googleapis.com/auth/youtube.upload'])
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    if not creds or not (creds.valid or creds.refresh_token):
+        flow = InstalledAppFlow.from_client_secrets_file(
+            config.get('youtube', {}).get('client_secrets') or 'client_secrets.json',
+            YOUTUBE_SCOPES
+        )
+        creds = flow.run_local_server(port=0)
+        _save_credentials(creds, token_path)
+    return creds
+
+def _refresh_if_needed(creds, token_path):
+    """Renova o token antes de expirar, para não falhar no meio de um upload"""
+    expires_soon = creds.expiry is not None and (
+        creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None) < TOKEN_REFRESH_MARGIN
+    )
+    if (expires_soon or not creds.valid) and creds.refresh_token:
+        creds.refresh(Request())
+        _save_credentials(creds, token_path)
+
+def _build_service(creds):
+    """Monta o cliente a partir do documento de descoberta local, sem acessar a rede"""
+    try:
+        return build('youtube', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+    except (TypeError, UnknownApiNameOrVersion):
+        # Versões antigas do googleapiclient não trazem o documento embutido:
+        # baixa uma vez e reutiliza a cópia em disco
+        document_path = DEFAULT_CONFIG_DIR.expanduser() / 'youtube.v3.discovery.json'
+        if not document_path.exists():
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=build_http())
+            resp, content = http.request(DISCOVERY_URL)
+            if resp.status != 200:
+                raise HttpError(resp, content, uri=DISCOVERY_URL)
+            # Valida o JSON antes de gravar a cópia local
+            atomic_write_json(document_path, json.loads(content))
+        return build_from_document(document_path.read_text(encoding='utf-8'), credentials=creds)
+
+def get_youtube_service(config):
+    """Autentica e retorna o serviço do YouTube
+
+    O serviço fica em cache no processo (reutilizado entre uploads e no modo
+    daemon); a cada chamada o token é renovado se estiver perto de expirar.
+    """
+    token_path = _token_path(config)
+    with _service_lock:
+        cached = _service_cache.get(token_path)
+        if cached is None:
+            creds = _load_credentials(config, token_path)
+            _refresh_if_needed(creds, token_path)
+            cached = _service_cache[token_path] = (_build_service(creds), creds)
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secrets.json',
-                ['https://www.googleapis.com/auth/youtube.upload']
-            )
-            creds = flow.run_local_server(port=0)
-        
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    
-    return build('youtube', 'v3', credentials=creds)
+            _refresh_if_needed(cached[1], token_path)
+        return cached[0]
+
+_thread_local = threading.local()
+
+def _service_credentials(youtube_service):
+    """Credenciais guardadas junto do serviço em get_youtube_service (None se não houver)"""
+    with _service_lock:
+        for service, creds in _service_cache.values():
+            if service is youtube_service:
+                return creds
+    return None
+
+def _thread_http(credentials):
+    """Conexão HTTP própria da thread (httplib2.Http não é thread-safe)"""
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    http = connections.get(id(credentials))
+    if http is None:
+        # build_http não segue o 308 do upload resumível como redirecionamento
+        http = build_http()
+        if credentials is not None:
+            http = google_auth_httplib2.AuthorizedHttp(credentials, http=http)
+        connections[id(credentials)] = http
+    return http
+
+def _chunk_size(config):
+    """Tamanho dos blocos em bytes, arredondado para múltiplo de 256 KiB"""
+    size_mb = config.get('upload', {}).get('chunk_size_mb', 8)
+    return max(1, round(size_mb * 1024 * 1024 / CHUNK_GRANULARITY)) * CHUNK_GRANULARITY
+
+def _use_endpoint(request, endpoint):
+    """Aponta o upload para outro servidor (ex.: um servidor falso local em testes)"""
+    parts = urlsplit(request.uri)
+    request.uri = endpoint.rstrip('/') + parts.path + (f"?{parts.query}" if parts.query else '')
+
+def _send_chunk(request, http):
+    """Envia o próximo bloco; falhas temporárias viram RetriableUploadError"""
+    try:
+        return request.next_chunk(http=http)
+    except HttpError as e:
+        if e.resp.status in RETRIABLE_STATUS:
+            raise RetriableUploadError(f"HTTP {e.resp.status}") from e
+        raise
+    except (httplib2.HttpLib2Error, OSError) as e:
+        raise RetriableUploadError(str(e)) from e
+
+def _query_session(resumable_uri, total, http):
+    """Pergunta ao servidor quanto da sessão já foi recebido
 
-def upload_to_youtube(video_path, youtube_service, config):
-    """Upload de vídeo para o YouTube"""
-    video_title = f"{Path(video_path).stem} - Shorts"
+    Retorna (bytes recebidos, resposta); a resposta só existe quando o
+    upload já estava completo. Sessão expirada levanta HttpError 404/410.
+    """
+    try:
+        resp, content = http.request(
+            resumable_uri, 'PUT', headers={'Content-Range': f'bytes */{total}', 'Content-Length': '0'}
+        )
+    except (httplib2.HttpLib2Error, OSError) as e:
+        raise RetriableUploadError(str(e)) from e
+    if resp.status in (200, 201):
+        return total, json.loads(content)
+    if resp.status == 308:
+        # Range: bytes=0-<último byte recebido>; sem o cabeçalho, nada foi recebido
+        received = resp.get('range')
+        return (int(received.rsplit('-', 1)[-1]) + 1 if received else 0), None
+    if resp.status in RETRIABLE_STATUS:
+        raise RetriableUploadError(f"HTTP {resp.status}")
+    raise HttpError(resp, content, uri=resumable_uri)
+
+def upload_to_youtube(video_path, youtube_service, config, sessions=None, progress=None):
+    """Upload de vídeo para o YouTube em blocos, com retomada e novas tentativas
+
+    O progresso da sessão é gravado a cada bloco; se o processo cair, o
+    próximo upload do mesmo arquivo continua do último byte confirmado pelo
+    servidor. progress(enviados, total) é chamado após cada bloco.
+    """
+    with metrics.stage("upload", video_path):
+        return _upload_to_youtube(video_path, youtube_service, config, sessions, progress)
+
+def _upload_to_youtube(video_path, youtube_service, config, sessions=None, progress=None):
+    video_path = Path(video_path)
+    video_title = f"{video_path.stem} - Shorts"
+    upload_config = config.get('upload', config)
+    
+    session = sessions.get(video_path) if sessions else None
+    if session and session.get('video_id'):
+        logger.info(f"Vídeo já enviado ao YouTube ({session['video_id']}), pulando: {video_path.name}")
+        return {'id': session['video_id']}
     
     request_body = {
         'snippet': {
             'title': video_title,
-            'description': config['default_description'],
-            'tags': config['default_tags'],
+            'description': upload_config['default_description'],
+            'tags': upload_config['default_tags'],
             'categoryId': '22'  # People & Blogs
         },
         'status': {
@@ -78,15 +332,80 @@ def upload_to_youtube(video_path, youtube_service, config):
     media = MediaFileUpload(
         str(video_path),
         mimetype='video/mp4',
+        chunksize=_chunk_size(config),
         resumable=True
     )
     
-    response = youtube_service.videos().insert(
+    request = youtube_service.videos().insert(
         part='snippet,status',
         body=request_body,
         media_body=media
-    ).execute()
+    )
+    if upload_config.get('api_endpoint'):
+        _use_endpoint(request, upload_config['api_endpoint'])
+    
+    http = _thread_http(_service_credentials(youtube_service))
+    total = media.size()
+    resumed_from = 0
+    response = None
+    if session and session.get('resumable_uri'):
+        # Consulta o servidor sobre o que já foi recebido antes de enviar o próximo bloco
+        try:
+            resumed_from, response = retry_with_backoff(
+                lambda: _query_session(session['resumable_uri'], total, http),
+                retries=upload_config.get('retries', 5),
+                backoff=upload_config.get('backoff', 2.0),
+                retry_on=(RetriableUploadError,),
+                logger=logger
+            )
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            # Sessão expirada no servidor: recomeça o upload do início
+            logger.warning(f"Sessão de upload expirada, reiniciando: {video_path.name}")
+            sessions.discard(video_path)
+            return _upload_to_youtube(video_path, youtube_service, config, sessions, progress)
+        logger.info(f"Retomando upload de {video_path.name} a partir de {resumed_from / 1e6:.1f} MB")
+        request.resumable_uri = session['resumable_uri']
+        request.resumable_progress = resumed_from
+    else:
+        logger.info(f"Iniciando upload para YouTube: {video_path.name}")
+    
+    started = time.monotonic()
+    while response is None:
+        try:
+            status, response = retry_with_backoff(
+                lambda: _send_chunk(request, http),
+                retries=upload_config.get('retries', 5),
+                backoff=upload_config.get('backoff', 2.0),
+                retry_on=(RetriableUploadError,),
+                logger=logger
+            )
+        except HttpError as e:
+            if session and e.resp.status in (404, 410):
+                # Sessão expirada no servidor: recomeça o upload do início
+                logger.warning(f"Sessão de upload expirada, reiniciando: {video_path.name}")
+                sessions.discard(video_path)
+                return _upload_to_youtube(video_path, youtube_service, config, sessions, progress)
+            raise
+        
+        if sessions and request.resumable_uri:
+            sessions.update(video_path, resumable_uri=request.resumable_uri, progress=request.resumable_progress)
+        if status is not None:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            logger.info(
+                f"{video_path.name}: {status.progress() * 100:.0f}% "
+                f"({status.resumable_progress / 1e6:.1f}/{total / 1e6:.1f} MB, "
+                f"{(status.resumable_progress - resumed_from) / 1e6 / elapsed:.1f} MB/s)"
+            )
+            if progress:
+                progress(status.resumable_progress, total)
     
+    if progress:
+        progress(total, total)
+    metrics.observe(bytes=total - resumed_from)
+    if sessions:
+        sessions.update(video_path, resumable_uri=None, progress=total, video_id=response.get('id'))
     return response
 
 def upload_to_tiktok(video_path, config):
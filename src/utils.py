@@ -1,6 +1,11 @@
 import os
 import json
+import time
+import hashlib
+import tempfile
+import random
 import logging
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 from slugify import slugify
@@ -21,7 +26,10 @@ def load_config():
         "youtube": {
             "api_key": os.getenv("YOUTUBE_API_KEY"),
             "client_id": os.getenv("YOUTUBE_CLIENT_ID"),
-            "client_secret": os.getenv("YOUTUBE_CLIENT_SECRET")
+            "client_secret": os.getenv("YOUTUBE_CLIENT_SECRET"),
+            "client_secrets": os.getenv("YOUTUBE_CLIENT_SECRETS", "client_secrets.json"),
+            # Padrão: ~/.config/tiktok-automation/youtube_token.json
+            "token_path": os.getenv("YOUTUBE_TOKEN_PATH")
         },
         "tiktok": {
             "username": os.getenv("TIKTOK_USERNAME"),
@@ -34,37 +42,160 @@ def load_config():
         },
         "transcription": {
             "model": os.getenv("WHISPER_MODEL", "base"),
-            "language": os.getenv("LANGUAGE", "pt")
+            # whisper (openai-whisper, PyTorch fp32) ou faster-whisper (CTranslate2, quantizado)
+            "engine": os.getenv("TRANSCRIPTION_ENGINE", "whisper"),
+            # Quantização do faster-whisper: int8, int8_float32, float32...
+            "compute_type": os.getenv("TRANSCRIPTION_COMPUTE_TYPE", "int8"),
+            # Threads intra-op e inter-op (0 = padrão da biblioteca)
+            "threads": int(os.getenv("TRANSCRIPTION_THREADS", "0")),
+            "interop_threads": int(os.getenv("TRANSCRIPTION_INTEROP_THREADS", "0")),
+            # fast, balanced ou accurate
+            "preset": os.getenv("TRANSCRIPTION_PRESET", "balanced"),
+            "language": os.getenv("LANGUAGE", "pt"),
+            "streaming": os.getenv("TRANSCRIPTION_STREAMING", "false").lower() == "true",
+            "workers": int(os.getenv("TRANSCRIPTION_WORKERS", "0")),
+            "window_seconds": float(os.getenv("TRANSCRIPTION_WINDOW_SECONDS", "30")),
+            "min_chunk_seconds": float(os.getenv("TRANSCRIPTION_MIN_CHUNK_SECONDS", "20")),
+            "max_chunk_seconds": float(os.getenv("TRANSCRIPTION_MAX_CHUNK_SECONDS", "60")),
+            "silence_threshold": float(os.getenv("TRANSCRIPTION_SILENCE_THRESHOLD", "0.01")),
+            # "mtime" (tamanho + data de modificação) ou "hash" (SHA-256 do conteúdo)
+            "fingerprint": os.getenv("TRANSCRIPTION_FINGERPRINT", "mtime"),
+            # "compact" (.tsc, colunar, memory-map) ou "json" (resultado completo do Whisper)
+            "format": os.getenv("TRANSCRIPT_FORMAT", "compact"),
+            "force": False
+        },
+        "subtitles": {
+            "max_chars": int(os.getenv("SUBTITLE_MAX_CHARS", "42")),
+            "max_lines": int(os.getenv("SUBTITLE_MAX_LINES", "2")),
+            "max_duration": float(os.getenv("SUBTITLE_MAX_DURATION", "5.0")),
+            # Formatos gerados: srt, vtt, ass
+            "formats": [fmt.strip().lower() for fmt in os.getenv("SUBTITLE_FORMATS", "srt").split(",") if fmt.strip()]
+        },
+        "edit": {
+            # raster (Pillow + NumPy), ffmpeg (filtro subtitles) ou textclip (ImageMagick)
+            "caption_engine": os.getenv("CAPTION_ENGINE", "raster"),
+            "caption_font": os.getenv("CAPTION_FONT"),
+            "caption_font_size": int(os.getenv("CAPTION_FONT_SIZE", "16")),
+            # single (um write_videofile por vídeo) ou segments (trechos em paralelo)
+            "mode": os.getenv("EDIT_MODE", "single"),
+            "workers": int(os.getenv("EDIT_WORKERS", "0")),
+            "min_segment_seconds": float(os.getenv("EDIT_MIN_SEGMENT_SECONDS", "10")),
+            "parallel_videos": int(os.getenv("EDIT_PARALLEL_VIDEOS", "1")),
+            "temp_dir": os.getenv("EDIT_TEMP_DIR") or None,
+            # Perfis gerados em uma única passada (ex.: shorts,tiktok); vazio = só _editado
+            "profiles": [name.strip() for name in os.getenv("EDIT_PROFILES", "").split(",") if name.strip()],
+            # Recorte vertical que acompanha a região de interesse de cada tomada
+            "reframe": os.getenv("EDIT_REFRAME", "false").lower() == "true",
+            # Renderiza também os melhores cortes detectados (highlights.py)
+            "cuts": os.getenv("EDIT_CUTS", "false").lower() == "true"
+        },
+        "reframe": {
+            "width": int(os.getenv("REFRAME_ANALYSIS_WIDTH", "256")),
+            "fps": float(os.getenv("REFRAME_ANALYSIS_FPS", "4")),
+            "smoothing": float(os.getenv("REFRAME_SMOOTHING", "0.8"))
+        },
+        "highlights": {
+            "count": int(os.getenv("HIGHLIGHT_COUNT", "3")),
+            "min_seconds": float(os.getenv("HIGHLIGHT_MIN_SECONDS", "15")),
+            "max_seconds": float(os.getenv("HIGHLIGHT_MAX_SECONDS", "60")),
+            "keywords": [word for word in os.getenv("HIGHLIGHT_KEYWORDS", "").split(",") if word],
+            "sample_rate": int(os.getenv("HIGHLIGHT_SAMPLE_RATE", "8000"))
+        },
+        "pipeline": {
+            "download_workers": int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "4")),
+            "transcribe_workers": int(os.getenv("PIPELINE_TRANSCRIBE_WORKERS", "1")),
+            "edit_workers": int(os.getenv("PIPELINE_EDIT_WORKERS", "1")),
+            "upload_workers": int(os.getenv("PIPELINE_UPLOAD_WORKERS", "1")),
+            "queue_size": int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+        },
+        "daemon": {
+            "watch_dir": os.getenv("DAEMON_WATCH_DIR", "./videos/inbox"),
+            "url_inbox": os.getenv("DAEMON_URL_INBOX"),
+            "settle_seconds": float(os.getenv("DAEMON_SETTLE_SECONDS", "5")),
+            "poll_interval": float(os.getenv("DAEMON_POLL_INTERVAL", "2"))
+        },
+        "translation": {
+            # Línguas de destino das legendas traduzidas (vazio = sem tradução)
+            "languages": [lang for lang in os.getenv("TRANSLATION_LANGUAGES", "").split(",") if lang],
+            # google (googletrans) ou stub (local, para testes)
+            "backend": os.getenv("TRANSLATION_BACKEND", "google"),
+            "cache": os.getenv("TRANSLATION_CACHE", "./videos/translations.sqlite3"),
+            "workers": int(os.getenv("TRANSLATION_WORKERS", "4")),
+            "rate": float(os.getenv("TRANSLATION_RATE", "2.0")),
+            "batch_chars": int(os.getenv("TRANSLATION_BATCH_CHARS", "4500")),
+            "batch_size": int(os.getenv("TRANSLATION_BATCH_SIZE", "100")),
+            "retries": int(os.getenv("TRANSLATION_RETRIES", "3")),
+            "backoff": float(os.getenv("TRANSLATION_BACKOFF", "2.0"))
+        },
+        "search": {
+            "index": os.getenv("SEARCH_INDEX", "./videos/search.sqlite3"),
+            # Indexa cada transcrição assim que ela é gravada
+            "auto_index": os.getenv("SEARCH_AUTO_INDEX", "true").lower() == "true"
+        },
+        "metrics": {
+            "enabled": os.getenv("METRICS_ENABLED", "true").lower() == "true",
+            "jsonl": os.getenv("METRICS_JSONL", "./videos/metrics.jsonl"),
+            # Arquivo para o textfile collector do node_exporter (vazio = não gera)
+            "prom": os.getenv("METRICS_PROM") or None,
+            "profile_dir": os.getenv("METRICS_PROFILE_DIR", "./videos/profiles")
+        },
+        "jobs": {
+            "db": os.getenv("JOBS_DB", "./videos/jobs.sqlite3")
+        },
+        "download": {
+            "workers": int(os.getenv("DOWNLOAD_WORKERS", "4")),
+            "per_host_concurrency": int(os.getenv("DOWNLOAD_PER_HOST_CONCURRENCY", "2")),
+            "per_host_rate": float(os.getenv("DOWNLOAD_PER_HOST_RATE", "1.0")),
+            "retries": int(os.getenv("DOWNLOAD_RETRIES", "3")),
+            "backoff": float(os.getenv("DOWNLOAD_BACKOFF", "2.0")),
+            "manifest": os.getenv("DOWNLOAD_MANIFEST"),
+            "verify_hash": os.getenv("DOWNLOAD_VERIFY_HASH", "false").lower() == "true",
+            # Baixa o áudio primeiro (a transcrição começa nele) e o vídeo em paralelo
+            "split": os.getenv("DOWNLOAD_SPLIT", "false").lower() == "true"
         },
         "upload": {
             "default_title": os.getenv("DEFAULT_TITLE", "Vídeo Automático"),
             "default_description": os.getenv("DEFAULT_DESCRIPTION", "Vídeo processado automaticamente"),
-            "default_tags": os.getenv("DEFAULT_TAGS", "automacao,video,shorts").split(",")
+            "default_tags": os.getenv("DEFAULT_TAGS", "automacao,video,shorts").split(","),
+            "chunk_size_mb": float(os.getenv("UPLOAD_CHUNK_SIZE_MB", "8")),
+            "workers": int(os.getenv("UPLOAD_WORKERS", "2")),
+            "retries": int(os.getenv("UPLOAD_RETRIES", "5")),
+            "backoff": float(os.getenv("UPLOAD_BACKOFF", "2.0")),
+            "sessions": os.getenv("UPLOAD_SESSIONS"),
+            # Servidor alternativo para os uploads (ex.: servidor falso local em testes)
+            "api_endpoint": os.getenv("UPLOAD_API_ENDPOINT")
         }
     }
     
     return config
 
 def save_transcript(video_path, transcript_data):
-    """Salva a transcrição em formato JSON"""
-    video_name = Path(video_path).stem
-    transcript_path = Path(os.getenv('TRANSCRIPTS_DIR', './videos/transcripts')) / f"{video_name}.json"
+    """Salva a transcrição no formato compacto (.tsc)"""
+    from transcript_store import write_transcript
     
-    with open(transcript_path, 'w', encoding='utf-8') as f:
-        json.dump(transcript_data, f, ensure_ascii=False, indent=2)
+    video_name = Path(video_path).stem
+    transcript_path = Path(os.getenv('TRANSCRIPTS_DIR', './videos/transcripts')) / f"{video_name}.tsc"
     
-    return transcript_path
+    return write_transcript(transcript_path, transcript_data)
+
+# Arquivos .json gravados ao lado das transcrições que não são transcrições
+# (impressão digital da transcrição e lista de cortes do highlights)
+SIDECAR_SUFFIXES = ('.fingerprint.json', '.cuts.json')
 
-def load_transcript(video_path):
-    """Carrega a transcrição de um vídeo"""
+def load_transcript(video_path, start=None, end=None):
+    """Carrega a transcrição de um vídeo (opcionalmente só o intervalo start-end, em segundos)"""
+    from transcript_store import read_transcript
+    
     video_name = Path(video_path).stem
-    transcript_path = Path(os.getenv('TRANSCRIPTS_DIR', './videos/transcripts')) / f"{video_name}.json"
+    transcripts_dir = Path(os.getenv('TRANSCRIPTS_DIR', './videos/transcripts'))
     
-    if not transcript_path.exists():
-        return None
+    # Prefere o formato compacto; JSON antigo continua sendo lido
+    for extension in ('.tsc', '.json'):
+        transcript_path = transcripts_dir / f"{video_name}{extension}"
+        if transcript_path.exists():
+            return read_transcript(transcript_path, start, end)
     
-    with open(transcript_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return None
 
 def generate_safe_filename(title):
     """Gera um nome de arquivo seguro a partir do título"""
@@ -75,6 +206,40 @@ def generate_safe_filename(title):
     # Adiciona extensão .mp4
     return safe_name + '.mp4'
 
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Calcula o hash SHA-256 de um arquivo lendo em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def atomic_write(path, data, mode='w', encoding='utf-8'):
+    """Grava o arquivo em um temporário no mesmo diretório e renomeia por cima do destino"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def temp_output_path(path):
+    """Caminho temporário, no mesmo diretório, para gravar antes de renomear (mantém a extensão)"""
+    path = Path(path)
+    return str(path.with_name(f".{path.stem}.partial{path.suffix}"))
+
+def atomic_write_json(path, data, **kwargs):
+    """Grava JSON de forma atômica"""
+    return atomic_write(path, json.dumps(data, ensure_ascii=False, **kwargs))
+
 def get_video_duration(video_path):
     """Obtém a duração do vídeo em segundos"""
     import cv2
@@ -83,4 +248,39 @@ def get_video_duration(video_path):
     frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count / fps
     video.release()
-    return duration 
\ No newline at end of file
+    return duration 
+
+class RateLimiter:
+    """Limita a quantidade de eventos por segundo (thread-safe)"""
+
+    def __init__(self, rate):
+        # rate <= 0 desativa o limite
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """Bloqueia até que o próximo evento seja permitido"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def retry_with_backoff(func, retries=3, backoff=2.0, max_delay=60.0, retry_on=(Exception,), logger=None):
+    """Executa func() com novas tentativas e espera exponencial (com jitter) entre elas"""
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except retry_on as e:
+            attempt += 1
+            if attempt > retries:
+                raise
+            delay = min(max_delay, backoff ** attempt) * random.uniform(0.5, 1.0)
+            if logger:
+                logger.warning(f"Tentativa {attempt}/{retries} falhou ({str(e)}), nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
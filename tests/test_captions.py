@@ -0,0 +1,26 @@
+"""Composição das legendas nos quadros (CaptionCompositor)"""
+import numpy as np
+
+from captions import CaptionCompositor, CaptionRenderer
+
+def make_compositor(size=(320, 180)):
+    renderer = CaptionRenderer(max_width=size[0] * 0.8, font_size=14)
+    return CaptionCompositor([(0.0, 2.0, "Legenda de teste")], renderer, size, margin=4)
+
+def test_blend_does_not_mutate_the_frame():
+    compositor = make_compositor()
+    frame = np.full((180, 320, 3), 40, dtype=np.uint8)
+    original = frame.copy()
+
+    first = compositor(frame, 0.5)
+    # moviepy devolve o mesmo array para tempos repetidos (lastread)
+    second = compositor(frame, 0.5)
+
+    assert np.array_equal(frame, original)
+    assert first is not frame and not np.array_equal(first, original)
+    assert np.array_equal(first, second)
+
+def test_frame_without_cue_is_returned_as_is():
+    compositor = make_compositor()
+    frame = np.zeros((180, 320, 3), dtype=np.uint8)
+    assert compositor(frame, 3.0) is frame
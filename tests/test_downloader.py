@@ -0,0 +1,201 @@
+"""Pool de downloads contra um servidor HTTP local (extractor genérico do yt-dlp)"""
+import os
+import copy
+import time
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+pytest.importorskip("yt_dlp")
+
+import yt_dlp
+from yt_dlp.postprocessor import PostProcessor
+
+import downloader
+from downloader import download_videos, download_single_video, make_downloader
+from utils import load_config, RateLimiter
+
+# Tempo de cada resposta: mantém as requisições abertas ao mesmo tempo
+RESPONSE_DELAY = 0.2
+
+class RecordingRateLimiter(RateLimiter):
+    """RateLimiter que registra o instante em que cada evento foi liberado"""
+    releases = []
+
+    def wait(self):
+        super().wait()
+        self.releases.append(time.monotonic())
+
+class MediaServer:
+    """Serve os arquivos de um diretório; registra concorrência e início de cada requisição"""
+
+    def __init__(self, directory, failures=None):
+        self.failures = dict(failures or {})
+        self.active = 0
+        self.max_active = 0
+        self.first_request = {}
+        self.statuses = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=str(directory), **kwargs)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    server.first_request.setdefault(self.path, time.monotonic())
+                    fail = server.failures.get(self.path, 0)
+                    if fail:
+                        server.failures[self.path] = fail - 1
+                try:
+                    time.sleep(RESPONSE_DELAY)
+                    if fail:
+                        server.statuses.append((self.path, 503))
+                        self.send_error(503)
+                    else:
+                        server.statuses.append((self.path, 200))
+                        super().do_GET()
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    def url(self, name):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def media_dir(tmp_path):
+    directory = tmp_path / "media"
+    directory.mkdir()
+    for i in range(6):
+        (directory / f"clip{i}.mp4").write_bytes(os.urandom(64 * 1024))
+    return directory
+
+@pytest.fixture
+def config(tmp_path):
+    config = load_config()
+    config["paths"]["input_dir"] = str(tmp_path / "originals")
+    config["download"].update(
+        workers=4,
+        per_host_concurrency=2,
+        per_host_rate=5.0,
+        retries=3,
+        backoff=0.01,
+        manifest=str(tmp_path / "downloads.json"),
+        split=False
+    )
+    return config
+
+def write_urls(tmp_path, urls):
+    path = tmp_path / "urls.txt"
+    path.write_text("\n".join(urls) + "\n", encoding="utf-8")
+    return str(path)
+
+def test_pool_respects_per_host_limits(tmp_path, media_dir, config, monkeypatch):
+    monkeypatch.setattr(downloader, "RateLimiter", RecordingRateLimiter)
+    monkeypatch.setattr(RecordingRateLimiter, "releases", [])
+    with MediaServer(media_dir) as server:
+        urls = [server.url(f"clip{i}.mp4") for i in range(6)]
+        summary = download_videos(write_urls(tmp_path, urls), config)
+
+    assert len(summary["succeeded"]) == 6 and not summary["failed"]
+    assert len(server.first_request) == 6
+    # Nunca mais de per_host_concurrency requisições abertas no servidor
+    assert server.max_active <= 2
+    # Downloads liberados a no máximo per_host_rate por segundo (com folga para o relógio)
+    releases = sorted(RecordingRateLimiter.releases)
+    assert len(releases) == 6
+    assert all(b - a >= 0.2 - 0.01 for a, b in zip(releases, releases[1:]))
+    for info in summary["succeeded"]:
+        assert os.path.getsize(info["path"]) == 64 * 1024
+
+def test_pool_retries_server_errors_and_reports_failures(tmp_path, media_dir, config):
+    with MediaServer(media_dir, failures={"/clip0.mp4": 2}) as server:
+        urls = [server.url("clip0.mp4"), server.url("clip1.mp4"), server.url("missing.mp4")]
+        summary = download_videos(write_urls(tmp_path, urls), config)
+
+    assert (("/clip0.mp4", 503)) in server.statuses
+    assert sorted(info["title"] for info in summary["succeeded"]) == ["clip0", "clip1"]
+    assert [failure["url"] for failure in summary["failed"]] == [urls[2]]
+
+def test_cache_hit_makes_no_request(tmp_path, media_dir, config):
+    with MediaServer(media_dir) as server:
+        download = make_downloader(config)
+        first = download(server.url("clip2.mp4"))
+        requests = len(server.statuses)
+        second = make_downloader(config)(server.url("clip2.mp4"))
+
+    assert not first["cached"] and second["cached"]
+    assert second["path"] == first["path"]
+    assert len(server.statuses) == requests
+
+def test_thread_downloader_follows_config(tmp_path, media_dir, config):
+    other = copy.deepcopy(config)
+    other["paths"]["input_dir"] = str(tmp_path / "other")
+    other["download"]["manifest"] = str(tmp_path / "other.json")
+    with MediaServer(media_dir) as server:
+        # Mesma thread, duas configurações: cada uma salva no seu diretório
+        first = make_downloader(config)(server.url("clip3.mp4"))
+        second = make_downloader(other)(server.url("clip3.mp4"))
+
+    assert os.path.dirname(first["path"]) == config["paths"]["input_dir"]
+    assert os.path.dirname(second["path"]) == other["paths"]["input_dir"]
+    assert downloader._get_thread_downloader(config) is downloader._get_thread_downloader(config)
+    assert downloader._get_thread_downloader(config) is not downloader._get_thread_downloader(other)
+
+class SizedYoutubeDL(yt_dlp.YoutubeDL):
+    """Informa o filesize nos metadados, como fazem os extractors dos sites"""
+
+    def __init__(self, params, filesize):
+        super().__init__(params)
+        self.filesize = filesize
+
+    def extract_info(self, url, download=True, **kwargs):
+        info = super().extract_info(url, download=download, **kwargs)
+        if not download:
+            info["filesize"] = self.filesize
+        return info
+
+class GrowingPostProcessor(PostProcessor):
+    """Muda o tamanho do arquivo final, como um remux ou correção do ffmpeg"""
+
+    def run(self, info):
+        with open(info["filepath"], "ab") as f:
+            f.write(b"\0" * 1000)
+        return [], info
+
+def sized_downloader(config, filesize):
+    ydl = SizedYoutubeDL(downloader._build_ydl_opts(config), filesize)
+    ydl.add_post_processor(GrowingPostProcessor(), when="post_process")
+    return ydl
+
+def test_size_check_ignores_postprocessing(media_dir, config):
+    with MediaServer(media_dir) as server:
+        with sized_downloader(config, 64 * 1024) as ydl:
+            result = download_single_video(server.url("clip3.mp4"), config, ydl=ydl)
+
+    assert os.path.getsize(result["path"]) == 64 * 1024 + 1000
+
+def test_size_check_rejects_short_download(media_dir, config):
+    with MediaServer(media_dir) as server:
+        with sized_downloader(config, 100 * 1024) as ydl:
+            with pytest.raises(yt_dlp.utils.DownloadError, match="incompleto"):
+                download_single_video(server.url("clip4.mp4"), config, ydl=ydl)
+
+    assert not [name for name in os.listdir(downloader.get_originals_dir(config)) if name.startswith("clip4")]
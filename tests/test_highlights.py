@@ -0,0 +1,28 @@
+"""Detecção de cortes (highlights) com envelope de áudio sintético"""
+import numpy as np
+
+from highlights import HOP_SECONDS, audio_signals, find_highlights
+
+def test_audio_signals_short_envelope():
+    # 2 s de áudio: menos quadros que a janela de 5 s da média de referência
+    envelope = np.full(20, 0.01, dtype=np.float32)
+    envelope[10] = 1.0
+    energy, spikes, silence = audio_signals(envelope)
+    assert len(energy) == len(spikes) == len(silence) == 20
+    assert spikes[10] == 1.0 and spikes.sum() == 1.0
+
+def test_find_highlights_short_clip():
+    segments = [
+        {"start": 0.0, "end": 1.0, "text": "Começo do vídeo."},
+        {"start": 1.0, "end": 2.0, "text": "Que gol incrível!"},
+        {"start": 2.0, "end": 3.0, "text": "Fim."},
+    ]
+    envelope = np.full(int(3.0 / HOP_SECONDS), 0.05, dtype=np.float32)
+    envelope[12:18] = 0.8
+    config = {"highlights": {"count": 1, "min_seconds": 0.5, "max_seconds": 1.5, "keywords": ["gol"]}}
+
+    cuts = find_highlights("clip.mp4", segments, config, envelope=envelope)
+
+    assert len(cuts) == 1
+    assert cuts[0]["keywords"] == ["gol"]
+    assert cuts[0]["start"] <= 1.0 and cuts[0]["end"] >= 2.0
@@ -0,0 +1,81 @@
+"""Estados persistentes dos vídeos no banco de jobs"""
+import pytest
+
+from jobs import JobStore, InvalidTransition
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    yield store
+    store.close()
+
+def run_stage(store, job_id, stage, artifacts=(), strict=True):
+    run_id = store.start(job_id, stage)
+    store.complete(job_id, run_id, stage, artifacts=artifacts, strict=strict)
+
+def test_transitions_follow_the_state_order(store):
+    job_id = store.add("https://exemplo.com/video")
+    # O mesmo vídeo não é registrado duas vezes
+    assert store.add("https://exemplo.com/video") == job_id
+
+    for stage, state in [("download", "downloaded"), ("transcribe", "transcribed"),
+                         ("edit", "rendered"), ("upload", "uploaded")]:
+        run_stage(store, job_id, stage)
+        assert store.get(job_id)["state"] == state
+    assert store.get(job_id)["attempts"] == 4
+
+    # Refazer uma etapa anterior não faz o estado regredir
+    run_stage(store, job_id, "transcribe")
+    assert store.get(job_id)["state"] == "uploaded"
+
+def test_skipping_a_state_is_invalid_unless_not_strict(store):
+    job_id = store.add("https://exemplo.com/video")
+    run_id = store.start(job_id, "edit")
+    with pytest.raises(InvalidTransition):
+        store.complete(job_id, run_id, "edit")
+    assert store.get(job_id)["state"] == "queued"
+
+    # Etapas desativadas (--skip-*): o estado pode pular
+    run_stage(store, job_id, "edit", strict=False)
+    assert store.get(job_id)["state"] == "rendered"
+
+def test_unfinished_and_summary(store):
+    done = store.add("a.mp4", state="downloaded")
+    pending = store.add("b.mp4")
+    running = store.add("c.mp4", state="downloaded")
+    for stage in ("transcribe", "edit", "upload"):
+        run_stage(store, done, stage)
+    run_stage(store, running, "transcribe")
+
+    assert store.unfinished() == [pending, running]
+    assert store.summary() == {"uploaded": 1, "queued": 1, "transcribed": 1}
+
+def test_failed_stage_keeps_state(store):
+    job_id = store.add("a.mp4")
+    run_id = store.start(job_id, "download")
+    store.fail(job_id, run_id, "timeout")
+    job = store.get(job_id)
+    assert job["state"] == "queued" and job["last_error"] == "timeout"
+    assert store.unfinished() == [job_id]
+
+def test_is_done_checks_artifacts(store, tmp_path):
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    srt_path = tmp_path / "video.srt"
+    srt_path.write_text("legenda", encoding="utf-8")
+    job_id = store.add(str(video_path), video_path=str(video_path), state="downloaded")
+
+    assert not store.is_done(store.get(job_id), "transcribe")
+    run_stage(store, job_id, "transcribe", artifacts=[srt_path])
+    job = store.get(job_id)
+    assert store.is_done(job, "transcribe") and store.is_done(job, "download")
+    assert not store.is_done(job, "edit")
+    assert job["artifacts"]["transcribe"][0]["size"] == len("legenda")
+
+    # Artefato alterado (tamanho diferente) ou apagado: a etapa precisa ser refeita
+    srt_path.write_text("legenda maior", encoding="utf-8")
+    assert not store.is_done(store.get(job_id), "transcribe")
+    srt_path.write_text("legenda", encoding="utf-8")
+    assert store.is_done(store.get(job_id), "transcribe")
+    srt_path.unlink()
+    assert not store.is_done(store.get(job_id), "transcribe")
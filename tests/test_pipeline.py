@@ -0,0 +1,77 @@
+"""Pipeline com etapas sobrepostas e registro no banco de jobs"""
+import threading
+import pytest
+
+from jobs import JobStore
+from pipeline import Pipeline, Stage, track, with_artifacts, job_item
+
+def test_transcription_change_reruns_later_stages(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    job_id = store.add(video_path.as_uri(), video_path=str(video_path), state="downloaded")
+    calls = {"transcribe": 0, "edit": 0}
+    # O que o transcribe_video retornaria: None quando a transcrição já está atualizada
+    retranscribed = [True]
+
+    def transcribe(item):
+        calls["transcribe"] += 1
+        path = tmp_path / "video.srt"
+        path.write_text("1\n00:00:00,000 --> 00:00:01,000\noi\n", encoding="utf-8")
+        return with_artifacts(item, "transcribe", [path], retranscribed=retranscribed[0])
+
+    def edit(item):
+        calls["edit"] += 1
+        path = tmp_path / "video_editado.mp4"
+        path.write_bytes(b"editado")
+        return with_artifacts(item, "edit", [path], outputs=[str(path)])
+
+    def run():
+        stages = [track(Stage("transcribe", transcribe), store), track(Stage("edit", edit), store)]
+        results, failures = Pipeline(stages).run([job_item(store, job_id)])
+        assert len(results) == 1 and not failures
+
+    try:
+        run()
+        assert calls == {"transcribe": 1, "edit": 1}
+        assert store.get(job_id)["state"] == "rendered"
+
+        # Transcrição atualizada: a edição concluída é reaproveitada
+        retranscribed[0] = False
+        run()
+        assert calls == {"transcribe": 2, "edit": 1}
+
+        # Opções alteradas ou --force: a transcrição muda e a edição é refeita
+        retranscribed[0] = True
+        run()
+        assert calls == {"transcribe": 3, "edit": 2}
+    finally:
+        store.close()
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_failing_stage_does_not_block_later_stages():
+    def parse(item):
+        if item["n"] == 3:
+            raise ValueError("entrada inválida")
+        return item
+
+    def render(item):
+        if item["n"] == 5:
+            # Mata o worker: o outro worker da etapa esvazia a fila
+            raise SystemExit(1)
+        return item
+
+    stages = [Stage("parse", parse), Stage("render", render, workers=2), Stage("upload", lambda item: item)]
+    pipeline = Pipeline(stages, queue_size=1)
+    items = [{"url": f"video{n}", "n": n} for n in range(10)]
+    outcome = []
+    runner = threading.Thread(target=lambda: outcome.append(pipeline.run(items)), daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive(), "join() não retornou"
+
+    results, failures = outcome[0]
+    assert sorted(item["n"] for item in results) == [0, 1, 2, 4, 6, 7, 8, 9]
+    assert [(failure["stage"], failure["item"]["n"], failure["error"]) for failure in failures] == [
+        ("parse", 3, "entrada inválida")
+    ]
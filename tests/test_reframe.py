@@ -0,0 +1,28 @@
+"""Análise de recorte (reframe) sobre vídeos gerados pelo ffmpeg"""
+import subprocess
+import pytest
+
+pytest.importorskip("cv2")
+
+from reframe import iter_samples
+
+def test_decode_failure_raises(tmp_path):
+    path = tmp_path / "corrompido.mp4"
+    path.write_bytes(b"isto nao e um video")
+    with pytest.raises(RuntimeError, match="corrompido.mp4"):
+        list(iter_samples(path, (320, 240)))
+
+def test_samples_from_generated_video(tmp_path):
+    path = tmp_path / "video.mp4"
+    subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "testsrc=size=320x240:rate=10:duration=2", "-pix_fmt", "yuv420p", str(path)],
+                   check=True)
+    samples = list(iter_samples(path, (320, 240), width=64, fps=4.0))
+    assert [t for t, _ in samples] == [i / 4.0 for i in range(len(samples))]
+    assert len(samples) >= 7
+    assert samples[0][1].shape == (48, 64)
+
+    # Fechar o gerador antes do fim não é erro
+    samples = iter_samples(path, (320, 240), width=64, fps=4.0)
+    next(samples)
+    samples.close()
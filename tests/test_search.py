@@ -0,0 +1,79 @@
+"""Índice invertido (SQLite) das transcrições"""
+import os
+import json
+import logging
+
+from search import KeywordMatcher, SearchIndex, normalize, tokenize, transcript_files
+
+def write_json_transcript(path, texts, language="pt"):
+    segments = [{"start": float(i), "end": i + 1.0, "text": text} for i, text in enumerate(texts)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"language": language, "segments": segments}, f)
+
+def test_index_skips_sidecar_files(tmp_path, caplog):
+    write_json_transcript(tmp_path / "video.json", ["Olá a todos", "Hoje falamos de busca"])
+    # Arquivos gravados ao lado da transcrição pelo highlights e pelo transcriber
+    with open(tmp_path / "video.cuts.json", "w", encoding="utf-8") as f:
+        json.dump({"video": "video.mp4", "transcript": None, "cuts": [{"start": 0.0, "end": 2.0}]}, f)
+    with open(tmp_path / "video.fingerprint.json", "w", encoding="utf-8") as f:
+        json.dump({"source": {}}, f)
+
+    assert transcript_files(tmp_path) == [tmp_path / "video.json"]
+
+    index = SearchIndex(tmp_path / "index.sqlite3")
+    try:
+        with caplog.at_level(logging.ERROR):
+            assert index.update([str(tmp_path)]) == (1, 0)
+        assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+        assert index.stats()["documents"] == 1
+        assert [result["video"] for result in index.search("busca")] == ["video"]
+    finally:
+        index.close()
+
+def test_matcher_reports_overlapping_patterns():
+    matcher = KeywordMatcher(["ela", "ela falou", "falou sobre", "sobre", "mar"])
+    tokens = tokenize("Ela falou sobre ela, a marca e o marketing")
+    # Padrões que compartilham palavras ou são sufixos de outros são todos encontrados
+    assert sorted(matcher.find(tokens)) == [(0, 0), (0, 1), (1, 2), (2, 3), (3, 0)]
+    assert matcher.matches("sobre o que ela falou") == [3, 0, 1]
+    # Limites de palavra: "mar" não casa com "marca"
+    assert matcher.matches("a marca do mar") == [4]
+
+def test_accents_and_case_are_normalized(tmp_path):
+    assert normalize("AÇÃO") == "acao"
+    assert tokenize("Reação, Pingüim e NIÑO") == ["reacao", "pinguim", "e", "nino"]
+    assert KeywordMatcher(["cafe com leite"]).matches("CAFÉ com Leite") == [0]
+
+    write_json_transcript(tmp_path / "video.json", ["Uma reação em cadeia", "Sem relação"])
+    index = SearchIndex(tmp_path / "index.sqlite3")
+    try:
+        index.update([str(tmp_path)])
+        for query in ("reacao", "REAÇÃO", '"Reação em Cadeia"'):
+            assert [result["segment"] for result in index.search(query)] == [0]
+    finally:
+        index.close()
+
+def test_update_reindexes_only_changed_files(tmp_path):
+    path = tmp_path / "video.json"
+    write_json_transcript(path, ["O gato subiu no telhado"])
+    write_json_transcript(tmp_path / "outro.json", ["Nada a ver"])
+
+    index = SearchIndex(tmp_path / "index.sqlite3")
+    try:
+        assert index.update([str(tmp_path)]) == (2, 0)
+        # Nada mudou: nenhuma transcrição é relida
+        assert index.update([str(tmp_path)]) == (0, 0)
+
+        write_json_transcript(path, ["O cachorro ficou no quintal"])
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert index.update([str(tmp_path)]) == (1, 0)
+        assert index.search("gato") == []
+        assert [result["text"] for result in index.search("cachorro")] == ["O cachorro ficou no quintal"]
+        assert index.stats()["documents"] == 2
+
+        os.remove(path)
+        assert index.update([str(tmp_path)]) == (0, 1)
+        assert index.search("cachorro") == []
+    finally:
+        index.close()
@@ -0,0 +1,60 @@
+"""Montagem das legendas a partir dos tempos das palavras"""
+import pytest
+
+from subtitles import build_cues, write_cues
+from utils import load_config
+
+def segment(words, text=None):
+    """Segmento do Whisper com palavras (texto, início, fim)"""
+    return {
+        "start": words[0][1],
+        "end": words[-1][2],
+        "text": text or " ".join(word for word, _, _ in words),
+        "words": [{"word": f" {word}", "start": start, "end": end} for word, start, end in words]
+    }
+
+def spaced(words, step=0.5):
+    return [(word, i * step, i * step + step) for i, word in enumerate(words)]
+
+def test_lines_respect_max_chars():
+    words = "uma frase comprida que precisa de mais de uma linha na tela".split()
+    cues = build_cues([segment(spaced(words, 0.1))], max_chars=16, max_lines=2, max_duration=60)
+
+    lines = [line for _, _, cue_lines in cues for line in cue_lines]
+    assert all(len(line) <= 16 for line in lines)
+    assert all(len(cue_lines) <= 2 for _, _, cue_lines in cues)
+    assert " ".join(lines).split() == words
+    assert cues[0][2] == ["uma frase", "comprida que"]
+    # Legendas consecutivas: cada uma começa na primeira palavra e termina na última
+    assert cues[0][:2] == (0.0, 0.4) and cues[1][0] == 0.4
+
+def test_cues_respect_max_duration():
+    words = [f"p{i}" for i in range(12)]
+    cues = build_cues([segment(spaced(words, 1.0))], max_chars=80, max_lines=2, max_duration=3.0)
+
+    assert all(end - start <= 3.0 for start, end, _ in cues)
+    assert [lines for _, _, lines in cues] == [["p0 p1 p2"], ["p3 p4 p5"], ["p6 p7 p8"], ["p9 p10 p11"]]
+
+def test_sentence_ends_and_pauses_break_cues():
+    words = [("Olá.", 0.0, 0.5), ("Tudo", 0.6, 0.9), ("bem?", 0.9, 1.2), ("Sim", 1.3, 1.6),
+             ("depois", 3.0, 3.5), ("da", 3.5, 3.6), ("pausa", 3.6, 4.0)]
+    cues = build_cues([segment(words)], max_chars=42, max_lines=2, max_duration=5.0)
+    assert [lines for _, _, lines in cues] == [["Olá."], ["Tudo bem?"], ["Sim"], ["depois da pausa"]]
+
+    # Sem tempos de palavras: o tempo do segmento é dividido pelo tamanho das palavras
+    cues = build_cues([{"start": 0.0, "end": 4.0, "text": " Sim. Cada"}])
+    assert cues == [(0.0, 2.0, ["Sim."]), (2.0, 4.0, ["Cada"])]
+
+def test_formats_are_parsed_and_validated(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUBTITLE_FORMATS", "srt, VTT ,")
+    formats = load_config()["subtitles"]["formats"]
+    assert formats == ["srt", "vtt"]
+
+    cues = [(0.0, 1.5, ["Olá"])]
+    write_cues(cues, str(tmp_path / "video"), formats)
+    assert (tmp_path / "video.srt").read_text(encoding="utf-8") == "1\n00:00:00,000 --> 00:00:01,500\nOlá\n\n"
+    assert (tmp_path / "video.vtt").read_text(encoding="utf-8") == "WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nOlá\n\n"
+
+    with pytest.raises(ValueError, match="txt"):
+        write_cues(cues, str(tmp_path / "outro"), ["srt", "txt"])
+    assert not list(tmp_path.glob("outro*"))
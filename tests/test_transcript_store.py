@@ -0,0 +1,97 @@
+"""Formato compacto (.tsc) das transcrições"""
+import json
+import pytest
+
+from transcript_store import TranscriptReader, convert_json, read_transcript, write_transcript
+
+def word(text, start, end, probability=0.75):
+    return {"word": text, "start": start, "end": end, "probability": probability}
+
+# Valores exatos em float32 para comparar o resultado sem tolerância
+RESULT = {
+    "language": "pt",
+    "segments": [
+        {"start": 0.0, "end": 2.0, "text": " Olá, ação!", "avg_logprob": -0.25, "no_speech_prob": 0.125,
+         "words": [word(" Olá,", 0.0, 0.8), word(" ação!", 0.9, 2.0, 0.5)]},
+        {"start": 2.5, "end": 4.0, "text": " Sem palavras", "avg_logprob": -0.5, "no_speech_prob": 0.0,
+         "words": []},
+        {"start": 4.0, "end": 7.5, "text": " Fim 🎬", "avg_logprob": -1.0, "no_speech_prob": 0.5,
+         "words": [word(" Fim", 4.0, 5.0), word(" 🎬", 5.0, 7.5, 0.25)]},
+    ]
+}
+
+def expected_segments(indices, words=True):
+    segments = []
+    for i in indices:
+        segment = dict(RESULT["segments"][i], id=i)
+        if not words:
+            del segment["words"]
+        segments.append(segment)
+    return segments
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "video.tsc"
+    write_transcript(path, RESULT)
+
+    result = read_transcript(path)
+    assert result["language"] == "pt"
+    assert result["segments"] == expected_segments(range(3))
+    assert result["text"] == " Olá, ação! Sem palavras Fim 🎬"
+
+    # Sem as palavras: nem a chave "words" aparece
+    assert read_transcript(path, words=False)["segments"] == expected_segments(range(3), words=False)
+
+def test_reader_is_memory_mapped(tmp_path):
+    path = tmp_path / "video.tsc"
+    write_transcript(path, RESULT)
+
+    reader = TranscriptReader(path)
+    assert len(reader) == 3 and reader.has_words
+    assert reader.array("seg_start").tolist() == [0.0, 2.5, 4.0]
+    # As colunas são visões do arquivo mapeado, sem cópia
+    assert not reader.array("seg_end").flags.writeable
+    assert reader.words(1) == []
+    assert reader.segment(2) == expected_segments([2])[0]
+
+def test_range_reads(tmp_path):
+    path = tmp_path / "video.tsc"
+    write_transcript(path, RESULT)
+
+    reader = TranscriptReader(path)
+    assert reader.segment_range(2.0, 4.0) == (1, 2)
+    assert reader.segment_range(1.0, None) == (0, 3)
+    assert reader.segment_range(None, 0.0) == (0, 0)
+    assert reader.segment_range(8.0, None) == (3, 3)
+    assert reader.segments(3.0, 5.0) == expected_segments([1, 2])
+
+    # O JSON filtra pelos mesmos critérios de sobreposição
+    json_path = tmp_path / "video.json"
+    json_path.write_text(json.dumps(RESULT), encoding="utf-8")
+    for start, end in [(2.0, 4.0), (3.0, 5.0), (None, 2.5), (7.5, None)]:
+        from_json = read_transcript(json_path, start, end)["segments"]
+        from_tsc = read_transcript(path, start, end)["segments"]
+        assert [s["start"] for s in from_json] == [s["start"] for s in from_tsc]
+
+def test_convert_json(tmp_path):
+    json_path = tmp_path / "video.json"
+    json_path.write_text(json.dumps(RESULT), encoding="utf-8")
+
+    output_path = convert_json(json_path)
+    assert output_path == tmp_path / "video.tsc"
+    assert read_transcript(output_path)["segments"] == expected_segments(range(3))
+
+    # Sem palavras no JSON: o arquivo não tem as colunas de palavras
+    no_words = {"language": "en", "segments": [{"start": 0.0, "end": 1.0, "text": " Hi"}]}
+    json_path.write_text(json.dumps(no_words), encoding="utf-8")
+    reader = TranscriptReader(convert_json(json_path, tmp_path / "other.tsc"))
+    assert not reader.has_words
+    assert reader.to_dict() == {
+        "text": " Hi", "language": "en",
+        "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": " Hi", "avg_logprob": 0.0, "no_speech_prob": 0.0}]
+    }
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "video.tsc"
+    path.write_bytes(b"JSON" + b"\0" * 60)
+    with pytest.raises(ValueError):
+        TranscriptReader(path)
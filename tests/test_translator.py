@@ -0,0 +1,86 @@
+"""Tradução em lotes com o StubBackend (sem rede)"""
+import re
+import json
+
+from translator import BatchTranslator, StubBackend, TranslationCache, translate_video
+from subtitles import write_subtitles
+from utils import load_config
+
+class MisalignedBackend(StubBackend):
+    """Devolve None para lotes com mais de um texto, como o Google ao juntar linhas"""
+
+    def translate_batch(self, texts, source, target):
+        translated = super().translate_batch(texts, source, target)
+        return translated if len(texts) == 1 else None
+
+def srt_timings(path):
+    with open(path, encoding="utf-8") as f:
+        return re.findall(r"^\S+ --> \S+$", f.read(), flags=re.M)
+
+def test_dedup_batching_and_cache(tmp_path):
+    texts = ["olá", "mundo", "olá", "  ", "tudo bem", "mundo", "até logo", "fim"]
+    cache_path = tmp_path / "translations.sqlite3"
+
+    backend = StubBackend()
+    translator = BatchTranslator(backend, cache=TranslationCache(cache_path), rate=0, batch_size=2)
+    try:
+        translated = translator.translate(texts, "pt", "en")
+    finally:
+        translator.close()
+
+    # Alinhadas à entrada; textos em branco passam sem tradução
+    assert translated == [f"[en] {text}" if text.strip() else text for text in texts]
+    # 5 textos distintos em lotes de 2 -> 3 requisições
+    assert backend.requests == 3
+    assert translator.stats == {"texts": 8, "unique": 5, "cached": 0, "requests": 3}
+
+    backend = StubBackend()
+    translator = BatchTranslator(backend, cache=TranslationCache(cache_path), rate=0, batch_size=2)
+    try:
+        assert translator.translate(texts, "pt", "en") == translated
+        # Outra língua de destino não reaproveita o cache
+        assert translator.translate(["olá"], "pt", "es") == ["[es] olá"]
+    finally:
+        translator.close()
+    assert backend.requests == 1
+    assert translator.stats["cached"] == 5
+
+def test_misaligned_batch_is_resent_one_by_one(tmp_path):
+    texts = ["um", "dois", "três"]
+    backend = MisalignedBackend()
+    translator = BatchTranslator(backend, cache=TranslationCache(tmp_path / "cache.sqlite3"), rate=0)
+    try:
+        assert translator.translate(texts, "pt", "en") == [f"[en] {text}" for text in texts]
+        assert translator.cache.get_many(texts, "pt", "en", backend.name) == {text: f"[en] {text}" for text in texts}
+    finally:
+        translator.close()
+    # O lote original mais uma requisição por texto, todas pelo mesmo limitador
+    assert backend.requests == 4
+    assert translator.stats["requests"] == 4
+
+def test_translated_srt_keeps_original_timings(tmp_path):
+    segments = [
+        {"start": 0.0, "end": 2.5, "text": "Primeira frase do vídeo."},
+        {"start": 3.0, "end": 9.0, "text": "Uma frase bem mais longa, que ocupa mais de uma legenda na tela do celular."},
+        {"start": 12.0, "end": 13.0, "text": "Fim."},
+    ]
+    video_path = tmp_path / "video.mp4"
+    with open(tmp_path / "video.json", "w", encoding="utf-8") as f:
+        json.dump({"language": "pt", "segments": segments}, f)
+
+    config = load_config()
+    config["translation"].update(languages=["pt", "en", "es"], backend="stub", rate=0,
+                                 cache=str(tmp_path / "cache.sqlite3"))
+    paths = translate_video(str(video_path), config)
+
+    # A língua de origem é pulada
+    assert paths == [str(tmp_path / "video.en.srt"), str(tmp_path / "video.es.srt")]
+    options = config["subtitles"]
+    write_subtitles({"segments": segments}, str(tmp_path / "video"), max_chars=options["max_chars"],
+                    max_lines=options["max_lines"], max_duration=options["max_duration"])
+    original = srt_timings(tmp_path / "video.srt")
+    assert len(original) > len(segments)
+    for path in paths:
+        assert srt_timings(path) == original
+    with open(paths[0], encoding="utf-8") as f:
+        assert "[en] Primeira frase do vídeo." in f.read()
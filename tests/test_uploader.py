@@ -0,0 +1,86 @@
+"""Upload resumível contra o servidor falso de benchmarks/fake_upload.py"""
+import os
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from googleapiclient.discovery import build
+from fake_upload import FakeUploadServer
+from uploader import upload_to_youtube, UploadSessions
+from utils import load_config
+
+SIZE = 1024 * 1024
+
+class Interrupted(Exception):
+    """Simula a queda do processo no meio do upload"""
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = tmp_path / "video_shorts.mp4"
+    path.write_bytes(os.urandom(SIZE))
+    return path
+
+@pytest.fixture
+def config():
+    config = load_config()
+    # Blocos de 256 KiB: 4 blocos por vídeo
+    config["upload"].update(chunk_size_mb=0.25, retries=5, backoff=0.01)
+    return config
+
+@pytest.fixture
+def service():
+    return build("youtube", "v3", developerKey="test", static_discovery=True, cache_discovery=False)
+
+def test_upload_retries_server_errors(tmp_path, video_path, config, service):
+    sessions = UploadSessions(tmp_path / ".uploads.json")
+    reported = []
+    with FakeUploadServer(fail_every=3) as server:
+        config["upload"]["api_endpoint"] = server.url
+        response = upload_to_youtube(video_path, service, config, sessions,
+                                     progress=lambda sent, total: reported.append(sent))
+
+    assert server.completed == [response]
+    assert [session["received"] for session in server.sessions.values()] == [SIZE]
+    assert reported[-1] == SIZE
+    assert sessions.get(video_path)["video_id"] == response["id"]
+
+def test_upload_resumes_interrupted_session(tmp_path, video_path, config, service):
+    sessions_path = tmp_path / ".uploads.json"
+
+    def interrupt(sent, total):
+        if sent >= 2 * 256 * 1024:
+            raise Interrupted()
+
+    # Com fail_every=3, a consulta da sessão na retomada (3º PUT, "bytes */total") recebe 503
+    with FakeUploadServer(fail_every=3) as server:
+        config["upload"]["api_endpoint"] = server.url
+        with pytest.raises(Interrupted):
+            upload_to_youtube(video_path, service, config, UploadSessions(sessions_path), progress=interrupt)
+        stored = UploadSessions(sessions_path).get(video_path)
+        assert stored["progress"] == 2 * 256 * 1024 and stored["resumable_uri"]
+
+        # Novo processo: retoma a mesma sessão do último byte confirmado
+        reported = []
+        sessions = UploadSessions(sessions_path)
+        response = upload_to_youtube(video_path, service, config, sessions,
+                                     progress=lambda sent, total: reported.append(sent))
+
+    assert len(server.sessions) == 1
+    assert server.completed == [response]
+    assert reported[0] == 3 * 256 * 1024
+    assert sessions.get(video_path)["video_id"] == response["id"]
+
+    # Já enviado: não faz nenhuma requisição
+    requests = server.requests
+    assert upload_to_youtube(video_path, service, config, sessions) == {"id": response["id"]}
+    assert server.requests == requests
+
+def test_expired_session_restarts_upload(tmp_path, video_path, config, service):
+    sessions = UploadSessions(tmp_path / ".uploads.json")
+    with FakeUploadServer() as server:
+        config["upload"]["api_endpoint"] = server.url
+        sessions.update(video_path, resumable_uri=f"{server.url}/upload/session/expired", progress=256 * 1024)
+        response = upload_to_youtube(video_path, service, config, sessions)
+
+    assert server.completed == [response]
+    assert [session["received"] for session in server.sessions.values()] == [SIZE]